@@ -4,18 +4,22 @@ Kokoro TTS Web Frontend
 A Flask-based web interface for Kokoro Text-to-Speech
 """
 
+import io
+import itertools
 import os
-import tempfile
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, url_for
-from werkzeug.utils import secure_filename
-import soundfile as sf
-import torch
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context, url_for
 
 # Import Kokoro
 try:
     from kokoro import KPipeline
+    from kokoro.audio import encode_stream, write_results
+    from kokoro.metrics import MetricsRegistry, add_observer
+    from kokoro.serving import get_model
     KOKORO_AVAILABLE = True
 except ImportError:
     KOKORO_AVAILABLE = False
@@ -27,9 +31,20 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # Create directories
 UPLOAD_FOLDER = '/tmp/kokoro_uploads'
-OUTPUT_FOLDER = '/tmp/kokoro_outputs'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+# Generated audio is kept in memory, bounded by size and age
+RESULT_STORE_BYTES = int(os.environ.get('KOKORO_RESULT_STORE_MB', 256)) * 1024 * 1024
+RESULT_TTL_SECONDS = int(os.environ.get('KOKORO_RESULT_TTL', 3600))
+
+# Packed voice store from `kokoro pack-voices`, loaded into every pipeline
+VOICE_STORE = os.environ.get('KOKORO_VOICE_STORE')
+
+# Phoneme budget of the first chunk of each request (0 fills chunks up to 510); see KPipeline(first_chunk=...)
+FIRST_CHUNK = int(os.environ.get('KOKORO_FIRST_CHUNK', 0)) or None
+
+# Voices to preload and warm up at startup, e.g. KOKORO_WARMUP=af_heart,bf_emma
+WARMUP_VOICES = [v for v in os.environ.get('KOKORO_WARMUP', '').split(',') if v]
 
 # Voice and language configurations
 VOICES = {
@@ -55,8 +70,84 @@ LANGUAGES = {
     'z': 'Mandarin Chinese (zh)',
 }
 
-# Global pipeline cache
+# format parameter -> (kokoro.audio format, mimetype)
+# pcm is headerless little-endian mono, not audio/L16 (which is big-endian per
+# RFC 2586); its sample rate is sent in the X-Sample-Rate header
+STREAM_FORMATS = {
+    'wav': ('wav', 'audio/wav'),
+    'pcm': ('s16le', 'application/octet-stream'),
+    'flac': ('flac', 'audio/flac'),
+    'opus': ('opus', 'audio/ogg; codecs=opus'),
+}
+
+REPO_ID = 'hexgrad/Kokoro-82M'
+
+class ResultStore:
+    """Thread-safe LRU of generated audio with a byte budget and a TTL"""
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.items = OrderedDict()  # file_id -> (data, created)
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def _drop(self, file_id):
+        data, _ = self.items.pop(file_id)
+        self.bytes -= len(data)
+
+    def _expire(self, now):
+        for file_id in [k for k, (_, created) in self.items.items() if now - created > self.ttl]:
+            self._drop(file_id)
+            self.expirations += 1
+
+    def put(self, file_id, data):
+        with self.lock:
+            self._expire(time.monotonic())
+            self.items[file_id] = (data, time.monotonic())
+            self.bytes += len(data)
+            # Evict least recently used, but always keep the newest entry
+            while self.bytes > self.max_bytes and len(self.items) > 1:
+                self._drop(next(iter(self.items)))
+                self.evictions += 1
+
+    def get(self, file_id):
+        with self.lock:
+            self._expire(time.monotonic())
+            if file_id not in self.items:
+                self.misses += 1
+                return None
+            self.items.move_to_end(file_id)
+            self.hits += 1
+            return self.items[file_id][0]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.items),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+result_store = ResultStore(RESULT_STORE_BYTES, RESULT_TTL_SECONDS)
+
+# In-process metrics, fed by hooks in KPipeline and KModel and served at /metrics
+metrics_registry = None
+if KOKORO_AVAILABLE:
+    metrics_registry = MetricsRegistry()
+    metrics_registry.define('result_store_bytes', 'gauge', 'Bytes of audio held in the result store')
+    metrics_registry.define('result_store_entries', 'gauge', 'Results held in the result store')
+    metrics_registry.define('result_store_hit_ratio', 'gauge', 'Fraction of downloads served from the result store')
+    add_observer(metrics_registry.observe)
+
+# Global pipeline cache; every pipeline shares the one KModel from get_model
 pipeline_cache = {}
+pipeline_lock = threading.Lock()
 
 def get_pipeline(lang_code):
     """Get or create a pipeline for the given language"""
@@ -64,9 +155,39 @@ def get_pipeline(lang_code):
         raise RuntimeError("Kokoro is not available")
     
     if lang_code not in pipeline_cache:
-        pipeline_cache[lang_code] = KPipeline(lang_code=lang_code)
+        with pipeline_lock:
+            if lang_code not in pipeline_cache:
+                pipeline = KPipeline(lang_code=lang_code, repo_id=REPO_ID, model=get_model(REPO_ID),
+                                     first_chunk=FIRST_CHUNK)
+                if VOICE_STORE:
+                    pipeline.load_voice_store(VOICE_STORE)
+                pipeline_cache[lang_code] = pipeline
     return pipeline_cache[lang_code]
 
+# Set once warmup has finished; /health reports 503 until then
+warmup_done = threading.Event()
+warmup_timings = {}
+
+def warmup(voices):
+    """Load each voice's pipeline and run it at representative lengths"""
+    try:
+        by_lang = {}
+        for voice in voices:
+            by_lang.setdefault(voice[0], []).append(voice)
+        for lang_code, lang_voices in by_lang.items():
+            warmup_timings[lang_code] = get_pipeline(lang_code).warmup(lang_voices)
+    except Exception as e:
+        print(f"Warmup failed: {e}")
+    finally:
+        warmup_done.set()
+
+# The debug reloader also imports this module in a watcher process that never serves; skip warmup there
+if KOKORO_AVAILABLE and WARMUP_VOICES and not (__name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'):
+    print(f"Warming up: {', '.join(WARMUP_VOICES)}")
+    threading.Thread(target=warmup, args=(WARMUP_VOICES,), daemon=True).start()
+else:
+    warmup_done.set()
+
 @app.route('/')
 def index():
     """Main page"""
@@ -97,30 +218,18 @@ def generate_speech():
         # Generate unique filename
         file_id = str(uuid.uuid4())
         output_filename = f'kokoro_output_{file_id}.wav'
-        output_path = os.path.join(OUTPUT_FOLDER, output_filename)
         
         # Get pipeline
         pipeline = get_pipeline(language)
         
-        # Generate speech
+        # Generate speech, encoding each chunk as it is produced
         generator = pipeline(text, voice=voice, speed=speed)
-        
-        # Collect all audio segments
-        audio_segments = []
-        for i, (gs, ps, audio) in enumerate(generator):
-            audio_segments.append(audio)
-        
-        if not audio_segments:
+        buffer = io.BytesIO()
+        if not write_results(generator, buffer, 'wav'):
             return jsonify({'error': 'No audio generated'}), 500
         
-        # Concatenate audio segments
-        if len(audio_segments) == 1:
-            final_audio = audio_segments[0]
-        else:
-            final_audio = torch.cat(audio_segments, dim=0)
-        
-        # Save audio file
-        sf.write(output_path, final_audio.numpy(), 24000)
+        # Keep the encoded audio in the result store
+        result_store.put(file_id, buffer.getvalue())
         
         # Return success response
         return jsonify({
@@ -137,20 +246,62 @@ def generate_speech():
     except Exception as e:
         return jsonify({'error': f'Generation failed: {str(e)}'}), 500
 
+@app.route('/stream', methods=['GET', 'POST'])
+def stream_speech():
+    """Stream speech as it is generated (chunked WAV, raw PCM, FLAC or Ogg/Opus)"""
+    if not KOKORO_AVAILABLE:
+        return jsonify({'error': 'Kokoro TTS is not available'}), 500
+
+    try:
+        data = request.get_json(silent=True) or request.values
+        text = data.get('text', '').strip()
+        voice = data.get('voice', 'af_heart')
+        language = data.get('language', 'a')
+        speed = float(data.get('speed', 1.0))
+        fmt = data.get('format', 'wav')
+
+        if not text:
+            return jsonify({'error': 'Text is required'}), 400
+
+        if len(text) > 5000:
+            return jsonify({'error': 'Text too long (max 5000 characters)'}), 400
+
+        if fmt not in STREAM_FORMATS:
+            return jsonify({'error': f'Unknown format (use one of {", ".join(STREAM_FORMATS)})'}), 400
+
+        # Fail before any bytes are sent if the pipeline or voice cannot load:
+        # running the first chunk here loads the voice once, inside the pipeline
+        pipeline = get_pipeline(language)
+        results = pipeline(text, voice=voice, speed=speed)
+        first = next(results, None)
+        results = itertools.chain([first] if first is not None else [], results)
+
+        encoding, mimetype = STREAM_FORMATS[fmt]
+        return Response(stream_with_context(encode_stream(results, encoding, sample_rate=pipeline.sample_rate)),
+                        mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                                 'X-Sample-Rate': str(pipeline.sample_rate)})
+
+    except Exception as e:
+        return jsonify({'error': f'Generation failed: {str(e)}'}), 500
+
 @app.route('/download/<file_id>')
 def download_file(file_id):
     """Download generated audio file"""
     try:
-        filename = f'kokoro_output_{file_id}.wav'
-        file_path = os.path.join(OUTPUT_FOLDER, filename)
+        data = result_store.get(file_id)
         
-        if not os.path.exists(file_path):
+        if data is None:
             return jsonify({'error': 'File not found'}), 404
         
-        return send_file(file_path, 
+        # conditional=True answers Range requests with 206 partial content
+        return send_file(io.BytesIO(data), 
                         as_attachment=True, 
                         download_name=f'kokoro_speech_{datetime.now().strftime("%Y%m%d_%H%M%S")}.wav',
-                        mimetype='audio/wav')
+                        mimetype='audio/wav',
+                        conditional=True,
+                        etag=file_id,
+                        max_age=RESULT_TTL_SECONDS)
     
     except Exception as e:
         return jsonify({'error': f'Download failed: {str(e)}'}), 500
@@ -162,19 +313,34 @@ def status():
         'kokoro_available': KOKORO_AVAILABLE,
         'voices': list(VOICES.keys()),
         'languages': list(LANGUAGES.keys()),
-        'max_text_length': 5000
+        'max_text_length': 5000,
+        'result_store': result_store.stats()
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of pipeline, model and result store metrics"""
+    if metrics_registry is None:
+        return Response('# kokoro not available\n', status=503, mimetype='text/plain')
+    stats = result_store.stats()
+    lookups = stats['hits'] + stats['misses']
+    metrics_registry.observe('result_store_bytes', stats['bytes'], {})
+    metrics_registry.observe('result_store_entries', stats['entries'], {})
+    metrics_registry.observe('result_store_hit_ratio', stats['hits'] / lookups if lookups else 0, {})
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    """Health check endpoint, unhealthy (503) while warming up"""
+    if not warmup_done.is_set():
+        return jsonify({'status': 'warming', 'timestamp': datetime.now().isoformat()}), 503
+    return jsonify({'status': 'healthy', 'warmup': warmup_timings, 'timestamp': datetime.now().isoformat()})
 
 if __name__ == '__main__':
     print("Starting Kokoro TTS Web Frontend...")
     print(f"Kokoro available: {KOKORO_AVAILABLE}")
     print(f"Upload folder: {UPLOAD_FOLDER}")
-    print(f"Output folder: {OUTPUT_FOLDER}")
+    print(f"Result store: {RESULT_STORE_BYTES // (1024 * 1024)}MB, TTL {RESULT_TTL_SECONDS}s")
     
     # Run the app
     app.run(host='0.0.0.0', port=53286, debug=True)
\ No newline at end of file
@@ -8,20 +8,94 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
 import os
+import queue
 import tempfile
 import uuid
 from datetime import datetime
+import numpy as np
 import pygame
 import soundfile as sf
-import torch
 
 # Import Kokoro
 try:
     from kokoro import KPipeline
+    from kokoro.audio import to_int16
+    from kokoro.serving import get_model
     KOKORO_AVAILABLE = True
 except ImportError:
     KOKORO_AVAILABLE = False
 
+SAMPLE_RATE = 24000
+
+class StreamingPlayer:
+    """Plays int16 chunks gaplessly on one mixer channel while later chunks are still being synthesized"""
+    def __init__(self, root, max_chunks=8, poll_ms=20):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.buffer = queue.Queue(maxsize=max_chunks)
+        self.channel = pygame.mixer.Channel(0)
+        self.stereo = pygame.mixer.get_init()[2] == 2
+        self.paused = False
+        self.finished = False
+        self.active = False
+        self.on_done = None
+        self.stream_id = 0
+
+    def start(self, on_done=None):
+        """Start a new stream, dropping anything still playing or buffered"""
+        self.stop()
+        self.buffer = queue.Queue(maxsize=self.buffer.maxsize)
+        self.paused = self.finished = False
+        self.active = True
+        self.on_done = on_done
+        self.stream_id += 1
+        self.root.after(0, self._poll, self.stream_id)
+
+    def put(self, pcm, cancel):
+        """Producer side: block while the buffer is full; returns False once cancel is set"""
+        while not cancel.is_set():
+            try:
+                self.buffer.put(pcm, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def finish(self):
+        """Producer side: no more chunks will follow"""
+        self.finished = True
+
+    def pause(self):
+        self.paused = True
+        self.channel.pause()
+
+    def resume(self):
+        self.paused = False
+        self.channel.unpause()
+
+    def stop(self):
+        self.active = False
+        self.channel.stop()
+
+    def _poll(self, stream_id):
+        if not self.active or stream_id != self.stream_id:
+            return
+        # Channel.queue() holds one pending sound and starts it the moment the
+        # current one ends, so keeping it topped up joins chunks without gaps
+        if not self.paused and self.channel.get_queue() is None:
+            try:
+                pcm = self.buffer.get_nowait()
+                if self.stereo:
+                    pcm = np.repeat(pcm, 2)
+                self.channel.queue(pygame.mixer.Sound(buffer=pcm.tobytes()))
+            except queue.Empty:
+                if self.finished and not self.channel.get_busy():
+                    self.active = False
+                    if self.on_done:
+                        self.on_done()
+                    return
+        self.root.after(self.poll_ms, self._poll, stream_id)
+
 class KokoroTTSGUI:
     def __init__(self, root):
         self.root = root
@@ -29,11 +103,16 @@ class KokoroTTSGUI:
         self.root.geometry("800x700")
         self.root.minsize(600, 500)
         
-        # Initialize pygame mixer for audio playback
-        pygame.mixer.init()
+        # Initialize pygame mixer for audio playback in the model's own format
+        pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=1, allowedchanges=0)
+        self.player = StreamingPlayer(root)
+        self.cancel_event = threading.Event()
+        self.current_segments = []
         
-        # Pipeline cache
+        # Pipeline cache; every pipeline shares the one KModel from get_model
+        self.repo_id = 'hexgrad/Kokoro-82M'
         self.pipeline_cache = {}
+        self.pipeline_lock = threading.Lock()
         self.current_audio_file = None
         self.is_generating = False
         
@@ -235,7 +314,10 @@ class KokoroTTSGUI:
             raise RuntimeError("Kokoro is not available")
         
         if lang_code not in self.pipeline_cache:
-            self.pipeline_cache[lang_code] = KPipeline(lang_code=lang_code)
+            with self.pipeline_lock:
+                if lang_code not in self.pipeline_cache:
+                    self.pipeline_cache[lang_code] = KPipeline(
+                        lang_code=lang_code, repo_id=self.repo_id, model=get_model(self.repo_id))
         return self.pipeline_cache[lang_code]
     
     def generate_speech(self):
@@ -252,20 +334,29 @@ class KokoroTTSGUI:
             messagebox.showerror("Error", "Text is too long (max 5000 characters).")
             return
         
-        # Start generation in separate thread
+        # Start generation in separate thread; playback starts with the first chunk
         self.is_generating = True
         self.generate_btn.config(state='disabled')
+        self.save_btn.config(state='disabled')
         self.progress_var.set("Generating speech...")
         self.progress_bar.start()
         
+        self.cancel_event = threading.Event()
+        self.current_segments = []
+        self.player.start(on_done=self._playback_done)
+        self.play_btn.config(state='disabled')
+        self.pause_btn.config(state='normal')
+        self.stop_btn.config(state='normal')
+        
         thread = threading.Thread(target=self._generate_speech_thread, 
                                  args=(text, self.voice_var.get(), 
-                                      self.language_var.get(), self.speed_var.get()))
+                                      self.language_var.get(), self.speed_var.get(),
+                                      self.cancel_event))
         thread.daemon = True
         thread.start()
     
-    def _generate_speech_thread(self, text, voice, language, speed):
-        """Generate speech in background thread"""
+    def _generate_speech_thread(self, text, voice, language, speed, cancel):
+        """Generate speech in background thread, handing each chunk to the player as it is produced"""
         try:
             # Get pipeline
             pipeline = self.get_pipeline(language)
@@ -273,42 +364,73 @@ class KokoroTTSGUI:
             # Generate speech
             generator = pipeline(text, voice=voice, speed=speed)
             
-            # Collect all audio segments
             audio_segments = []
-            for i, (gs, ps, audio) in enumerate(generator):
-                audio_segments.append(audio)
+            try:
+                for result in generator:
+                    if cancel.is_set():
+                        break
+                    if result.audio is None:
+                        continue
+                    pcm = to_int16(result.audio)
+                    audio_segments.append(pcm)
+                    if len(audio_segments) == 1:
+                        self.root.after(0, self.progress_var.set, "Playing while generating...")
+                    if not self.player.put(pcm, cancel):
+                        break
+            finally:
+                # Stops synthesis of the remaining chunks when cancelled
+                generator.close()
+                self.player.finish()
             
             if not audio_segments:
+                if cancel.is_set():
+                    self.root.after(0, self._generation_stopped, None, [])
+                    return
                 raise RuntimeError("No audio generated")
             
-            # Concatenate audio segments
-            if len(audio_segments) == 1:
-                final_audio = audio_segments[0]
-            else:
-                final_audio = torch.cat(audio_segments, dim=0)
-            
-            # Save to temporary file
+            # Save to temporary file for Save As... and replay
             temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            sf.write(temp_file.name, final_audio.numpy(), 24000)
+            sf.write(temp_file.name, np.concatenate(audio_segments), SAMPLE_RATE)
             temp_file.close()
             
             # Update UI in main thread
-            self.root.after(0, self._generation_complete, temp_file.name, text, voice, language, speed)
+            if cancel.is_set():
+                self.root.after(0, self._generation_stopped, temp_file.name, audio_segments)
+            else:
+                self.root.after(0, self._generation_complete, temp_file.name, audio_segments, text, voice, language, speed)
             
         except Exception as e:
             self.root.after(0, self._generation_error, str(e))
     
-    def _generation_complete(self, audio_file, text, voice, language, speed):
-        """Handle successful generation"""
+    def _set_current_audio(self, audio_file, segments):
+        if self.current_audio_file and self.current_audio_file != audio_file and os.path.exists(self.current_audio_file):
+            os.unlink(self.current_audio_file)
         self.current_audio_file = audio_file
+        self.current_segments = segments
+    
+    def _generation_stopped(self, audio_file, segments):
+        """Handle generation cancelled by Stop; whatever was synthesized is kept"""
+        self._set_current_audio(audio_file, segments)
+        self.is_generating = False
+        self.generate_btn.config(state='normal')
+        self.progress_bar.stop()
+        self.progress_var.set("Generation stopped")
+        if audio_file:
+            self.play_btn.config(state='normal')
+            self.save_btn.config(state='normal')
+    
+    def _generation_complete(self, audio_file, segments, text, voice, language, speed):
+        """Handle successful generation"""
+        self._set_current_audio(audio_file, segments)
         self.is_generating = False
         self.generate_btn.config(state='normal')
         self.progress_bar.stop()
         self.progress_var.set("Generation complete!")
         
         # Enable audio controls
-        self.play_btn.config(state='normal')
         self.save_btn.config(state='normal')
+        if not self.player.active:
+            self.play_btn.config(state='normal')
         
         # Update audio info
         voice_name = self.voices.get(voice, voice)
@@ -317,8 +439,6 @@ class KokoroTTSGUI:
             text=f"Generated: {voice_name} | {lang_name} | {speed:.1f}x speed",
             foreground='black'
         )
-        
-        messagebox.showinfo("Success", "Speech generated successfully!")
     
     def _generation_error(self, error_msg):
         """Handle generation error"""
@@ -326,44 +446,53 @@ class KokoroTTSGUI:
         self.generate_btn.config(state='normal')
         self.progress_bar.stop()
         self.progress_var.set("Generation failed!")
+        self.player.stop()
+        self._playback_done()
         
         messagebox.showerror("Error", f"Speech generation failed:\n{error_msg}")
     
     def play_audio(self):
-        """Play the generated audio"""
-        if self.current_audio_file and os.path.exists(self.current_audio_file):
-            try:
-                pygame.mixer.music.load(self.current_audio_file)
-                pygame.mixer.music.play()
-                self.play_btn.config(state='disabled')
-                self.pause_btn.config(state='normal')
-                self.stop_btn.config(state='normal')
-                self._check_playback()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to play audio:\n{str(e)}")
+        """Resume paused playback, or replay the generated audio"""
+        if self.player.active and self.player.paused:
+            self.player.resume()
+        elif self.current_segments:
+            self.cancel_event = threading.Event()
+            self.player.start(on_done=self._playback_done)
+            thread = threading.Thread(target=self._replay_thread,
+                                      args=(self.current_segments, self.cancel_event))
+            thread.daemon = True
+            thread.start()
+        else:
+            return
+        self.play_btn.config(state='disabled')
+        self.pause_btn.config(state='normal')
+        self.stop_btn.config(state='normal')
+    
+    def _replay_thread(self, segments, cancel):
+        """Feed already generated chunks back through the player"""
+        for pcm in segments:
+            if not self.player.put(pcm, cancel):
+                break
+        self.player.finish()
     
     def pause_audio(self):
-        """Pause audio playback"""
-        pygame.mixer.music.pause()
+        """Pause audio playback; synthesis keeps filling the buffer"""
+        self.player.pause()
         self.play_btn.config(state='normal')
         self.pause_btn.config(state='disabled')
     
     def stop_audio(self):
-        """Stop audio playback"""
-        pygame.mixer.music.stop()
-        self.play_btn.config(state='normal')
+        """Stop audio playback and cancel any remaining synthesis"""
+        self.cancel_event.set()
+        self.player.stop()
+        self._playback_done()
+    
+    def _playback_done(self):
+        """Reset the audio controls once playback ends"""
+        self.play_btn.config(state='disabled' if self.is_generating or not self.current_segments else 'normal')
         self.pause_btn.config(state='disabled')
         self.stop_btn.config(state='disabled')
     
-    def _check_playback(self):
-        """Check if audio is still playing"""
-        if pygame.mixer.music.get_busy():
-            self.root.after(100, self._check_playback)
-        else:
-            self.play_btn.config(state='normal')
-            self.pause_btn.config(state='disabled')
-            self.stop_btn.config(state='disabled')
-    
     def save_audio(self):
         """Save the generated audio file"""
         if not self.current_audio_file or not os.path.exists(self.current_audio_file):
@@ -426,8 +555,9 @@ class KokoroTTSGUI:
             except:
                 pass
         
-        # Stop audio
-        pygame.mixer.music.stop()
+        # Stop audio and any synthesis still running
+        self.cancel_event.set()
+        self.player.stop()
         pygame.mixer.quit()
         
         self.root.destroy()
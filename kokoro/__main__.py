@@ -5,19 +5,49 @@ python3 -m kokoro --text "The sky above the port was the color of television, tu
 echo "Bom dia mundo, como vão vocês" > text.txt
 python3 -m kokoro -i text.txt -l p --voice pm_alex > audio.wav
 
+Stream to stdout as each chunk is generated (WAV, or raw PCM with --format):
+python3 -m kokoro -t "Hello" -o - | aplay
+python3 -m kokoro -t "Hello" -o - --format s16le | ffmpeg -f s16le -ar 24000 -ac 1 -i - out.mp3
+
 Common issues:
 pip not installed: `uv pip install pip`
 (Temporary workaround while https://github.com/explosion/spaCy/issues/13747 is not fixed)
 
 espeak not installed: `apt-get install espeak-ng`
+
+Prefetch everything needed offline (config, weights, voices, G2P data):
+python3 -m kokoro prefetch -l a -l b --voice ef_dora --model-dir ./kokoro-82m
+KOKORO_MODEL_DIR=./kokoro-82m python3 -m kokoro -t "Hello" -o hello.wav
+
+Render many prompts with models loaded once, across worker processes (resumable):
+python3 -m kokoro --manifest jobs.jsonl --workers 4
+where each line is {"text": "...", "voice": "af_heart", "speed": 1, "language": "a", "output": "out/0001.wav"}
+("file" may replace "text"; relative paths are relative to the manifest)
+
+Render a book with per-chunk checkpoints; rerun the same command to resume after a crash:
+python3 -m kokoro longform -i book.txt -o book.wav --voice bf_emma   # also writes book.srt
+
+Convert weights to mmap-friendly safetensors (picked up automatically from a model dir):
+python3 -m kokoro convert --model-dir ./kokoro-82m --freeze-weight-norm -o ./kokoro-82m/kokoro-v1_0.safetensors
+
+Blend voices by weight, or pre-mix blends into a packed voice store (see KPipeline.load_voice_store):
+python3 -m kokoro -t "Hello" -o hello.wav --voice "af_bella:0.7,af_sky:0.3"
+python3 -m kokoro pack-voices -o voices.safetensors af_heart "af_bella:0.7,af_sky:0.3"
+
+Phonemize on one machine and synthesize on another (see kokoro.corpus):
+python3 -m kokoro phonemize -i book.txt -o book.kph -l a
+python3 -m kokoro render-corpus -i book.kph -o book.wav --voice af_heart
 """
 
 import argparse
-import wave
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import Generator, TYPE_CHECKING
+from typing import BinaryIO, Dict, Generator, Iterable, List, Optional, Tuple, TYPE_CHECKING
 
-import numpy as np
 from loguru import logger
 
 languages = [
@@ -32,40 +62,535 @@ languages = [
     "z",  # Mandarin Chinese
 ]
 
+SAMPLE_RATE = 24000
+
+# --warmup: phoneme counts run through each --manifest worker's model at startup
+WARMUP_LENGTHS = (16, 64, 256)
+
+# --format: see kokoro.audio.FORMATS
+formats = ["wav", "flac", "opus", "s16le", "f32le"]
+
 if TYPE_CHECKING:
     from kokoro import KPipeline
 
 
 def generate_audio(
-    text: str, kokoro_language: str, voice: str, speed=1
+    text: str, kokoro_language: str, voice: str, speed=1, model_dir: Optional[str] = None,
+    sample_rate: int = SAMPLE_RATE, warmup: bool = False
 ) -> Generator["KPipeline.Result", None, None]:
     from kokoro import KPipeline
 
     if not voice.startswith(kokoro_language):
         logger.warning(f"Voice {voice} is not made for language {kokoro_language}")
-    pipeline = KPipeline(lang_code=kokoro_language)
+    pipeline = KPipeline(
+        lang_code=kokoro_language, repo_id="hexgrad/Kokoro-82M", model_dir=model_dir,
+        sample_rate=sample_rate,
+    )
+    if warmup:
+        pipeline.warmup([voice])
     yield from pipeline(text, voice=voice, speed=speed, split_pattern=r"\n+")
 
 
+def log_phonemes(
+    results: Iterable["KPipeline.Result"]
+) -> Generator["KPipeline.Result", None, None]:
+    for result in results:
+        logger.debug(result.phonemes)
+        yield result
+
+
 def generate_and_save_audio(
-    output_file: Path, text: str, kokoro_language: str, voice: str, speed=1
+    output_file: Path, text: str, kokoro_language: str, voice: str, speed=1,
+    model_dir: Optional[str] = None, sample_rate: int = SAMPLE_RATE, warmup: bool = False
 ) -> None:
-    with wave.open(str(output_file.resolve()), "wb") as wav_file:
-        wav_file.setnchannels(1)  # Mono audio
-        wav_file.setsampwidth(2)  # 2 bytes per sample (16-bit audio)
-        wav_file.setframerate(24000)  # Sample rate
-
-        for result in generate_audio(
-            text, kokoro_language=kokoro_language, voice=voice, speed=speed
-        ):
-            logger.debug(result.phonemes)
-            if result.audio is None:
+    from kokoro.audio import write_results
+
+    with output_file.open("wb") as f:
+        write_results(
+            log_phonemes(generate_audio(
+                text, kokoro_language=kokoro_language, voice=voice, speed=speed,
+                model_dir=model_dir, sample_rate=sample_rate, warmup=warmup
+            )),
+            f,
+            "wav",
+            sample_rate=sample_rate,
+        )
+
+
+def write_audio(
+    output_file: Path, results: Iterable["KPipeline.Result"], fmt: str = "wav", sample_rate: int = SAMPLE_RATE
+) -> int:
+    """Writes results to output_file via a temp file, so a partial file never looks finished.
+    Returns the number of samples written."""
+    from kokoro.audio import write_results
+
+    tmp = output_file.with_name(output_file.name + ".part")
+    with tmp.open("wb") as f:
+        samples = write_results(results, f, fmt, sample_rate=sample_rate, background=False)
+    os.replace(tmp, output_file)
+    return samples
+
+
+def load_manifest(
+    manifest: Path, voice: str, speed: float, language: Optional[str] = None
+) -> Tuple[Dict[Tuple[str, str, float, str], List[Path]], int]:
+    """Groups manifest jobs by (text, voice, speed, language), so identical jobs render once.
+    Returns the groups and the number of jobs read."""
+    from kokoro import KPipeline
+
+    jobs: Dict[Tuple[str, str, float, str], List[Path]] = {}
+    seen = set()
+    n = 0
+    with manifest.open(encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
                 continue
-            audio_bytes = (result.audio.numpy() * 32767).astype(np.int16).tobytes()
-            wav_file.writeframes(audio_bytes)
+            n += 1
+            job = json.loads(line)
+            if "output" not in job or ("text" in job) == ("file" in job):
+                raise ValueError(f"{manifest}:{line_no}: need 'output' and exactly one of 'text' or 'file'")
+            text = job.get("text")
+            if text is None:
+                text = (manifest.parent / job["file"]).read_text(encoding="utf-8")
+            job_voice = job.get("voice", voice)
+            job_language = job.get("language") or language or KPipeline.voice_lang(job_voice)
+            if job_language is None:
+                raise ValueError(f"{manifest}:{line_no}: cannot infer a language from voice {job_voice!r}, set 'language'")
+            key = (text, job_voice, float(job.get("speed", speed)), job_language)
+            output = manifest.parent / job["output"]
+            if output in seen:
+                logger.warning(f"{manifest}:{line_no}: duplicate output {output}, skipping")
+                continue
+            seen.add(output)
+            jobs.setdefault(key, []).append(output)
+    return jobs, n
+
+
+def run_manifest(
+    manifest: Path, voice: str, speed: float = 1, language: Optional[str] = None,
+    workers: Optional[int] = None, threads_per_worker: int = 1, model_dir: Optional[str] = None,
+    warmup: bool = False, fmt: str = "wav", sample_rate: int = SAMPLE_RATE
+) -> None:
+    from kokoro.serving import WorkerPool
+    from kokoro.voices import parse_blend
+
+    start = time.perf_counter()
+    jobs, total = load_manifest(manifest, voice, speed, language)
+    pending = {}
+    skipped = 0
+    for key, outputs in jobs.items():
+        todo = [o for o in outputs if not o.exists()]
+        skipped += len(outputs) - len(todo)
+        if todo:
+            pending[key] = todo
+    logger.info(
+        f"{total} jobs: {skipped} already rendered, {len(pending)} unique to render"
+    )
+    # Preload the voices every blend is mixed from; workers build blends from them
+    voices = {name for key in pending for name, _ in parse_blend(key[1])}
+    rendered = failed = samples = chars = 0
+    with WorkerPool(
+        workers=workers, threads_per_worker=threads_per_worker,
+        voices=voices, model_dir=model_dir, warmup=WARMUP_LENGTHS if warmup else (),
+        sample_rate=sample_rate,
+    ) as pool:
+        remaining = iter(pending.items())
+        in_flight = {}
+        # Keep a bounded window of work queued, so 100k jobs don't sit in memory at once
+        window = 4 * pool.workers
+        while True:
+            for key, outputs in remaining:
+                text, job_voice, job_speed, lang = key
+                in_flight[pool.submit(text, job_voice, job_speed, lang)] = (key, outputs)
+                if len(in_flight) >= window:
+                    break
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, outputs = in_flight.pop(future)
+                try:
+                    results = future.result()
+                    for output in outputs:
+                        output.parent.mkdir(parents=True, exist_ok=True)
+                        n = write_audio(output, results, fmt, sample_rate)
+                    rendered += len(outputs)
+                    samples += n * len(outputs)
+                    chars += len(key[0]) * len(outputs)
+                except Exception as e:
+                    failed += len(outputs)
+                    logger.error(f"Failed to render {outputs[0]}: {e}")
+    elapsed = time.perf_counter() - start
+    audio_seconds = samples / sample_rate
+    print(
+        f"Rendered {rendered} files ({len(pending)} unique, {skipped} skipped, {failed} failed) "
+        f"in {elapsed:.1f}s: {audio_seconds:.1f}s of audio, "
+        f"{audio_seconds / elapsed:.2f}x real time, {chars / elapsed:.1f} chars/s"
+    )
+
+
+def stream_audio(
+    out: BinaryIO, text: str, kokoro_language: str, voice: str, speed=1,
+    model_dir: Optional[str] = None, fmt: str = "wav", sample_rate: int = SAMPLE_RATE,
+    warmup: bool = False
+) -> None:
+    """Writes each chunk to out as soon as it is generated, flushing after every write."""
+    from kokoro.audio import write_results
+
+    write_results(
+        log_phonemes(generate_audio(
+            text, kokoro_language=kokoro_language, voice=voice, speed=speed,
+            model_dir=model_dir, sample_rate=sample_rate, warmup=warmup
+        )),
+        out,
+        fmt,
+        sample_rate=sample_rate,
+        autoflush=True,
+    )
+
+
+def prefetch(argv: List[str]) -> None:
+    from kokoro import KModel, KPipeline
+    from kokoro.hub import prefetch as hub_prefetch
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro prefetch",
+        description="Download config, weights, voices and G2P data for offline use",
+    )
+    parser.add_argument(
+        "-l",
+        "--language",
+        action="append",
+        default=[],
+        choices=languages,
+        help="Language to prefetch, including all of its voices (repeatable)",
+    )
+    parser.add_argument(
+        "-m",
+        "--voice",
+        action="append",
+        default=[],
+        help="Extra voice to prefetch (repeatable)",
+    )
+    parser.add_argument(
+        "--repo-id",
+        default="hexgrad/Kokoro-82M",
+        choices=list(KModel.MODEL_NAMES),
+        help="HF repo to prefetch from",
+    )
+    parser.add_argument(
+        "--model-dir",
+        help="Materialize files into this directory instead of the HF cache "
+        "(use it later via --model-dir or KOKORO_MODEL_DIR)",
+    )
+    args = parser.parse_args(argv)
+
+    path = hub_prefetch(
+        repo_id=args.repo_id,
+        model_name=KModel.MODEL_NAMES[args.repo_id],
+        lang_codes=args.language,
+        voices=args.voice,
+        model_dir=args.model_dir,
+    )
+    # G2P backends (spaCy models, dictionaries) download lazily on first use
+    for lang in args.language:
+        KPipeline(lang_code=lang, repo_id=args.repo_id, model=False)
+    print(path)
+
+
+def convert(argv: List[str]) -> None:
+    import torch
+    from kokoro import KModel
+    from kokoro.weights import save_safetensors
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro convert",
+        description="Convert model weights to a flat .safetensors file for mmap loading",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        "--output_file",
+        type=Path,
+        required=True,
+        help="Path to output .safetensors file",
+    )
+    parser.add_argument(
+        "--model",
+        help="Path to input weights (.pth or .safetensors, default: resolved from --repo-id)",
+    )
+    parser.add_argument(
+        "--repo-id",
+        default="hexgrad/Kokoro-82M",
+        choices=list(KModel.MODEL_NAMES),
+        help="HF repo the weights belong to",
+    )
+    parser.add_argument(
+        "--model-dir",
+        help="Local directory with config.json and weights (default: KOKORO_MODEL_DIR, else the HF hub)",
+    )
+    parser.add_argument(
+        "--freeze-weight-norm",
+        action="store_true",
+        help="Fold weight_norm into plain weights",
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float16", "bfloat16"],
+        help="Store floating point weights in this dtype (upcast to float32 on load)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.output_file.suffix != ".safetensors":
+        logger.warning("The output file name should end with .safetensors")
+    model = KModel(repo_id=args.repo_id, model=args.model, model_dir=args.model_dir)
+    save_safetensors(
+        model,
+        str(args.output_file),
+        dtype=getattr(torch, args.dtype) if args.dtype else None,
+        freeze_weight_norm=args.freeze_weight_norm,
+    )
+    print(args.output_file)
+
+
+def pack_voices(argv: List[str]) -> None:
+    from kokoro import KModel
+    from kokoro.voices import save_voices
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro pack-voices",
+        description="Write voices and pre-mixed blends into one mmap-friendly .safetensors voice store",
+    )
+    parser.add_argument(
+        "voices",
+        nargs="+",
+        help="Voice names, .pt files or weighted blends (e.g. af_bella:0.7,af_sky:0.3)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        "--output_file",
+        type=Path,
+        required=True,
+        help="Path to output .safetensors file",
+    )
+    parser.add_argument(
+        "--repo-id",
+        default="hexgrad/Kokoro-82M",
+        choices=list(KModel.MODEL_NAMES),
+        help="HF repo the voices belong to",
+    )
+    parser.add_argument(
+        "--model-dir",
+        help="Local directory with voices (default: KOKORO_MODEL_DIR, else the HF hub)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.output_file.suffix != ".safetensors":
+        logger.warning("The output file name should end with .safetensors")
+    names = save_voices(str(args.output_file), args.voices, repo_id=args.repo_id, model_dir=args.model_dir)
+    logger.info(f"Packed {len(names)} voices: {', '.join(names)}")
+    print(args.output_file)
+
+
+def longform(argv: List[str]) -> None:
+    from kokoro import KPipeline
+    from kokoro.longform import concat, render
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro longform",
+        description="Render a long text file line by line with resumable per-chunk checkpoints",
+    )
+    parser.add_argument(
+        "-i",
+        "--input-file",
+        "--input_file",
+        type=Path,
+        required=True,
+        help="Path to input text file (read one line at a time)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        "--output_file",
+        type=Path,
+        required=True,
+        help="Path to final WAV file; subtitles are written next to it as .srt",
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        help="Directory for segment files and the manifest (default: OUTPUT.parts)",
+    )
+    parser.add_argument("-m", "--voice", default="af_heart", help="Voice to use")
+    parser.add_argument(
+        "-l",
+        "--language",
+        help="Language to use (defaults to the one corresponding to the voice)",
+        choices=languages,
+    )
+    parser.add_argument("-s", "--speed", type=float, default=1.0, help="Speech speed")
+    parser.add_argument(
+        "--sample-rate",
+        type=int,
+        default=SAMPLE_RATE,
+        help="Output sample rate, e.g. 8000 or 16000 for telephony, 48000 for browsers",
+    )
+    parser.add_argument(
+        "--model-dir",
+        help="Local directory with config.json, weights and voices "
+        "(default: KOKORO_MODEL_DIR, else the HF hub)",
+    )
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or args.output_file.with_name(args.output_file.name + ".parts")
+    pipeline = KPipeline(
+        lang_code=args.language or args.voice[0], repo_id="hexgrad/Kokoro-82M", model_dir=args.model_dir,
+        sample_rate=args.sample_rate,
+    )
+    rendered = render(pipeline, str(args.input_file), str(work_dir), voice=args.voice, speed=args.speed)
+    duration = concat(str(work_dir), str(args.output_file), str(args.output_file.with_suffix(".srt")))
+    logger.info(f"Rendered {rendered} new lines, {duration:.1f}s of audio in total")
+    print(args.output_file)
+
+
+def phonemize(argv: List[str]) -> None:
+    from kokoro import KModel, KPipeline
+    from kokoro.corpus import CorpusWriter
+    from kokoro.hub import resolve
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro phonemize",
+        description="Phonemize and chunk text into a corpus file for `kokoro render-corpus` (no model needed)",
+    )
+    parser.add_argument(
+        "-i",
+        "--input-file",
+        "--input_file",
+        type=Path,
+        required=True,
+        help="Path to input text file",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        "--output_file",
+        type=Path,
+        required=True,
+        help="Path to output corpus file",
+    )
+    parser.add_argument("-l", "--language", required=True, choices=languages, help="Language to phonemize")
+    parser.add_argument(
+        "--repo-id",
+        default="hexgrad/Kokoro-82M",
+        choices=list(KModel.MODEL_NAMES),
+        help="HF repo whose vocab the input_ids are mapped with",
+    )
+    parser.add_argument(
+        "--model-dir",
+        help="Local directory with config.json (default: KOKORO_MODEL_DIR, else the HF hub)",
+    )
+    args = parser.parse_args(argv)
+
+    with open(resolve(args.repo_id, "config.json", args.model_dir), "r", encoding="utf-8") as r:
+        vocab = json.load(r)["vocab"]
+    pipeline = KPipeline(lang_code=args.language, repo_id=args.repo_id, model=False)
+    text = args.input_file.read_text(encoding="utf-8")
+    with CorpusWriter(str(args.output_file), lang_code=pipeline.lang_code, vocab=vocab, repo_id=args.repo_id) as writer:
+        for result in pipeline(text, split_pattern=r"\n+"):
+            writer.write(result)
+    logger.info(f"Wrote {writer.chunks} chunks")
+    print(args.output_file)
+
+
+def render_corpus(argv: List[str]) -> None:
+    from kokoro import KModel, KPipeline
+    from kokoro.corpus import CorpusReader
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro render-corpus",
+        description="Synthesize a corpus file from `kokoro phonemize` without running G2P",
+    )
+    parser.add_argument(
+        "-i",
+        "--input-file",
+        "--input_file",
+        type=Path,
+        required=True,
+        help="Path to input corpus file",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        "--output_file",
+        type=Path,
+        required=True,
+        help="Path to output audio file",
+    )
+    parser.add_argument("-m", "--voice", default="af_heart", help="Voice to use")
+    parser.add_argument("-s", "--speed", type=float, default=1.0, help="Speech speed")
+    parser.add_argument(
+        "--repo-id",
+        choices=list(KModel.MODEL_NAMES),
+        help="HF repo of the model to render with (default: the one the corpus was phonemized for); "
+        "must match the corpus",
+    )
+    parser.add_argument(
+        "--format",
+        choices=formats,
+        default="wav",
+        help="Output format: WAV, FLAC, Ogg/Opus, or raw mono PCM (s16le, f32le)",
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=int,
+        default=SAMPLE_RATE,
+        help="Output sample rate, e.g. 8000 or 16000 for telephony, 48000 for browsers",
+    )
+    parser.add_argument(
+        "--model-dir",
+        help="Local directory with config.json, weights and voices "
+        "(default: KOKORO_MODEL_DIR, else the HF hub)",
+    )
+    args = parser.parse_args(argv)
+
+    with CorpusReader(str(args.input_file)) as reader:
+        # Corpora written before repo_id was stored were phonemized for the default model
+        repo_id = reader.repo_id or "hexgrad/Kokoro-82M"
+        if args.repo_id is not None and args.repo_id != repo_id:
+            parser.error(f"{args.input_file} was phonemized for {repo_id}, not {args.repo_id}")
+        # The corpus is already phonemized, so only the model and voices are loaded
+        device = KPipeline.select_device()
+        model = KModel(repo_id=repo_id, model_dir=args.model_dir).to(device).eval()
+        pipeline = KPipeline(
+            lang_code=reader.lang_code,
+            repo_id=repo_id,
+            model=model,
+            model_dir=args.model_dir,
+            sample_rate=args.sample_rate,
+            g2p=False,
+        )
+        results = pipeline.generate_from_corpus(reader, voice=args.voice, speed=args.speed)
+        samples = write_audio(args.output_file, results, args.format, args.sample_rate)
+    logger.info(f"Rendered {samples / args.sample_rate:.1f}s of audio")
+    print(args.output_file)
+
+
+commands = {
+    "prefetch": prefetch,
+    "convert": convert,
+    "pack-voices": pack_voices,
+    "longform": longform,
+    "phonemize": phonemize,
+    "render-corpus": render_corpus,
+}
 
 
 def main() -> None:
+    argv = sys.argv[1:]
+    if argv and argv[0] in commands:
+        return commands[argv[0]](argv[1:])
+
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "-m",
@@ -84,8 +609,36 @@ def main() -> None:
         "--output-file",
         "--output_file",
         type=Path,
-        help="Path to output WAV file",
-        required=True,
+        default=Path("-"),
+        help="Path to output WAV file, or - to stream to stdout (default)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=formats,
+        default="wav",
+        help="Output format: WAV, FLAC, Ogg/Opus, or raw mono PCM (s16le, f32le)",
+    )
+    parser.add_argument(
+        "--sample-rate",
+        type=int,
+        default=SAMPLE_RATE,
+        help="Output sample rate, e.g. 8000 or 16000 for telephony, 48000 for browsers",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="JSONL batch of jobs (text or file, voice, speed, language, output) rendered by worker processes",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for --manifest (default: one per core / --threads-per-worker)",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=1,
+        help="Torch threads per --manifest worker",
     )
     parser.add_argument(
         "-i",
@@ -106,16 +659,41 @@ def main() -> None:
         default=1.0,
         help="Speech speed",
     )
+    parser.add_argument(
+        "--model-dir",
+        help="Local directory with config.json, weights and voices "
+        "(default: KOKORO_MODEL_DIR, else the HF hub)",
+    )
+    parser.add_argument(
+        "--warmup",
+        action="store_true",
+        help="Preload the voice and warm the model at representative lengths before "
+        "synthesizing (in every worker with --manifest)",
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
         help="Print DEBUG messages to console",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     if args.debug:
         logger.level("DEBUG")
     logger.debug(args)
 
+    if args.manifest:
+        return run_manifest(
+            args.manifest,
+            voice=args.voice,
+            speed=args.speed,
+            language=args.language,
+            workers=args.workers,
+            threads_per_worker=args.threads_per_worker,
+            model_dir=args.model_dir,
+            warmup=args.warmup,
+            fmt=args.format,
+            sample_rate=args.sample_rate,
+        )
+
     lang = args.language or args.voice[0]
 
     if args.text is not None and args.input_file is not None:
@@ -126,13 +704,51 @@ def main() -> None:
         file: Path = args.input_file
         text = file.read_text()
     else:
-        import sys
-        print("Press Ctrl+D to stop reading input and start generating", flush=True)
+        print("Press Ctrl+D to stop reading input and start generating", file=sys.stderr, flush=True)
         text = '\n'.join(sys.stdin)
 
     logger.debug(f"Input text: {text!r}")
 
     out_file: Path = args.output_file
+    if str(out_file) == "-":
+        if sys.stdout.isatty():
+            parser.error("refusing to write audio to a terminal, use -o FILE or pipe stdout")
+        # Keep stray print()s from dependencies out of the audio stream
+        stdout = sys.stdout
+        out, sys.stdout = stdout.buffer, sys.stderr
+        try:
+            stream_audio(
+                out,
+                text=text,
+                kokoro_language=lang,
+                voice=args.voice,
+                speed=args.speed,
+                model_dir=args.model_dir,
+                fmt=args.format,
+                sample_rate=args.sample_rate,
+                warmup=args.warmup,
+            )
+        except BrokenPipeError:
+            # The reader (e.g. aplay, head) went away; don't raise again on exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+            sys.exit(1)
+        finally:
+            sys.stdout = stdout
+        return
+    if args.format != "wav":
+        with out_file.open("wb") as f:
+            stream_audio(
+                f,
+                text=text,
+                kokoro_language=lang,
+                voice=args.voice,
+                speed=args.speed,
+                model_dir=args.model_dir,
+                fmt=args.format,
+                sample_rate=args.sample_rate,
+                warmup=args.warmup,
+            )
+        return
     if not out_file.suffix == ".wav":
         logger.warning("The output file name should end with .wav")
     generate_and_save_audio(
@@ -141,6 +757,9 @@ def main() -> None:
         kokoro_language=lang,
         voice=args.voice,
         speed=args.speed,
+        model_dir=args.model_dir,
+        sample_rate=args.sample_rate,
+        warmup=args.warmup,
     )
 
 
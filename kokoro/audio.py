@@ -0,0 +1,371 @@
+'''
+Output stage: turns KPipeline results into encoded audio.
+
+to_int16 / PCM16Encoder convert float audio to clipped, rounded int16, reusing
+preallocated buffers instead of allocating per chunk. Writers encode chunks to
+a file object as they arrive, in any of FORMATS:
+    wav     16-bit PCM WAV (sizes patched on close if the file is seekable,
+            otherwise an open-ended streaming header)
+    flac    16-bit FLAC
+    opus    Ogg/Opus
+    s16le   headerless 16-bit little-endian PCM
+    f32le   headerless 32-bit float little-endian PCM
+write_results() drains a Result iterable into a file with encoding on a
+background thread, so it overlaps synthesis. encode_stream() yields encoded
+bytes per chunk, for HTTP responses and pipes. Resampler converts the model's
+24 kHz output to other rates chunk by chunk (see KPipeline's sample_rate).
+'''
+from typing import BinaryIO, Dict, Generator, Iterable, Optional, Tuple, Union
+import math
+import numpy as np
+import queue
+import soundfile as sf
+import struct
+import threading
+import torch
+
+SAMPLE_RATE = 24000
+
+FORMATS = ('wav', 'flac', 'opus', 's16le', 'f32le')
+
+Audio = Union[torch.Tensor, np.ndarray]
+
+def _as_numpy(audio: Audio) -> np.ndarray:
+    if isinstance(audio, torch.Tensor):
+        audio = audio.detach().cpu().numpy()
+    return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+class Resampler:
+    '''
+    Stateful polyphase resampler for chunked audio.
+
+    The rate ratio is reduced to new/orig (e.g. 24000 -> 16000 is 2/3). Each of
+    the `new` output phases has its own Hann-windowed sinc kernel over the input,
+    and all phases are computed by one strided conv1d. Input history carries
+    over between calls, so resampling a stream chunk by chunk gives the same
+    samples as resampling it in one piece. Output lags input by the filter's
+    half-width (lowpass_filter_width zero crossings, under 1 ms at 24 kHz);
+    flush() returns the rest once the stream ends.
+    '''
+    def __init__(
+        self,
+        orig_freq: int = SAMPLE_RATE,
+        new_freq: int = SAMPLE_RATE,
+        lowpass_filter_width: int = 6,
+        rolloff: float = 0.99
+    ):
+        gcd = math.gcd(orig_freq, new_freq)
+        self.orig, self.new = orig_freq // gcd, new_freq // gcd
+        base_freq = min(self.orig, self.new) * rolloff
+        self.width = math.ceil(lowpass_filter_width * self.orig / base_freq)
+        idx = torch.arange(-self.width, self.width + self.orig, dtype=torch.float64) / self.orig
+        t = torch.arange(0, -self.new, -1, dtype=torch.float64)[:, None] / self.new + idx[None, :]
+        t = (t * base_freq).clamp(-lowpass_filter_width, lowpass_filter_width)
+        window = torch.cos(t * math.pi / lowpass_filter_width / 2) ** 2
+        t = t * math.pi
+        sinc = torch.where(t == 0, torch.ones_like(t), torch.sin(t) / t)
+        self.kernel = (sinc * window * base_freq / self.orig).unsqueeze(1)
+        self._kernels: Dict[Tuple[torch.device, torch.dtype], torch.Tensor] = {}
+        self.reset()
+
+    def reset(self):
+        '''Starts a new stream.'''
+        self._buffer = None
+        self._consumed = 0
+        self._frames = 0
+
+    def _resample(self, buffer: torch.Tensor, frames: int) -> torch.Tensor:
+        key = (buffer.device, buffer.dtype)
+        if key not in self._kernels:
+            self._kernels[key] = self.kernel.to(device=buffer.device, dtype=buffer.dtype)
+        span = (frames - 1) * self.orig + self.kernel.shape[-1]
+        y = torch.nn.functional.conv1d(buffer[None, None, :span], self._kernels[key], stride=self.orig)
+        return y[0].t().reshape(-1)
+
+    def _step(self, chunk: torch.Tensor, final: bool) -> torch.Tensor:
+        if self._buffer is None:
+            self._buffer = chunk.new_zeros(self.width)
+        self._consumed += chunk.shape[-1]
+        buffer = torch.cat([self._buffer, chunk])
+        if final:
+            buffer = torch.cat([buffer, buffer.new_zeros(self.width + self.orig)])
+            # Output covers ceil(consumed * new / orig) samples in total
+            total = -(-self._consumed * self.new // self.orig)
+            frames = -(-total // self.new) - self._frames
+        else:
+            # Frame f needs input up to f*orig + width + orig (buffer starts at frame self._frames)
+            frames = max(0, (buffer.shape[-1] - self.kernel.shape[-1]) // self.orig + 1)
+        out = self._resample(buffer, frames) if frames > 0 else buffer.new_zeros(0)
+        self._frames += max(frames, 0)
+        self._buffer = buffer[max(frames, 0) * self.orig:]
+        if final:
+            out = out[:max(0, total - (self._frames - frames) * self.new)]
+            self.reset()
+        return out
+
+    def __call__(self, chunk: Audio) -> torch.Tensor:
+        '''Resamples the next chunk of a stream; returns as many output samples as are ready.'''
+        if not isinstance(chunk, torch.Tensor):
+            chunk = torch.from_numpy(np.asarray(chunk, dtype=np.float32))
+        if self.orig == self.new:
+            return chunk
+        return self._step(chunk.reshape(-1), final=False)
+
+    def flush(self) -> torch.Tensor:
+        '''Returns the remaining output and resets the stream.'''
+        if self.orig == self.new or self._buffer is None:
+            self.reset()
+            return torch.zeros(0)
+        return self._step(self._buffer.new_zeros(0), final=True)
+
+def to_int16(
+    audio: Audio,
+    out: Optional[np.ndarray] = None,
+    scratch: Optional[np.ndarray] = None,
+    dither: bool = False
+) -> np.ndarray:
+    '''
+    Float audio in [-1, 1] to little-endian int16, rounded and clipped.
+
+    out and scratch (float32, at least len(audio)) are written in place when
+    given; otherwise they are allocated. dither adds triangular (TPDF) noise of
+    one LSB before rounding, which decorrelates quantization error in quiet passages.
+    '''
+    x = _as_numpy(audio)
+    n = len(x)
+    out = np.empty(n, dtype='<i2') if out is None else out[:n]
+    scratch = np.empty(n, dtype=np.float32) if scratch is None else scratch[:n]
+    np.multiply(x, 32767, out=scratch)
+    if dither:
+        rng = np.random.default_rng()
+        scratch += rng.random(n, dtype=np.float32)
+        scratch -= rng.random(n, dtype=np.float32)
+    np.rint(scratch, out=scratch)
+    np.clip(scratch, -32768, 32767, out=scratch)
+    out[...] = scratch
+    return out
+
+class PCM16Encoder:
+    '''
+    Reusable float -> int16 converter. The returned array is a view into an
+    internal buffer that grows to the largest chunk seen, so it is only valid
+    until the next call; copy it if it must outlive that.
+    '''
+    def __init__(self, capacity: int = 0, dither: bool = False):
+        self.dither = dither
+        self._out = np.empty(capacity, dtype='<i2')
+        self._scratch = np.empty(capacity, dtype=np.float32)
+
+    def __call__(self, audio: Audio) -> np.ndarray:
+        n = audio.shape[-1]
+        if n > len(self._out):
+            self._out = np.empty(n, dtype='<i2')
+            self._scratch = np.empty(n, dtype=np.float32)
+        return to_int16(audio, self._out, self._scratch, self.dither)
+
+def wav_header(sample_rate: int = SAMPLE_RATE, data_size: int = 0xFFFFFFFF) -> bytes:
+    '''16-bit mono PCM WAV header. The default sizes (0xFFFFFFFF) tell players to read until EOF.'''
+    riff_size = 0xFFFFFFFF if data_size == 0xFFFFFFFF else 36 + data_size
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI', b'RIFF', riff_size, b'WAVE', b'fmt ', 16,
+        1, 1, sample_rate, sample_rate * 2, 2, 16, b'data', data_size
+    )
+
+class _AppendOnly:
+    '''
+    Forward-only file wrapper so soundfile can encode to pipes and sockets.
+    Encoders seek back on close to patch headers (e.g. FLAC STREAMINFO); those
+    rewrites are dropped, leaving the stream valid with its length unknown.
+    '''
+    def __init__(self, f: Optional[BinaryIO] = None):
+        self.f = f
+        self.chunks = []
+        self.pos = 0
+        self.cursor = 0
+
+    def write(self, data) -> int:
+        n = len(data)
+        if self.cursor == self.pos:
+            if self.f is None:
+                self.chunks.append(bytes(data))
+            else:
+                self.f.write(data)
+            self.pos += n
+        self.cursor += n
+        return n
+
+    def tell(self) -> int:
+        return self.cursor
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        self.cursor = offset + (0, self.cursor, self.pos)[whence]
+        return self.cursor
+
+    def read(self, size: int = -1) -> bytes:
+        return b''
+
+    def flush(self):
+        if self.f is not None:
+            self.f.flush()
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def _seekable(f) -> bool:
+    try:
+        return f.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+class AudioWriter:
+    '''
+    Encodes float chunks to a binary file object in one of FORMATS. With
+    autoflush, the file is flushed after every chunk (for pipes and sockets).
+    '''
+    def __init__(
+        self,
+        f: BinaryIO,
+        fmt: str = 'wav',
+        sample_rate: int = SAMPLE_RATE,
+        dither: bool = False,
+        autoflush: bool = False
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown format {fmt!r}, expected one of {FORMATS}')
+        self.f = f
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.autoflush = autoflush
+        self.samples = 0
+        self.encoder = PCM16Encoder(dither=dither)
+        self._sf = None
+        self._start = None
+        if fmt == 'wav':
+            if _seekable(f):
+                self._start = f.tell()
+                f.write(wav_header(sample_rate, 0))
+            else:
+                f.write(wav_header(sample_rate))
+        elif fmt in ('flac', 'opus'):
+            target = f if _seekable(f) else _AppendOnly(f)
+            if fmt == 'flac':
+                self._sf = sf.SoundFile(target, 'w', samplerate=sample_rate, channels=1, format='FLAC', subtype='PCM_16')
+            else:
+                self._sf = sf.SoundFile(target, 'w', samplerate=sample_rate, channels=1, format='OGG', subtype='OPUS')
+
+    def write(self, audio: Audio):
+        n = audio.shape[-1]
+        if not n:
+            return
+        if self.fmt == 'f32le':
+            self.f.write(_as_numpy(audio).astype('<f4', copy=False).tobytes())
+        elif self.fmt == 'opus':
+            self._sf.write(np.clip(_as_numpy(audio), -1, 1))
+        elif self.fmt == 'flac':
+            self._sf.write(self.encoder(audio))
+        else:
+            self.f.write(memoryview(self.encoder(audio)).cast('B'))
+        self.samples += n
+        if self.autoflush:
+            self.flush()
+
+    def flush(self):
+        if self._sf is not None:
+            self._sf.flush()
+        self.f.flush()
+
+    def close(self):
+        '''Finishes the stream (FLAC/Opus trailers, WAV sizes). The file object itself stays open.'''
+        if self._sf is not None:
+            self._sf.close()
+        elif self._start is not None:
+            end = self.f.tell()
+            self.f.seek(self._start)
+            self.f.write(wav_header(self.sample_rate, min(2 * self.samples, 0xFFFFFFFE)))
+            self.f.seek(end)
+        self.f.flush()
+
+    def __enter__(self) -> 'AudioWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BackgroundWriter:
+    '''
+    Runs an AudioWriter on its own thread. write() hands the chunk over and
+    returns, so encoding and I/O overlap the next chunk's synthesis. At most
+    max_pending chunks are queued before write() blocks. Errors from the
+    encoder thread are re-raised by the next write() or by close().
+    '''
+    def __init__(self, writer: AudioWriter, max_pending: int = 4):
+        self.writer = writer
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='kokoro-audio-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while (audio := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self.writer.write(audio)
+                except Exception as e:
+                    self._error = e
+
+    def _raise(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, audio: Audio):
+        self._raise()
+        self._queue.put(audio)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._raise()
+        self.writer.close()
+
+def write_results(
+    results: Iterable,
+    f: BinaryIO,
+    fmt: str = 'wav',
+    sample_rate: int = SAMPLE_RATE,
+    background: bool = True,
+    dither: bool = False,
+    autoflush: bool = False
+) -> int:
+    '''Encodes the audio of every KPipeline.Result in results to f. Returns the number of samples written.'''
+    writer = AudioWriter(f, fmt, sample_rate, dither, autoflush)
+    sink = BackgroundWriter(writer) if background else writer
+    try:
+        for result in results:
+            if result.audio is not None:
+                sink.write(result.audio)
+    finally:
+        sink.close()
+    return writer.samples
+
+def encode_stream(
+    results: Iterable,
+    fmt: str = 'wav',
+    sample_rate: int = SAMPLE_RATE,
+    dither: bool = False
+) -> Generator[bytes, None, None]:
+    '''Yields encoded bytes for each KPipeline.Result as soon as it is produced.'''
+    sink = _AppendOnly()
+    writer = AudioWriter(sink, fmt, sample_rate, dither)
+    if header := sink.drain():
+        yield header
+    for result in results:
+        if result.audio is not None:
+            writer.write(result.audio)
+            if data := sink.drain():
+                yield data
+    writer.close()
+    if data := sink.drain():
+        yield data
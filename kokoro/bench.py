@@ -0,0 +1,263 @@
+"""Kokoro micro-benchmarks
+Example usage:
+python3 -m kokoro.bench resample --rates 8000 16000 48000 --chunk-ms 250
+python3 -m kokoro.bench stft --n-fft 20 --hop 5
+python3 -m kokoro.bench sinegen --seconds 10
+python3 -m kokoro.bench encoders --lengths 64 64
+python3 -m kokoro.bench autotune --voice af_heart
+python3 -m kokoro.bench chunking --input-file demo/gatsby5k.md --first-chunk 0 50 100
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from typing import Callable, List
+
+import torch
+from loguru import logger
+
+SAMPLE_RATE = 24000
+
+
+def timeit(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> float:
+    """Best wall time of repeat runs, in seconds."""
+    for _ in range(warmup):
+        fn()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def resample(argv: List[str]) -> None:
+    from kokoro.audio import Resampler
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro.bench resample",
+        description="Real-time factor of the streaming resampler on 24 kHz audio",
+    )
+    parser.add_argument("--rates", type=int, nargs="+", default=[8000, 16000, 22050, 44100, 48000])
+    parser.add_argument("--seconds", type=float, default=60, help="Audio duration to resample")
+    parser.add_argument("--chunk-ms", type=float, default=250, help="Chunk size fed per call")
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    args = parser.parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    audio = torch.randn(int(args.seconds * SAMPLE_RATE)) * 0.1
+    chunk = max(1, int(args.chunk_ms * SAMPLE_RATE / 1000))
+    chunks = list(audio.split(chunk))
+    print(f"{'rate':>6} {'one-shot RTF':>13} {'chunked RTF':>12}")
+    for rate in args.rates:
+        r = Resampler(SAMPLE_RATE, rate)
+
+        def one_shot():
+            r(audio)
+            r.flush()
+
+        def chunked():
+            for c in chunks:
+                r(c)
+            r.flush()
+
+        print(f"{rate:>6} {timeit(one_shot) / args.seconds:>13.5f} {timeit(chunked) / args.seconds:>12.5f}")
+
+
+def stft(argv: List[str]) -> None:
+    from kokoro.istftnet import STFT_BACKENDS
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro.bench stft",
+        description="Forward and inverse time of each Generator STFT backend",
+    )
+    parser.add_argument("--n-fft", type=int, default=20, help="gen_istft_n_fft (20 in Kokoro-82M)")
+    parser.add_argument("--hop", type=int, default=5, help="gen_istft_hop_size (5 in Kokoro-82M)")
+    parser.add_argument("--seconds", type=float, default=10, help="Audio duration to transform")
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    args = parser.parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    audio = torch.randn(1, int(args.seconds * SAMPLE_RATE)) * 0.1
+    print(f"{'backend':>8} {'transform ms':>13} {'inverse ms':>11}")
+    for name, cls in STFT_BACKENDS.items():
+        module = cls(filter_length=args.n_fft, hop_length=args.hop, win_length=args.n_fft)
+        with torch.no_grad():
+            magnitude, phase = module.transform(audio)
+            forward = timeit(lambda: module.transform(audio))
+            inverse = timeit(lambda: module.inverse(magnitude, phase))
+        print(f"{name:>8} {forward * 1000:>13.2f} {inverse * 1000:>11.2f}")
+
+
+def sinegen(argv: List[str]) -> None:
+    from kokoro.istftnet import SineGen
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro.bench sinegen",
+        description="Harmonic source generation from sample-rate vs frame-rate F0",
+    )
+    parser.add_argument("--seconds", type=float, default=10, help="Audio duration to generate")
+    parser.add_argument("--upsample-scale", type=int, default=300, help="Samples per F0 frame (300 in Kokoro-82M)")
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    args = parser.parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    gen = SineGen(SAMPLE_RATE, args.upsample_scale, harmonic_num=8, voiced_threshold=10)
+    frames = int(args.seconds * SAMPLE_RATE / args.upsample_scale)
+    f0 = torch.rand(1, frames, 1) * 200 + 80
+    upsample = torch.nn.Upsample(scale_factor=args.upsample_scale)
+    with torch.no_grad():
+        sample_rate = timeit(lambda: gen(upsample(f0.transpose(1, 2)).transpose(1, 2)))
+        frame_rate = timeit(lambda: gen.forward_frames(f0))
+    print(f"{'path':>11} {'ms':>8} {'RTF':>8}")
+    for name, seconds in (("sample-rate", sample_rate), ("frame-rate", frame_rate)):
+        print(f"{name:>11} {seconds * 1000:>8.2f} {seconds / args.seconds:>8.5f}")
+
+
+def encoders(argv: List[str]) -> None:
+    from kokoro.modules import ProsodyPredictor, TextEncoder, run_lstm
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro.bench encoders",
+        description="Per-stage time of the LSTM text/duration encoders (Kokoro-82M sizes, random weights)",
+    )
+    parser.add_argument("--lengths", type=int, nargs="+", default=[128],
+                        help="Token count of each batch row; unequal lengths take the packed path")
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    args = parser.parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    text_encoder = TextEncoder(channels=512, kernel_size=5, depth=3, n_symbols=178).eval()
+    predictor = ProsodyPredictor(style_dim=128, d_hid=512, nlayers=3, max_dur=50, dropout=0.2).eval()
+    lengths = torch.tensor(args.lengths)
+    tokens = int(lengths.max())
+    mask = torch.arange(tokens).unsqueeze(0) >= lengths.unsqueeze(1)
+    input_ids = torch.randint(1, 178, (len(lengths), tokens))
+    d_en = torch.randn(len(lengths), 512, tokens)
+    style = torch.randn(len(lengths), 128)
+    with torch.no_grad():
+        d = predictor.text_encoder(d_en, style, lengths, mask)
+        stages = {
+            "text_encoder": lambda: text_encoder(input_ids, lengths, mask),
+            "duration_encoder": lambda: predictor.text_encoder(d_en, style, lengths, mask),
+            "duration_lstm": lambda: run_lstm(predictor.lstm, d, lengths),
+        }
+        print(f"{'stage':>16} {'ms':>8}")
+        for name, fn in stages.items():
+            print(f"{name:>16} {timeit(fn, repeat=20) * 1000:>8.2f}")
+
+
+def autotune(argv: List[str]) -> None:
+    from kokoro import KModel
+    from kokoro.serving import WorkerPool
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro.bench autotune",
+        description="Measure WorkerPool throughput for each threads-per-worker split of this host's cores",
+    )
+    parser.add_argument("--voice", default="af_heart", help="Voice to synthesize with")
+    parser.add_argument("--lang", help="Language code (defaults to the voice prefix)")
+    parser.add_argument("--text", default=(
+        "The quick brown fox jumps over the lazy dog, and then it runs away into the forest "
+        "before anyone can see where it went."
+    ))
+    parser.add_argument("--requests", type=int, default=4, help="Timed requests per worker")
+    parser.add_argument("--threads", type=int, nargs="+", help="Threads-per-worker candidates (default: powers of 2)")
+    parser.add_argument("--repo-id", default="hexgrad/Kokoro-82M")
+    parser.add_argument("--model-dir", help="Local model directory (see `kokoro prefetch`)")
+    args = parser.parse_args(argv)
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    candidates = args.threads or sorted({2**i for i in range(cores.bit_length()) if 2**i <= cores} | {cores})
+    model = KModel(repo_id=args.repo_id, model_dir=args.model_dir)
+    print(f"{'threads':>7} {'workers':>7} {'audio s/s':>10} {'mean latency s':>15}")
+    best = None
+    for threads in candidates:
+        workers = max(1, cores // threads)
+        with WorkerPool(workers=workers, threads_per_worker=threads, repo_id=args.repo_id, model=model,
+                        voices=[args.voice], model_dir=args.model_dir) as pool:
+            submit = lambda: pool.submit(args.text, args.voice, lang_code=args.lang)
+            # One untimed request per worker loads G2P and warms the model
+            for future in [submit() for _ in range(workers)]:
+                future.result()
+            start = time.perf_counter()
+            submitted = {submit(): time.perf_counter() for _ in range(workers * args.requests)}
+            audio, latency = 0.0, 0.0
+            for future in as_completed(submitted):
+                latency += time.perf_counter() - submitted[future]
+                audio += sum(len(r.audio) for r in future.result() if r.audio is not None) / SAMPLE_RATE
+            throughput = audio / (time.perf_counter() - start)
+        print(f"{threads:>7} {workers:>7} {throughput:>10.2f} {latency / len(submitted):>15.2f}")
+        if best is None or throughput > best[1]:
+            best = (threads, throughput)
+    print(f"Best: --threads-per-worker {best[0]} ({max(1, cores // best[0])} workers)")
+
+
+def chunking(argv: List[str]) -> None:
+    from kokoro import KPipeline
+
+    parser = argparse.ArgumentParser(
+        prog="kokoro.bench chunking",
+        description="Time to first audio vs total real-time factor for each KPipeline first_chunk setting",
+    )
+    parser.add_argument("--input-file", default="demo/gatsby5k.md", help="Text to synthesize")
+    parser.add_argument("--voice", default="af_heart", help="Voice to synthesize with")
+    parser.add_argument("--first-chunk", type=int, nargs="+", default=[0, 50, 100, 200],
+                        help="first_chunk values to compare (0 fills every chunk up to 510 phonemes)")
+    parser.add_argument("--chunk-growth", type=float, default=2.0)
+    parser.add_argument("--model-dir", help="Local model directory (see `kokoro prefetch`)")
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    args = parser.parse_args(argv)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    with open(args.input_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    pipeline = KPipeline(lang_code=args.voice[0], repo_id="hexgrad/Kokoro-82M", model_dir=args.model_dir)
+    pipeline.warmup([args.voice])
+    print(f"{'first_chunk':>11} {'chunks':>6} {'TTFA s':>7} {'total s':>8} {'RTF':>7}")
+    for first_chunk in args.first_chunk:
+        pipeline.first_chunk = first_chunk or None
+        pipeline.chunk_growth = args.chunk_growth
+        start = time.perf_counter()
+        ttfa, chunks, audio = None, 0, 0.0
+        for result in pipeline(text, voice=args.voice):
+            if result.audio is None:
+                continue
+            if ttfa is None:
+                ttfa = time.perf_counter() - start
+            chunks += 1
+            audio += len(result.audio) / SAMPLE_RATE
+        total = time.perf_counter() - start
+        print(f"{first_chunk or '-':>11} {chunks:>6} {ttfa:>7.2f} {total:>8.2f} {total / audio:>7.3f}")
+
+
+commands = {
+    "resample": resample,
+    "stft": stft,
+    "sinegen": sinegen,
+    "encoders": encoders,
+    "autotune": autotune,
+    "chunking": chunking,
+}
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    if argv:
+        # `python -m kokoro.bench --autotune` works as well as the subcommand form
+        argv[0] = argv[0].lstrip("-")
+    if not argv or argv[0] not in commands:
+        logger.error(f"Usage: python -m kokoro.bench {{{','.join(commands)}}} [options]")
+        sys.exit(2)
+    commands[argv[0]](argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+'''
+Pre-phonemized corpus files, so G2P and synthesis can run on separate machines.
+
+A quiet KPipeline(model=False) phonemizes and chunks text; CorpusWriter stores
+each chunk it yields, and KPipeline.generate_from_corpus later feeds the stored
+input_ids straight into KModel, without G2P or re-chunking:
+    with CorpusWriter('book.kph', lang_code='a', vocab=vocab, repo_id=repo_id) as writer:
+        for result in KPipeline(lang_code='a', model=False)(text):
+            writer.write(result)
+    for result in pipeline.generate_from_corpus('book.kph', voice='af_heart'):
+        ...
+
+The file is length-prefixed little-endian binary:
+    header   b'KPH1' | u32 n | n bytes of JSON metadata (lang_code, repo_id, vocab hash)
+    record   u32 n | n bytes of payload, repeated until EOF
+    payload  u32 text_index | u32 graphemes | u32 phonemes | u16 ids | u16 tokens
+             | graphemes (utf-8) | phonemes (utf-8) | input_ids (u16 each)
+             | per token: u16 text | u16 start | u16 end | u8 whitespace | text (utf-8)
+Token start/end are character offsets into the chunk's phonemes. Records are
+appended as chunks arrive and read back one at a time, so neither side holds
+the corpus in memory, and a file cut short by a crash is readable up to its
+last complete record.
+'''
+from dataclasses import dataclass
+from loguru import logger
+from typing import BinaryIO, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING, Union
+import hashlib
+import json
+import numpy as np
+import struct
+
+if TYPE_CHECKING:
+    from .pipeline import KPipeline
+    from misaki import en
+
+MAGIC = b'KPH1'
+_LENGTH = struct.Struct('<I')
+_CHUNK = struct.Struct('<IIIHH')
+_TOKEN = struct.Struct('<HHHB')
+
+def vocab_hash(vocab: Dict[str, int]) -> str:
+    '''Identifies a phoneme vocabulary; stored input_ids are only valid for a model with the same one.'''
+    return hashlib.sha1(json.dumps(vocab, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+def token_spans(tokens: List['en.MToken']) -> List[Tuple[int, int]]:
+    '''Phoneme offsets of each token within KPipeline.tokens_to_ps(tokens).'''
+    raw = ''.join((t.phonemes or '') + (' ' if t.whitespace else '') for t in tokens)
+    lead = len(raw) - len(raw.lstrip())
+    spans, pos = [], -lead
+    for t in tokens:
+        n = len(t.phonemes or '')
+        spans.append((max(0, pos), max(0, pos + n)))
+        pos += n + (1 if t.whitespace else 0)
+    return spans
+
+@dataclass
+class CorpusChunk:
+    text_index: int
+    graphemes: str
+    phonemes: str
+    input_ids: List[int]
+    tokens: Optional[List['en.MToken']] = None
+
+class CorpusWriter:
+    '''Appends KPipeline.Result chunks to a corpus file (see module docstring).'''
+    def __init__(self, file: Union[str, BinaryIO], lang_code: str, vocab: Dict[str, int], repo_id: Optional[str] = None):
+        self._own = isinstance(file, str)
+        self.f = open(file, 'wb') if self._own else file
+        self.vocab = vocab
+        self.chunks = 0
+        metadata = dict(lang_code=lang_code, vocab_hash=vocab_hash(vocab))
+        if repo_id is not None:
+            metadata['repo_id'] = repo_id
+        metadata = json.dumps(metadata).encode()
+        self.f.write(MAGIC + _LENGTH.pack(len(metadata)) + metadata)
+
+    def write(self, result: 'KPipeline.Result', text_index: Optional[int] = None):
+        if not result.phonemes:
+            return
+        graphemes = result.graphemes.encode()
+        phonemes = result.phonemes.encode()
+        input_ids = [0, *(self.vocab[p] for p in result.phonemes if p in self.vocab), 0]
+        tokens = result.tokens or []
+        parts = [
+            _CHUNK.pack(text_index if text_index is not None else result.text_index or 0,
+                        len(graphemes), len(phonemes), len(input_ids), len(tokens)),
+            graphemes, phonemes, np.asarray(input_ids, dtype='<u2').tobytes(),
+        ]
+        for t, (start, end) in zip(tokens, token_spans(tokens)):
+            text = t.text.encode()
+            parts += [_TOKEN.pack(len(text), start, end, 1 if t.whitespace else 0), text]
+        payload = b''.join(parts)
+        self.f.write(_LENGTH.pack(len(payload)) + payload)
+        self.chunks += 1
+
+    def close(self):
+        if self._own:
+            self.f.close()
+        else:
+            self.f.flush()
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CorpusReader:
+    '''Streams CorpusChunks back from a corpus file; metadata holds lang_code, repo_id and vocab_hash.'''
+    def __init__(self, file: Union[str, BinaryIO]):
+        self._own = isinstance(file, str)
+        self.f = open(file, 'rb') if self._own else file
+        if self.f.read(4) != MAGIC:
+            raise ValueError(f'{file} is not a kokoro corpus file')
+        n, = _LENGTH.unpack(self.f.read(_LENGTH.size))
+        self.metadata = json.loads(self.f.read(n))
+
+    @property
+    def lang_code(self) -> str:
+        return self.metadata['lang_code']
+
+    @property
+    def repo_id(self) -> Optional[str]:
+        '''The model repo the corpus was phonemized for, or None for files written without one.'''
+        return self.metadata.get('repo_id')
+
+    def __iter__(self) -> Generator[CorpusChunk, None, None]:
+        while True:
+            head = self.f.read(_LENGTH.size)
+            if len(head) < _LENGTH.size:
+                return
+            n, = _LENGTH.unpack(head)
+            payload = self.f.read(n)
+            if len(payload) < n:
+                logger.warning('Corpus file ends in a partial record; ignoring it')
+                return
+            yield self._parse(payload)
+
+    @staticmethod
+    def _parse(payload: bytes) -> CorpusChunk:
+        text_index, n_graphemes, n_phonemes, n_ids, n_tokens = _CHUNK.unpack_from(payload)
+        pos = _CHUNK.size
+        graphemes = payload[pos:pos+n_graphemes].decode()
+        pos += n_graphemes
+        phonemes = payload[pos:pos+n_phonemes].decode()
+        pos += n_phonemes
+        input_ids = np.frombuffer(payload, dtype='<u2', count=n_ids, offset=pos).tolist()
+        pos += 2 * n_ids
+        tokens = []
+        if n_tokens:
+            # Only needed for timestamps; reading ids and phonemes does not import misaki
+            from misaki import en
+        for _ in range(n_tokens):
+            n_text, start, end, whitespace = _TOKEN.unpack_from(payload, pos)
+            pos += _TOKEN.size
+            text = payload[pos:pos+n_text].decode()
+            pos += n_text
+            tokens.append(en.MToken(text=text, tag='', whitespace=' ' if whitespace else '', phonemes=phonemes[start:end]))
+        return CorpusChunk(text_index, graphemes, phonemes, input_ids, tokens or None)
+
+    def close(self):
+        if self._own:
+            self.f.close()
+
+    def __enter__(self) -> 'CorpusReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
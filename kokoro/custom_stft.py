@@ -1,4 +1,5 @@
 from attr import attr
+import math
 import numpy as np
 import torch
 import torch.nn as nn
@@ -37,7 +38,7 @@ class CustomSTFT(nn.Module):
 
         # Build window
         assert window == 'hann', window
-        window_tensor = torch.hann_window(win_length, periodic=True, dtype=torch.float32)
+        window_tensor = torch.hann_window(win_length, periodic=True, dtype=torch.float32, device='cpu')
         if self.win_length < self.n_fft:
             # Zero-pad up to n_fft
             extra = self.n_fft - self.win_length
@@ -147,7 +148,19 @@ class CustomSTFT(nn.Module):
         # Re-create real/imag => shape (B, freq_bins, frames)
         real_part = magnitude * torch.cos(phase)
         imag_part = magnitude * torch.sin(phase)
+        waveform = self.synthesize(real_part, imag_part)
 
+        # If a specific length is desired, clamp
+        if length is not None:
+            waveform = waveform[..., :length]
+
+        # shape => (B, T)
+        return waveform
+
+    def synthesize(self, real_part: torch.Tensor, imag_part: torch.Tensor):
+        """
+        Inverse STFT from real/imag parts => returns waveform shape (B, 1, T).
+        """
         # conv_transpose wants shape (B, freq_bins, frames). We'll treat "frames" as time dimension
         # so we do (B, freq_bins, frames) => (B, freq_bins, frames)
         # But PyTorch conv_transpose1d expects (B, in_channels, input_length)
@@ -181,13 +194,14 @@ class CustomSTFT(nn.Module):
             # We remove `pad_len` from start & end if possible
             waveform = waveform[..., pad_len:-pad_len]
 
-        # If a specific length is desired, clamp
-        if length is not None:
-            waveform = waveform[..., :length]
-
-        # shape => (B, T)
         return waveform
 
+    def analyze(self, waveform: torch.Tensor):
+        """
+        Forward STFT => returns magnitude and phase stacked, shape (batch, 2 * freq_bins, frames)
+        """
+        return torch.cat(self.transform(waveform), dim=1)
+
     def forward(self, x: torch.Tensor):
         """
         Full STFT -> iSTFT pass: returns time-domain reconstruction.
@@ -195,3 +209,146 @@ class CustomSTFT(nn.Module):
         """
         mag, phase = self.transform(x)
         return self.inverse(mag, phase, length=x.shape[-1])
+
+
+class FFTSTFT(nn.Module):
+    """
+    STFT/iSTFT matching torch.stft/torch.istft (center=True, hann window), with two code paths:
+
+    - eager => frames are windowed and sent through torch.fft.rfft / irfft, and the
+      inverse is overlap-added with F.fold. O(n_fft log n_fft) per frame. Below
+      fft_min_size (Kokoro's generator uses n_fft=20) per-transform FFT overhead
+      dominates, so frames go through one stacked real/imag DFT matmul instead.
+    - tracing / ONNX export => one stacked conv1d (real and imag kernels concatenated)
+      for the forward transform and one conv_transpose1d for the inverse, so there is
+      a single n_fft-wide convolution in each direction and no complex tensors.
+
+    Unlike CustomSTFT, the inverse is exact: DC/Nyquist bins are not doubled and the
+    overlap-added output is divided by the squared-window envelope, as torch.istft does.
+    """
+
+    def __init__(
+        self,
+        filter_length=800,
+        hop_length=200,
+        win_length=800,
+        window="hann",
+        pad_mode="reflect",  # 'replicate' approximates reflect for dynamic-shape ONNX export
+        fft_min_size=64,
+    ):
+        super().__init__()
+        self.filter_length = filter_length
+        self.hop_length = hop_length
+        self.win_length = win_length
+        self.n_fft = filter_length
+        self.pad_mode = pad_mode
+        self.freq_bins = self.n_fft // 2 + 1
+        self.use_fft = self.n_fft >= fft_min_size
+
+        # Same window torch.stft builds: win_length centered inside n_fft
+        assert window == 'hann', window
+        assert win_length <= self.n_fft, win_length
+        window_tensor = torch.hann_window(win_length, periodic=True, dtype=torch.float64, device='cpu')
+        left = (self.n_fft - win_length) // 2
+        window_tensor = F.pad(window_tensor, (left, self.n_fft - win_length - left))
+        # Buffers are derived from the config, so they stay out of the state_dict
+        self.register_buffer("window", window_tensor.float(), persistent=False)
+        self.register_buffer("window_sq", (window_tensor ** 2).float().view(1, 1, -1), persistent=False)
+
+        n = torch.arange(self.n_fft, dtype=torch.float64, device='cpu')
+        k = torch.arange(self.freq_bins, dtype=torch.float64, device='cpu')
+        angle = 2 * math.pi * torch.outer(k, n) / self.n_fft  # (freq_bins, n_fft)
+        sin = torch.sin(angle)
+        # DC/Nyquist imag must be exactly 0 (not ~1e-8), else atan2 flips their phase from pi to -pi
+        sin[0] = 0
+        if self.n_fft % 2 == 0:
+            sin[-1] = 0
+        # Forward: e^{-j 2 pi k n / N} => real=cos, imag=-sin. Stacked as [real; imag] output channels.
+        forward = torch.cat([torch.cos(angle), -sin]) * window_tensor
+        self.register_buffer("weight_forward", forward.float().unsqueeze(1), persistent=False)
+        # Inverse real DFT: every bin except DC (and Nyquist for even n_fft) counts twice
+        scale = torch.full((self.freq_bins, 1), 2.0 / self.n_fft, dtype=torch.float64, device='cpu')
+        scale[0] = 1.0 / self.n_fft
+        if self.n_fft % 2 == 0:
+            scale[-1] = 1.0 / self.n_fft
+        backward = torch.cat([torch.cos(angle) * scale, -sin * scale]) * window_tensor
+        self.register_buffer("weight_backward", backward.float().unsqueeze(1), persistent=False)
+
+    @staticmethod
+    def _exporting():
+        return torch.jit.is_tracing() or torch.onnx.is_in_onnx_export()
+
+    def _spectrum(self, waveform: torch.Tensor):
+        """(B, T) => real, imag, each (B, freq_bins, frames)"""
+        pad_len = self.n_fft // 2
+        x = F.pad(waveform.unsqueeze(1), (pad_len, pad_len), mode=self.pad_mode)
+        if self._exporting():
+            out = F.conv1d(x, self.weight_forward, stride=self.hop_length)
+        else:
+            frames = x.squeeze(1).unfold(-1, self.n_fft, self.hop_length)  # (B, frames, n_fft)
+            if not self.use_fft:
+                out = self.weight_forward.squeeze(1) @ frames.transpose(1, 2)
+            else:
+                spec = torch.fft.rfft(frames * self.window, dim=-1).transpose(1, 2)
+                return spec.real, spec.imag
+        return out[:, :self.freq_bins], out[:, self.freq_bins:]
+
+    def synthesize(self, real: torch.Tensor, imag: torch.Tensor):
+        """
+        Inverse STFT from real/imag parts (B, freq_bins, frames) => returns waveform shape (B, 1, T).
+        """
+        frames = real.shape[-1]
+        if self._exporting():
+            waveform = F.conv_transpose1d(torch.cat([real, imag], dim=1), self.weight_backward, stride=self.hop_length)
+            ones = torch.ones_like(real[:, :1])
+            envelope = F.conv_transpose1d(ones, self.window_sq, stride=self.hop_length)
+        else:
+            if not self.use_fft:
+                frames_td = self.weight_backward.squeeze(1).T @ torch.cat([real, imag], dim=1)
+            else:
+                frames_td = torch.fft.irfft(torch.complex(real, imag), n=self.n_fft, dim=1) * self.window.unsqueeze(-1)
+            # Overlap-add: (B, n_fft, frames) => (B, 1, 1, T)
+            size = (1, (frames - 1) * self.hop_length + self.n_fft)
+            fold = dict(output_size=size, kernel_size=(1, self.n_fft), stride=(1, self.hop_length))
+            waveform = F.fold(frames_td, **fold).squeeze(1)
+            envelope = F.fold(self.window_sq.view(1, -1, 1).expand(1, -1, frames), **fold).squeeze(1)
+        pad_len = self.n_fft // 2
+        end = waveform.shape[-1] - pad_len
+        return waveform[..., pad_len:end] / envelope[..., pad_len:end].clamp(min=1e-11)
+
+    def transform(self, waveform: torch.Tensor):
+        """
+        Forward STFT => returns magnitude, phase
+        Output shape => (batch, freq_bins, frames)
+        """
+        real, imag = self._spectrum(waveform)
+        if self._exporting():
+            # ONNX has no hypot; the epsilon keeps sqrt's gradient finite at 0
+            magnitude = torch.sqrt(real**2 + imag**2 + 1e-14)
+        else:
+            # Exact zeros for silent bins, as torch.stft(...).abs() gives
+            magnitude = torch.hypot(real, imag)
+        phase = torch.atan2(imag, real)
+        if self._exporting():
+            # ONNX atan2 returns -pi where PyTorch returns pi (imag == 0, real < 0)
+            phase = torch.where((imag == 0) & (real < 0), torch.full_like(phase, torch.pi), phase)
+        return magnitude, phase
+
+    def analyze(self, waveform: torch.Tensor):
+        """
+        Forward STFT => returns magnitude and phase stacked, shape (batch, 2 * freq_bins, frames)
+        """
+        return torch.cat(self.transform(waveform), dim=1)
+
+    def inverse(self, magnitude: torch.Tensor, phase: torch.Tensor, length=None):
+        """
+        Inverse STFT => returns waveform shape (B, 1, T).
+        """
+        waveform = self.synthesize(magnitude * torch.cos(phase), magnitude * torch.sin(phase))
+        if length is not None:
+            waveform = waveform[..., :length]
+        return waveform
+
+    def forward(self, x: torch.Tensor):
+        mag, phase = self.transform(x)
+        return self.inverse(mag, phase, length=x.shape[-1])
@@ -0,0 +1,61 @@
+from huggingface_hub import hf_hub_download, snapshot_download
+from huggingface_hub.utils import LocalEntryNotFoundError
+from loguru import logger
+from typing import Dict, Iterable, Optional, Tuple
+import os
+
+MODEL_DIR_ENV = 'KOKORO_MODEL_DIR'
+
+_resolved: Dict[Tuple[str, str, Optional[str]], str] = {}
+
+def get_model_dir(model_dir: Optional[str] = None) -> Optional[str]:
+    '''Returns the local model directory, falling back to $KOKORO_MODEL_DIR.'''
+    return model_dir or os.environ.get(MODEL_DIR_ENV) or None
+
+def resolve(repo_id: str, filename: str, model_dir: Optional[str] = None) -> str:
+    '''
+    Resolves a repo file (e.g. config.json, voices/af_heart.pt) to a local path.
+
+    A model directory mirrors the HF repo layout: config.json, the weights and
+    voices/*.pt side by side. If one is given (or set via $KOKORO_MODEL_DIR),
+    files are read from it and the hub is never contacted. Otherwise the HF
+    cache is tried first, and only a cache miss goes to the network.
+
+    Resolved paths are cached for the lifetime of the process, so repeated
+    KModel/KPipeline construction does not stat the cache again.
+    '''
+    model_dir = get_model_dir(model_dir)
+    key = (repo_id, filename, model_dir)
+    if key in _resolved:
+        return _resolved[key]
+    if model_dir:
+        path = os.path.join(model_dir, filename)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"{filename} not found in model directory {model_dir}. Run `kokoro prefetch --model-dir {model_dir}` first.")
+    else:
+        try:
+            path = hf_hub_download(repo_id=repo_id, filename=filename, local_files_only=True)
+        except LocalEntryNotFoundError:
+            logger.debug(f"{filename} not in HF cache, downloading from {repo_id}")
+            path = hf_hub_download(repo_id=repo_id, filename=filename)
+    _resolved[key] = path
+    return path
+
+def prefetch(
+    repo_id: str,
+    model_name: str,
+    lang_codes: Iterable[str] = (),
+    voices: Iterable[str] = (),
+    model_dir: Optional[str] = None
+) -> str:
+    '''
+    Downloads config.json, the weights and the requested voices in one pass.
+    Every voice for each of lang_codes is included. If model_dir is given, the
+    files are materialized there (ready for air-gapped use), otherwise into the
+    HF cache. Returns the directory holding the files.
+    '''
+    patterns = ['config.json', model_name]
+    patterns += [f'voices/{l}*.pt' for l in lang_codes]
+    patterns += [f'voices/{v}.pt' for v in voices]
+    logger.debug(f"Prefetching {patterns} from {repo_id}")
+    return snapshot_download(repo_id=repo_id, allow_patterns=patterns, local_dir=get_model_dir(model_dir))
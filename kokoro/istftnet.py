@@ -1,5 +1,5 @@
 # ADAPTED from https://github.com/yl4579/StyleTTS2/blob/main/Modules/istftnet.py
-from kokoro.custom_stft import CustomSTFT
+from kokoro.custom_stft import CustomSTFT, FFTSTFT
 from torch.nn.utils.parametrizations import weight_norm
 import math
 import torch
@@ -84,7 +84,7 @@ class TorchSTFT(nn.Module):
         self.hop_length = hop_length
         self.win_length = win_length
         assert window == 'hann', window
-        self.window = torch.hann_window(win_length, periodic=True, dtype=torch.float32)
+        self.window = torch.hann_window(win_length, periodic=True, dtype=torch.float32, device='cpu')
 
     def transform(self, input_data):
         forward_transform = torch.stft(
@@ -93,10 +93,23 @@ class TorchSTFT(nn.Module):
             return_complex=True)
         return torch.abs(forward_transform), torch.angle(forward_transform)
 
+    def analyze(self, input_data):
+        # Same as torch.cat(self.transform(input_data), dim=1), but abs/angle on complex
+        # tensors are slow on CPU; hypot/atan2 on contiguous real/imag planes give identical results
+        forward_transform = torch.stft(
+            input_data,
+            self.filter_length, self.hop_length, self.win_length, window=self.window.to(input_data.device),
+            return_complex=True)
+        real, imag = torch.view_as_real(forward_transform).movedim(-1, 0).contiguous()
+        return torch.cat([torch.hypot(real, imag), torch.atan2(imag, real)], dim=1)
+
     def inverse(self, magnitude, phase):
+        return self.synthesize(magnitude * torch.cos(phase), magnitude * torch.sin(phase))
+
+    def synthesize(self, real, imag):
         inverse_transform = torch.istft(
-            magnitude * torch.exp(phase * 1j),
-            self.filter_length, self.hop_length, self.win_length, window=self.window.to(magnitude.device))
+            torch.complex(real, imag),
+            self.filter_length, self.hop_length, self.win_length, window=self.window.to(real.device))
         return inverse_transform.unsqueeze(-2)  # unsqueeze to stay consistent with conv_transpose1d implementation
 
     def forward(self, input_data):
@@ -105,6 +118,11 @@ class TorchSTFT(nn.Module):
         return reconstruction
 
 
+# 'fft' is FFTSTFT: exact like 'torch', but below its fft_min_size (64) it runs a stacked
+# DFT matmul rather than torch.fft, so with Kokoro's n_fft=20 no FFT is involved
+STFT_BACKENDS = {'torch': TorchSTFT, 'custom': CustomSTFT, 'fft': FFTSTFT}
+
+
 class SineGen(nn.Module):
     """ Definition of sine generator
     SineGen(samp_rate, harmonic_num = 0,
@@ -189,9 +207,8 @@ class SineGen(nn.Module):
         output sine_tensor: tensor(batchsize=1, length, dim)
         output uv: tensor(batchsize=1, length, 1)
         """
-        f0_buf = torch.zeros(f0.shape[0], f0.shape[1], self.dim, device=f0.device)
         # fundamental component
-        fn = torch.multiply(f0, torch.FloatTensor([[range(1, self.harmonic_num + 2)]]).to(f0.device))
+        fn = f0 * torch.arange(1, self.dim + 1, dtype=f0.dtype, device=f0.device)
         # generate sine waveforms
         sine_waves = self._f02sine(fn) * self.sine_amp
         # generate uv signal
@@ -208,6 +225,31 @@ class SineGen(nn.Module):
         sine_waves = sine_waves * uv + noise
         return sine_waves, uv, noise
 
+    def forward_frames(self, f0):
+        """ sine_tensor, uv, noise = forward_frames(f0)
+        input F0: tensor(batchsize, frames, 1) at frame rate
+        Same result as forward() on f0 nearest-upsampled by upsample_scale,
+        without the upsample -> interpolate down -> cumsum -> interpolate up
+        round trip: forward() averages two equal samples of each frame when it
+        interpolates down, so the per-frame phase increments are computed here
+        directly and only the final phase interpolation and sin run per sample.
+        The random initial phase of forward() lands on a sample that the
+        downsampling never reads, so it has no counterpart here.
+        """
+        if self.flag_for_pulse:
+            return self(torch.repeat_interleave(f0, self.upsample_scale, dim=1))
+        harmonics = torch.arange(1, self.dim + 1, dtype=f0.dtype, device=f0.device)
+        rad_values = (f0 * harmonics / self.sampling_rate) % 1  # (batchsize, frames, dim)
+        phase = torch.cumsum(rad_values, dim=1) * 2 * torch.pi
+        # One interpolation expands every harmonic to sample rate; sin and amplitude are applied in place
+        sines = F.interpolate(phase.transpose(1, 2) * self.upsample_scale, scale_factor=self.upsample_scale, mode="linear")
+        sines = sines.sin_().mul_(self.sine_amp).transpose(1, 2)  # (batchsize, length, dim)
+        uv = torch.repeat_interleave(self._f02uv(f0), self.upsample_scale, dim=1)
+        noise_amp = uv * self.noise_std + (1 - uv) * self.sine_amp / 3
+        # randn_like would follow the transposed strides of sines, which is several times slower
+        noise = noise_amp * torch.randn(sines.shape, dtype=sines.dtype, device=sines.device)
+        return sines * uv + noise, uv, noise
+
 
 class SourceModuleHnNSF(nn.Module):
     """ SourceModule for hn-nsf
@@ -238,16 +280,17 @@ class SourceModuleHnNSF(nn.Module):
         self.l_linear = nn.Linear(harmonic_num + 1, 1)
         self.l_tanh = nn.Tanh()
 
-    def forward(self, x):
+    def forward(self, x, frame_rate=False):
         """
         Sine_source, noise_source = SourceModuleHnNSF(F0_sampled)
         F0_sampled (batchsize, length, 1)
         Sine_source (batchsize, length, 1)
         noise_source (batchsize, length 1)
+        frame_rate: F0_sampled is (batchsize, frames, 1), not yet upsampled
         """
         # source for harmonic branch
         with torch.no_grad():
-            sine_wavs, uv, _ = self.l_sin_gen(x)
+            sine_wavs, uv, _ = self.l_sin_gen.forward_frames(x) if frame_rate else self.l_sin_gen(x)
         sine_merge = self.l_tanh(self.l_linear(sine_wavs))
         # source for noise branch, in the same shape as uv
         noise = torch.randn_like(uv) * self.sine_amp / 3
@@ -255,7 +298,7 @@ class SourceModuleHnNSF(nn.Module):
 
 
 class Generator(nn.Module):
-    def __init__(self, style_dim, resblock_kernel_sizes, upsample_rates, upsample_initial_channel, resblock_dilation_sizes, upsample_kernel_sizes, gen_istft_n_fft, gen_istft_hop_size, disable_complex=False):
+    def __init__(self, style_dim, resblock_kernel_sizes, upsample_rates, upsample_initial_channel, resblock_dilation_sizes, upsample_kernel_sizes, gen_istft_n_fft, gen_istft_hop_size, disable_complex=False, stft_backend=None):
         super(Generator, self).__init__()
         self.num_kernels = len(resblock_kernel_sizes)
         self.num_upsamples = len(upsample_rates)
@@ -263,7 +306,6 @@ class Generator(nn.Module):
                     sampling_rate=24000,
                     upsample_scale=math.prod(upsample_rates) * gen_istft_hop_size,
                     harmonic_num=8, voiced_threshod=10)
-        self.f0_upsamp = nn.Upsample(scale_factor=math.prod(upsample_rates) * gen_istft_hop_size)
         self.noise_convs = nn.ModuleList()
         self.noise_res = nn.ModuleList()
         self.ups = nn.ModuleList()
@@ -290,19 +332,20 @@ class Generator(nn.Module):
         self.ups.apply(init_weights)
         self.conv_post.apply(init_weights)
         self.reflection_pad = nn.ReflectionPad1d((1, 0))
-        self.stft = (
-            CustomSTFT(filter_length=gen_istft_n_fft, hop_length=gen_istft_hop_size, win_length=gen_istft_n_fft)
-            if disable_complex
-            else TorchSTFT(filter_length=gen_istft_n_fft, hop_length=gen_istft_hop_size, win_length=gen_istft_n_fft)
+        # 'torch': torch.stft/istft (complex ops), 'custom': conv-based for ONNX export,
+        # 'fft': exact and fastest on CPU (a DFT matmul at small n_fft), with a single stacked conv when exported
+        if stft_backend is None:
+            stft_backend = 'custom' if disable_complex else 'torch'
+        self.stft_backend = stft_backend
+        self.stft = STFT_BACKENDS[stft_backend](
+            filter_length=gen_istft_n_fft, hop_length=gen_istft_hop_size, win_length=gen_istft_n_fft
         )
 
     def forward(self, x, s, f0):
         with torch.no_grad():
-            f0 = self.f0_upsamp(f0[:, None]).transpose(1, 2)  # bs,n,t
-            har_source, noi_source, uv = self.m_source(f0)
+            har_source, noi_source, uv = self.m_source(f0[:, :, None], frame_rate=True)
             har_source = har_source.transpose(1, 2).squeeze(1)
-            har_spec, har_phase = self.stft.transform(har_source)
-            har = torch.cat([har_spec, har_phase], dim=1)
+            har = self.stft.analyze(har_source)
         for i in range(self.num_upsamples):
             x = F.leaky_relu(x, negative_slope=0.1) 
             x_source = self.noise_convs[i](har)
@@ -320,9 +363,12 @@ class Generator(nn.Module):
             x = xs / self.num_kernels
         x = F.leaky_relu(x)
         x = self.conv_post(x)
-        spec = torch.exp(x[:,:self.post_n_fft // 2 + 1, :])
-        phase = torch.sin(x[:, self.post_n_fft // 2 + 1:, :])
-        return self.stft.inverse(spec, phase)
+        # conv_post predicts log-magnitude and pre-sine phase; go straight to the
+        # real/imag parts the inverse transform consumes, with no complex exp in between
+        bins = self.post_n_fft // 2 + 1
+        magnitude = torch.exp(x[:, :bins, :])
+        phase = torch.sin(x[:, bins:, :])
+        return self.stft.synthesize(magnitude * torch.cos(phase), magnitude * torch.sin(phase))
 
 
 class UpSample1d(nn.Module):
@@ -389,7 +435,7 @@ class Decoder(nn.Module):
                  resblock_dilation_sizes,
                  upsample_kernel_sizes,
                  gen_istft_n_fft, gen_istft_hop_size,
-                 disable_complex=False):
+                 disable_complex=False, stft_backend=None):
         super().__init__()
         self.encode = AdainResBlk1d(dim_in + 2, 1024, style_dim)
         self.decode = nn.ModuleList()
@@ -402,7 +448,8 @@ class Decoder(nn.Module):
         self.asr_res = nn.Sequential(weight_norm(nn.Conv1d(512, 64, kernel_size=1)))
         self.generator = Generator(style_dim, resblock_kernel_sizes, upsample_rates, 
                                    upsample_initial_channel, resblock_dilation_sizes, 
-                                   upsample_kernel_sizes, gen_istft_n_fft, gen_istft_hop_size, disable_complex=disable_complex)
+                                   upsample_kernel_sizes, gen_istft_n_fft, gen_istft_hop_size,
+                                   disable_complex=disable_complex, stft_backend=stft_backend)
 
     def forward(self, asr, F0_curve, N, s):
         F0 = self.F0_conv(F0_curve.unsqueeze(1))
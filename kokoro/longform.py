@@ -0,0 +1,163 @@
+'''
+Resumable rendering of book-length text.
+
+render() reads the input one line at a time. Each line is one KPipeline segment,
+and every chunk the pipeline yields is written to its own WAV file in the work
+directory. The work directory also holds an append-only manifest.jsonl:
+    {"input": ..., "voice": ..., "speed": ..., "sample_rate": ...} header
+    {"line": 12, "chunk": 0, "file": ..., "samples": ..., "text": ..., "words": [...]}
+    {"line": 12, "done": true, "chunks": 2}
+A line counts as rendered once its "done" record is on disk. Running render()
+again on the same work directory skips those lines, and only the line that was
+in progress is synthesized again. Segments are written at the pipeline's
+sample_rate. concat() then streams them into one WAV file at that rate and
+writes an SRT sidecar with one cue per chunk.
+'''
+from .audio import AudioWriter
+from .pipeline import KPipeline
+from loguru import logger
+from typing import Dict, Generator, List, Optional, Union
+import json
+import os
+import torch
+import wave
+
+# Manifests written before the header recorded sample_rate were always 24 kHz
+SAMPLE_RATE = 24000
+MANIFEST = 'manifest.jsonl'
+
+def _write_wav(path: str, audio: torch.FloatTensor, sample_rate: int):
+    tmp = path + '.part'
+    with open(tmp, 'wb') as f, AudioWriter(f, 'wav', sample_rate) as writer:
+        writer.write(audio)
+    os.replace(tmp, path)
+
+def _words(result: KPipeline.Result) -> List[list]:
+    if not result.tokens:
+        return []
+    return [[t.text, t.start_ts, t.end_ts] for t in result.tokens if t.start_ts is not None]
+
+def read_manifest(work_dir: str) -> Generator[Dict, None, None]:
+    '''Yields the chunk records of completed lines, in order. Retries of a line replace earlier attempts.'''
+    path = os.path.join(work_dir, MANIFEST)
+    if not os.path.exists(path):
+        return
+    pending: Dict[int, List[Dict]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final record from a crash
+                continue
+            if 'line' not in record:
+                continue
+            if record.get('done'):
+                chunks = pending.pop(record['line'], [])
+                yield from chunks[:record['chunks']]
+            else:
+                if record['chunk'] == 0:
+                    pending[record['line']] = []
+                pending.setdefault(record['line'], []).append(record)
+
+def _read_header(path: str) -> Optional[Dict]:
+    '''The manifest's header record, or None if it is missing or was torn by a crash.'''
+    with open(path, 'r', encoding='utf-8') as f:
+        line = f.readline()
+    if not line.endswith('\n'):
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+def render(
+    pipeline: KPipeline,
+    input_file: str,
+    work_dir: str,
+    voice: Union[str, torch.FloatTensor],
+    speed: float = 1
+) -> int:
+    '''Renders input_file into work_dir, resuming if it was interrupted. Returns the number of lines rendered now.'''
+    os.makedirs(os.path.join(work_dir, 'segments'), exist_ok=True)
+    header = dict(
+        input=os.path.abspath(input_file), voice=voice if isinstance(voice, str) else 'tensor', speed=speed,
+        sample_rate=pipeline.sample_rate
+    )
+    path = os.path.join(work_dir, MANIFEST)
+    done = set()
+    if os.path.exists(path) and _read_header(path) is None:
+        # A crash while writing the header: no record follows it, so start over
+        logger.warning(f'{path} has a torn header; starting a new manifest')
+        os.remove(path)
+    if os.path.exists(path):
+        first = _read_header(path)
+        first.setdefault('sample_rate', SAMPLE_RATE)
+        if first != header:
+            raise ValueError(f'{work_dir} was rendered with {first}, not {header}; use a new work directory')
+        done = {r['line'] for r in read_manifest(work_dir)}
+        with open(path, 'rb+') as f:
+            # Terminate a torn final record so the next append starts on a fresh line
+            if f.seek(0, os.SEEK_END) and (f.seek(-1, os.SEEK_END), f.read(1))[1] != b'\n':
+                f.write(b'\n')
+        logger.info(f'Resuming {input_file}: {len(done)} lines already rendered')
+    rendered = 0
+    with open(path, 'a', encoding='utf-8') as manifest, open(input_file, 'r', encoding='utf-8') as f:
+        def append(record: Dict):
+            manifest.write(json.dumps(record, ensure_ascii=False) + '\n')
+            manifest.flush()
+            os.fsync(manifest.fileno())
+        if manifest.tell() == 0:
+            append(header)
+        for index, line in enumerate(f):
+            if index in done or not line.strip():
+                continue
+            chunks = 0
+            for result in pipeline(line.strip(), voice=voice, speed=speed, split_pattern=None):
+                if result.audio is None:
+                    continue
+                name = os.path.join('segments', f'{index:07d}_{chunks:03d}.wav')
+                _write_wav(os.path.join(work_dir, name), result.audio, pipeline.sample_rate)
+                append(dict(
+                    line=index, chunk=chunks, file=name, samples=len(result.audio),
+                    text=result.graphemes, words=_words(result)
+                ))
+                chunks += 1
+            append(dict(line=index, done=True, chunks=chunks))
+            rendered += 1
+    return rendered
+
+def _srt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    return f'{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}'
+
+def concat(work_dir: str, output_file: str, srt_file: Optional[str] = None) -> float:
+    '''
+    Joins the rendered segments into output_file (and cues into srt_file), at
+    the segments' sample rate. Returns the duration in seconds.
+    '''
+    offset = cues = 0
+    sample_rate = SAMPLE_RATE
+    srt = open(srt_file, 'w', encoding='utf-8') if srt_file else None
+    try:
+        with wave.open(output_file, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(sample_rate)
+            for index, record in enumerate(read_manifest(work_dir)):
+                with wave.open(os.path.join(work_dir, record['file']), 'rb') as segment:
+                    if index == 0:
+                        # Nothing is written yet, so the output can still take the segments' rate
+                        sample_rate = segment.getframerate()
+                        out.setframerate(sample_rate)
+                    out.writeframes(segment.readframes(segment.getnframes()))
+                # The resampler's tail has no text of its own
+                if srt and record['text']:
+                    cues += 1
+                    start, end = offset / sample_rate, (offset + record['samples']) / sample_rate
+                    srt.write(f"{cues}\n{_srt_time(start)} --> {_srt_time(end)}\n{record['text']}\n\n")
+                offset += record['samples']
+    finally:
+        if srt:
+            srt.close()
+    return offset / sample_rate
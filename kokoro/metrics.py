@@ -0,0 +1,107 @@
+'''
+Lightweight instrumentation hooks.
+
+KModel, KPipeline and BatchScheduler call emit(name, value, **labels) at
+interesting points. Nothing is recorded unless an observer is registered, so
+the cost without one is an empty loop. MetricsRegistry is such an observer;
+it aggregates events and renders them in the Prometheus text format:
+    registry = MetricsRegistry()
+    add_observer(registry.observe)
+    ...
+    print(registry.render())
+'''
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import bisect
+import threading
+
+Observer = Callable[[str, float, Dict[str, str]], None]
+
+observers: List[Observer] = []
+
+def add_observer(fn: Observer):
+    observers.append(fn)
+
+def remove_observer(fn: Observer):
+    observers.remove(fn)
+
+def emit(name: str, value: float, **labels: str):
+    for fn in observers:
+        fn(name, value, labels)
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class MetricsRegistry:
+    '''Thread-safe counters, gauges and histograms keyed by metric name and labels.'''
+
+    # Events emitted by the kokoro package: name -> (kind, help, buckets)
+    METRICS = {
+        'g2p_seconds': ('histogram', 'G2P time per call: per text segment for English, per sentence (and re-split piece) otherwise', SECONDS),
+        'model_seconds': ('histogram', 'KModel forward time per chunk', SECONDS),
+        'time_to_first_audio_seconds': ('histogram', 'Time from pipeline call to first audio chunk', SECONDS),
+        'rtf': ('histogram', 'Real-time factor per chunk (model time / audio duration)', (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)),
+        'queue_depth': ('histogram', 'Requests already waiting in the BatchScheduler at submit', (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)),
+        'chars': ('counter', 'Text characters processed', None),
+        'phonemes': ('counter', 'Phonemes synthesized', None),
+        'chunks': ('counter', 'Chunks synthesized', None),
+        'voice_cache_hits': ('counter', 'Voice lookups served from the pipeline cache', None),
+        'voice_cache_misses': ('counter', 'Voice lookups that had to load a voice', None),
+    }
+
+    def __init__(self, prefix: str = 'kokoro_'):
+        self.prefix = prefix
+        self.metrics = dict(self.METRICS)
+        self.values: Dict[str, Dict[Tuple[Tuple[str, str], ...], object]] = {}
+        self.lock = threading.Lock()
+
+    def define(self, name: str, kind: str, help: str, buckets: Optional[Sequence[float]] = None):
+        '''Registers an application metric ('counter', 'gauge' or 'histogram').'''
+        assert kind in ('counter', 'gauge', 'histogram'), kind
+        self.metrics[name] = (kind, help, tuple(buckets or SECONDS) if kind == 'histogram' else None)
+
+    def observe(self, name: str, value: float, labels: Dict[str, str]):
+        if name not in self.metrics:
+            return
+        kind, _, buckets = self.metrics[name]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            if kind == 'counter':
+                series[key] = series.get(key, 0) + value
+            elif kind == 'gauge':
+                series[key] = value
+            else:
+                counts, total, n = series.get(key) or ([0] * (len(buckets) + 1), 0.0, 0)
+                counts[bisect.bisect_left(buckets, value)] += 1
+                series[key] = (counts, total + value, n + 1)
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @staticmethod
+    def _labels(key, extra=()) -> str:
+        items = [*key, *extra]
+        if not items:
+            return ''
+        return '{' + ','.join(f'{k}="{MetricsRegistry._escape(v)}"' for k, v in items) + '}'
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.values.items()):
+                kind, help, buckets = self.metrics[name]
+                full = self.prefix + name + ('_total' if kind == 'counter' else '')
+                lines.append(f'# HELP {full} {help}')
+                lines.append(f'# TYPE {full} {kind}')
+                for key, value in sorted(series.items()):
+                    if kind != 'histogram':
+                        lines.append(f'{full}{self._labels(key)} {value}')
+                        continue
+                    counts, total, n = value
+                    cumulative = 0
+                    for le, count in zip([*buckets, '+Inf'], counts):
+                        cumulative += count
+                        lines.append(f'{full}_bucket{self._labels(key, [("le", le)])} {cumulative}')
+                    lines.append(f'{full}_sum{self._labels(key)} {total}')
+                    lines.append(f'{full}_count{self._labels(key)} {n}')
+        return '\n'.join(lines) + '\n'
@@ -1,17 +1,23 @@
 from .istftnet import Decoder
-from .modules import CustomAlbert, ProsodyPredictor, TextEncoder
+from .modules import CustomAlbert, ProsodyPredictor, TextEncoder, run_lstm
+from .hub import get_model_dir, resolve
+from .metrics import emit
+from .weights import load_safetensors
 from dataclasses import dataclass
-from huggingface_hub import hf_hub_download
 from loguru import logger
+from torch.nn.utils import parametrize
 from transformers import AlbertConfig
-from typing import Dict, Optional, Union
+from typing import Dict, List, Optional, Sequence, Union
 import json
+import os
+import time
 import torch
 
 class KModel(torch.nn.Module):
     '''
     KModel is a torch.nn.Module with 2 main responsibilities:
     1. Init weights, downloading config.json + model.pth from HF if needed
+       (or reading them from a local model_dir / $KOKORO_MODEL_DIR)
     2. forward(phonemes: str, ref_s: FloatTensor) -> (audio: FloatTensor)
 
     You likely only need one KModel instance, and it can be reused across
@@ -28,12 +34,16 @@ class KModel(torch.nn.Module):
         'hexgrad/Kokoro-82M-v1.1-zh': 'kokoro-v1_1-zh.pth',
     }
 
+    SAMPLE_RATE = 24000
+
     def __init__(
         self,
         repo_id: Optional[str] = None,
         config: Union[Dict, str, None] = None,
-        model: Optional[str] = None,
-        disable_complex: bool = False
+        model: Union[Dict[str, Dict[str, torch.Tensor]], str, None] = None,
+        disable_complex: bool = False,
+        model_dir: Optional[str] = None,
+        stft_backend: Optional[str] = None
     ):
         super().__init__()
         if repo_id is None:
@@ -42,11 +52,12 @@ class KModel(torch.nn.Module):
         self.repo_id = repo_id
         if not isinstance(config, dict):
             if not config:
-                logger.debug("No config provided, downloading from HF")
-                config = hf_hub_download(repo_id=repo_id, filename='config.json')
+                logger.debug("No config provided, resolving from model_dir or HF")
+                config = resolve(repo_id, 'config.json', model_dir)
             with open(config, 'r', encoding='utf-8') as r:
                 config = json.load(r)
                 logger.debug(f"Loaded config: {config}")
+        self.config = config
         self.vocab = config['vocab']
         self.bert = CustomAlbert(AlbertConfig(vocab_size=config['n_token'], **config['plbert']))
         self.bert_encoder = torch.nn.Linear(self.bert.config.hidden_size, config['hidden_dim'])
@@ -61,18 +72,115 @@ class KModel(torch.nn.Module):
         )
         self.decoder = Decoder(
             dim_in=config['hidden_dim'], style_dim=config['style_dim'],
-            dim_out=config['n_mels'], disable_complex=disable_complex, **config['istftnet']
+            dim_out=config['n_mels'], disable_complex=disable_complex,
+            stft_backend=stft_backend, **config['istftnet']
         )
         if not model:
-            model = hf_hub_download(repo_id=repo_id, filename=KModel.MODEL_NAMES[repo_id])
-        for key, state_dict in torch.load(model, map_location='cpu', weights_only=True).items():
+            name = KModel.MODEL_NAMES[repo_id]
+            local = get_model_dir(model_dir)
+            if local and os.path.isfile(os.path.join(local, name.replace('.pth', '.safetensors'))):
+                name = name.replace('.pth', '.safetensors')
+            model = resolve(repo_id, name, model_dir)
+        if not isinstance(model, dict):
+            if str(model).endswith('.safetensors'):
+                model, _ = load_safetensors(model)
+            else:
+                model = torch.load(model, map_location='cpu', weights_only=True)
+        if not any('parametrizations.' in k or k.endswith('.weight_g') for sd in model.values() for k in sd):
+            # Saved with weight_norm already folded into the weights
+            self.remove_weight_norm()
+        # assign=True adopts the loaded tensors instead of copying into fresh ones,
+        # so weights passed in shared memory stay shared
+        for key, state_dict in model.items():
             assert hasattr(self, key), key
             try:
-                getattr(self, key).load_state_dict(state_dict)
+                getattr(self, key).load_state_dict(state_dict, assign=True)
             except:
                 logger.debug(f"Did not load {key} from state_dict")
                 state_dict = {k[7:]: v for k, v in state_dict.items()}
-                getattr(self, key).load_state_dict(state_dict, strict=False)
+                getattr(self, key).load_state_dict(state_dict, strict=False, assign=True)
+
+    def weights(self) -> Dict[str, Dict[str, torch.Tensor]]:
+        '''Returns weights in the same {submodule: state_dict} layout as model.pth.'''
+        return {key: getattr(self, key).state_dict() for key in ('bert', 'bert_encoder', 'predictor', 'text_encoder', 'decoder')}
+
+    def remove_weight_norm(self):
+        '''
+        Folds every weight_norm parametrization into a plain weight tensor.
+        Outputs are unchanged, but weights are no longer recomputed from
+        (g, v) on each forward. Irreversible; only use it for inference.
+        '''
+        for module in [m for m in self.modules() if parametrize.is_parametrized(m, 'weight')]:
+            parametrize.remove_parametrizations(module, 'weight', leave_parametrized=True)
+
+    WARMUP_PHONEMES = 'ðə kwˈɪk bɹˈWn fˈɑks ʤˈʌmps ˌOvəɹ ðə lˈAzi dˈɔɡ, ənd ɹˈʌnz əwˈA. '
+
+    def warmup(
+        self,
+        lengths: Sequence[int] = (16, 64, 256),
+        ref_s: Optional[torch.FloatTensor] = None,
+        speed: float = 1
+    ) -> Dict[int, float]:
+        '''
+        Runs dummy phoneme strings of each length through the model so that
+        allocator growth, oneDNN primitive creation and other first-call costs
+        are paid before real requests arrive. Returns {length: seconds}.
+        Warmup calls do not emit metrics.
+        '''
+        phonemes = ''.join(p for p in self.WARMUP_PHONEMES if p in self.vocab)
+        if ref_s is None:
+            ref_s = torch.zeros(1, self.config['style_dim'] * 2)
+        timings = {}
+        for n in lengths:
+            n = max(1, min(n, self.context_length - 2))
+            ps = (phonemes * (n // len(phonemes) + 1))[:n]
+            input_ids = torch.LongTensor([self.phonemes_to_ids(ps)]).to(self.device)
+            start = time.perf_counter()
+            self.forward_with_tokens(input_ids, ref_s.to(self.device), speed)
+            timings[n] = time.perf_counter() - start
+            logger.debug(f"Warmup with {n} phonemes took {timings[n]:.3f}s")
+        return timings
+
+    def optimize_for_cpu(
+        self,
+        threads: Optional[int] = None,
+        interop_threads: Optional[int] = None,
+        affinity: Optional[Sequence[int]] = None,
+        fold_weight_norm: bool = True,
+        warmup_lengths: Sequence[int] = (16, 64, 256)
+    ) -> Dict[int, float]:
+        '''
+        CPU serving profile, applied to the calling process:
+        - affinity pins the process to those cores (Linux only), and threads
+          defaults to the number of cores it is allowed to run on
+        - sets intra-op (and optionally inter-op) thread pools and flushes
+          denormals, which otherwise stall the LSTMs and decoder on x86
+        - folds weight_norm so conv weights are static tensors instead of
+          being recomputed from (g, v) on every call (see remove_weight_norm)
+        - warms up on representative phoneme lengths (see warmup)
+        Returns the warmup timings. Use `python -m kokoro.bench autotune` to
+        pick threads for a host.
+        '''
+        self.eval()
+        if affinity is not None:
+            if hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(0, affinity)
+            else:
+                logger.warning("CPU affinity is not supported on this platform")
+        if threads is None:
+            threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        torch.set_num_threads(threads)
+        if interop_threads is not None:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError as e:
+                # Only allowed before the first inter-op parallel work in the process
+                logger.warning(f"Could not set inter-op threads: {e}")
+        torch.set_flush_denormal(True)
+        if fold_weight_norm:
+            self.remove_weight_norm()
+        logger.debug(f"optimize_for_cpu: threads={threads}, affinity={affinity}")
+        return self.warmup(warmup_lengths) if warmup_lengths else {}
 
     @property
     def device(self):
@@ -118,6 +226,63 @@ class KModel(torch.nn.Module):
         audio = self.decoder(asr, F0_pred, N_pred, ref_s[:, :128]).squeeze()
         return audio, pred_dur
 
+    @torch.no_grad()
+    def forward_batch(
+        self,
+        input_ids: torch.LongTensor,
+        input_lengths: torch.LongTensor,
+        ref_s: torch.FloatTensor,
+        speed: torch.FloatTensor
+    ) -> List['KModel.Output']:
+        '''
+        Batched inference over right-padded input_ids of shape (B, T).
+
+        BERT, the duration predictor and the text encoder run once for the
+        whole batch; their LSTMs are packed when lengths differ, so results match unbatched calls.
+        The frame-level stages (F0/N prediction and the decoder) run per item,
+        since their instance norms would otherwise see the padding.
+        '''
+        start = time.perf_counter()
+        text_mask = torch.arange(input_ids.shape[1], device=self.device).unsqueeze(0) >= input_lengths.unsqueeze(1)
+        bert_dur = self.bert(input_ids, attention_mask=(~text_mask).int())
+        d_en = self.bert_encoder(bert_dur).transpose(-1, -2)
+        s = ref_s[:, 128:]
+        d = self.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+        x = run_lstm(self.predictor.lstm, d, input_lengths)
+        duration = self.predictor.duration_proj(x)
+        duration = torch.sigmoid(duration).sum(axis=-1) / speed.unsqueeze(1)
+        pred_dur = torch.round(duration).clamp(min=1).long()
+        t_en = self.text_encoder(input_ids, input_lengths, text_mask)
+        # Metrics are per chunk, as for forward: each item gets its own decoder
+        # time plus an equal share of the batched stages
+        shared = (time.perf_counter() - start) / len(input_lengths)
+        outputs = []
+        for i, n in enumerate(input_lengths.tolist()):
+            start = time.perf_counter()
+            indices = torch.repeat_interleave(torch.arange(n, device=self.device), pred_dur[i, :n])
+            pred_aln_trg = torch.zeros((n, indices.shape[0]), device=self.device)
+            pred_aln_trg[indices, torch.arange(indices.shape[0])] = 1
+            pred_aln_trg = pred_aln_trg.unsqueeze(0)
+            en = d[i:i+1, :n].transpose(-1, -2) @ pred_aln_trg
+            F0_pred, N_pred = self.predictor.F0Ntrain(en, s[i:i+1])
+            asr = t_en[i:i+1, :, :n] @ pred_aln_trg
+            audio = self.decoder(asr, F0_pred, N_pred, ref_s[i:i+1, :128]).squeeze()
+            outputs.append(self.Output(audio=audio.cpu(), pred_dur=pred_dur[i, :n].cpu()))
+            self._observe(shared + time.perf_counter() - start, audio.shape[-1])
+        return outputs
+
+    def _observe(self, seconds: float, samples: int):
+        emit('model_seconds', seconds)
+        if samples:
+            emit('rtf', seconds * self.SAMPLE_RATE / samples)
+
+    def phonemes_to_ids(self, phonemes: str) -> List[int]:
+        '''Maps phonemes to input_ids (unknown phonemes are dropped), wrapped in <bos>/<eos> 0s.'''
+        input_ids = list(filter(lambda i: i is not None, map(lambda p: self.vocab.get(p), phonemes)))
+        logger.debug(f"phonemes: {phonemes} -> input_ids: {input_ids}")
+        assert len(input_ids)+2 <= self.context_length, (len(input_ids)+2, self.context_length)
+        return [0, *input_ids, 0]
+
     def forward(
         self,
         phonemes: str,
@@ -125,16 +290,26 @@ class KModel(torch.nn.Module):
         speed: float = 1,
         return_output: bool = False
     ) -> Union['KModel.Output', torch.FloatTensor]:
-        input_ids = list(filter(lambda i: i is not None, map(lambda p: self.vocab.get(p), phonemes)))
-        logger.debug(f"phonemes: {phonemes} -> input_ids: {input_ids}")
-        assert len(input_ids)+2 <= self.context_length, (len(input_ids)+2, self.context_length)
-        input_ids = torch.LongTensor([[0, *input_ids, 0]]).to(self.device)
+        output = self.forward_ids(self.phonemes_to_ids(phonemes), ref_s, speed)
+        return output if return_output else output.audio
+
+    def forward_ids(
+        self,
+        input_ids: List[int],
+        ref_s: torch.FloatTensor,
+        speed: float = 1
+    ) -> 'KModel.Output':
+        '''Synthesizes input_ids already wrapped in <bos>/<eos>, e.g. read back from a kokoro.corpus file.'''
+        assert len(input_ids) <= self.context_length, (len(input_ids), self.context_length)
+        start = time.perf_counter()
+        input_ids = torch.LongTensor([input_ids]).to(self.device)
         ref_s = ref_s.to(self.device)
         audio, pred_dur = self.forward_with_tokens(input_ids, ref_s, speed)
         audio = audio.squeeze().cpu()
+        self._observe(time.perf_counter() - start, audio.shape[-1])
         pred_dur = pred_dur.cpu() if pred_dur is not None else None
         logger.debug(f"pred_dur: {pred_dur}")
-        return self.Output(audio=audio, pred_dur=pred_dur) if return_output else audio
+        return self.Output(audio=audio, pred_dur=pred_dur)
 
 class KModelForONNX(torch.nn.Module):
     def __init__(self, kmodel: KModel):
@@ -8,6 +8,23 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 
+def run_lstm(lstm: nn.LSTM, x: torch.Tensor, lengths: torch.Tensor) -> torch.Tensor:
+    """
+    Runs a batch_first LSTM over right-padded x [B, T, C] and returns [B, T, H],
+    zero past each length. Packing only changes the result for padded rows, so
+    single sequences and equal-length batches call the LSTM directly and skip
+    pack/pad, flatten_parameters and the padded copy.
+    """
+    total_length = x.shape[1]
+    lengths = lengths if lengths.device == torch.device('cpu') else lengths.to('cpu')
+    if bool((lengths == total_length).all()):
+        return lstm(x)[0]
+    x = nn.utils.rnn.pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+    lstm.flatten_parameters()
+    x, _ = lstm(x)
+    return nn.utils.rnn.pad_packed_sequence(x, batch_first=True, total_length=total_length)[0]
+
+
 class LinearNorm(nn.Module):
     def __init__(self, in_dim, out_dim, bias=True, w_init_gain='linear'):
         super(LinearNorm, self).__init__()
@@ -56,15 +73,8 @@ class TextEncoder(nn.Module):
             x = c(x)
             x.masked_fill_(m, 0.0)
         x = x.transpose(1, 2)  # [B, T, chn]
-        lengths = input_lengths if input_lengths.device == torch.device('cpu') else input_lengths.to('cpu')
-        x = nn.utils.rnn.pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
-        self.lstm.flatten_parameters()
-        x, _ = self.lstm(x)
-        x, _ = nn.utils.rnn.pad_packed_sequence(x, batch_first=True)
+        x = run_lstm(self.lstm, x, input_lengths)
         x = x.transpose(-1, -2)
-        x_pad = torch.zeros([x.shape[0], x.shape[1], m.shape[-1]], device=x.device)
-        x_pad[:, :, :x.shape[-1]] = x
-        x = x_pad
         x.masked_fill_(m, 0.0)
         return x
 
@@ -109,14 +119,7 @@ class ProsodyPredictor(nn.Module):
     def forward(self, texts, style, text_lengths, alignment, m):
         d = self.text_encoder(texts, style, text_lengths, m)
         m = m.unsqueeze(1)
-        lengths = text_lengths if text_lengths.device == torch.device('cpu') else text_lengths.to('cpu')
-        x = nn.utils.rnn.pack_padded_sequence(d, lengths, batch_first=True, enforce_sorted=False)
-        self.lstm.flatten_parameters()
-        x, _ = self.lstm(x)
-        x, _ = nn.utils.rnn.pad_packed_sequence(x, batch_first=True)
-        x_pad = torch.zeros([x.shape[0], m.shape[-1], x.shape[-1]], device=x.device)
-        x_pad[:, :x.shape[1], :] = x
-        x = x_pad
+        x = run_lstm(self.lstm, d, text_lengths)
         duration = self.duration_proj(nn.functional.dropout(x, 0.5, training=False))
         en = (d.transpose(-1, -2) @ alignment)
         return duration.squeeze(-1), en
@@ -159,19 +162,9 @@ class DurationEncoder(nn.Module):
                 x = torch.cat([x, s.permute(1, 2, 0)], axis=1)
                 x.masked_fill_(masks.unsqueeze(-1).transpose(-1, -2), 0.0)
             else:
-                lengths = text_lengths if text_lengths.device == torch.device('cpu') else text_lengths.to('cpu')
-                x = x.transpose(-1, -2)
-                x = nn.utils.rnn.pack_padded_sequence(
-                    x, lengths, batch_first=True, enforce_sorted=False)
-                block.flatten_parameters()
-                x, _ = block(x)
-                x, _ = nn.utils.rnn.pad_packed_sequence(
-                    x, batch_first=True)
+                x = run_lstm(block, x.transpose(-1, -2), text_lengths)
                 x = F.dropout(x, p=self.dropout, training=False)
                 x = x.transpose(-1, -2)
-                x_pad = torch.zeros([x.shape[0], x.shape[1], m.shape[-1]], device=x.device)
-                x_pad[:, :, :x.shape[-1]] = x
-                x = x_pad
 
         return x.transpose(-1, -2)
 
@@ -1,10 +1,19 @@
+from .audio import Resampler
+from .corpus import CorpusReader, vocab_hash
+from .hub import resolve
+from .metrics import emit
 from .model import KModel
+from .splitter import split_clauses, split_half, split_sentences
+from .voices import BlendCache, VoiceBlend, blend_key, load_voices, parse_blend
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from huggingface_hub import hf_hub_download
 from loguru import logger
 from misaki import en, espeak
-from typing import Callable, Generator, List, Optional, Tuple, Union
+from typing import AsyncGenerator, Callable, Dict, Generator, Iterable, List, Optional, Sequence, Tuple, Union
+import asyncio
 import re
+import time
 import torch
 import os
 
@@ -39,11 +48,30 @@ LANG_CODES = dict(
     z='Mandarin Chinese',
 )
 
+# Punctuation en_tokenize may end a first chunk at, and what may trail it
+CLAUSE_ENDS = frozenset('!.?…:;,—')
+CLOSERS = frozenset([')', '”'])
+
+@dataclass
+class ChunkSchedule:
+    '''
+    Phoneme budget of each chunk in one pipeline call: up to first phonemes
+    for the first chunk, then growth times the previous budget, capped at 510.
+    '''
+    first: int
+    growth: float = 2.0
+    chunks: int = 0
+
+    @property
+    def limit(self) -> int:
+        return max(1, min(510, int(self.first * self.growth ** self.chunks)))
+
 class KPipeline:
     '''
     KPipeline is a language-aware support class with 2 main responsibilities:
     1. Perform language-specific G2P, mapping (and chunking) text -> phonemes
     2. Manage and store voices, lazily downloaded from HF if needed
+       (or read from voices/ in a local model_dir / $KOKORO_MODEL_DIR)
 
     You are expected to have one KPipeline per language. If you have multiple
     KPipelines, you should reuse one KModel instance across all of them.
@@ -68,7 +96,13 @@ class KPipeline:
         model: Union[KModel, bool] = True,
         trf: bool = False,
         en_callable: Optional[Callable[[str], str]] = None,
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        model_dir: Optional[str] = None,
+        sample_rate: int = KModel.SAMPLE_RATE,
+        blend_cache_size: int = 32,
+        first_chunk: Optional[int] = None,
+        chunk_growth: float = 2.0,
+        g2p: bool = True
     ):
         """Initialize a KPipeline.
         
@@ -79,11 +113,30 @@ class KPipeline:
             device: Override default device selection ('cuda' or 'cpu', or None for auto)
                    If None, will auto-select cuda if available
                    If 'cuda' and not available, will explicitly raise an error
+            model_dir: Local directory with config.json, weights and voices/*.pt
+                   (defaults to $KOKORO_MODEL_DIR). If set, HF is never contacted.
+            sample_rate: Output sample rate, e.g. 8000/16000 for telephony or 48000
+                   for browsers. Audio is resampled chunk by chunk with a stateful
+                   polyphase filter; pred_dur and timestamps keep model frame units.
+                   Each call then ends with a Result with no text, holding the
+                   filter's last samples (under 1 ms).
+            blend_cache_size: Number of voice blends (e.g. 'af_bella:0.7,af_sky:0.3')
+                   kept in the LRU cache.
+            first_chunk: Latency-oriented chunking. If set, the first chunk of each
+                   call ends at the earliest clause boundary or after this many
+                   phonemes, and each later chunk may hold chunk_growth times as
+                   many as the one before, up to 510. Lowers time to first audio
+                   at the cost of a few more, smaller model calls. None (default)
+                   fills every chunk up to 510 phonemes.
+            g2p: False skips G2P setup, for pipelines that only synthesize phonemes,
+                   e.g. generate_from_tokens or generate_from_corpus.
         """
         if repo_id is None:
             repo_id = 'hexgrad/Kokoro-82M'
             print(f"WARNING: Defaulting repo_id to {repo_id}. Pass repo_id='{repo_id}' to suppress this warning.")
         self.repo_id = repo_id
+        self.model_dir = model_dir
+        self.sample_rate = sample_rate
         lang_code = lang_code.lower()
         lang_code = ALIASES.get(lang_code, lang_code)
         assert lang_code in LANG_CODES, (lang_code, LANG_CODES)
@@ -92,28 +145,22 @@ class KPipeline:
         if isinstance(model, KModel):
             self.model = model
         elif model:
-            if device == 'cuda' and not torch.cuda.is_available():
-                raise RuntimeError("CUDA requested but not available")
-            if device == 'mps' and not torch.backends.mps.is_available():
-                raise RuntimeError("MPS requested but not available")
-            if device == 'mps' and os.environ.get('PYTORCH_ENABLE_MPS_FALLBACK') != '1':
-                raise RuntimeError("MPS requested but fallback not enabled")
-            if device is None:
-                if torch.cuda.is_available():
-                    device = 'cuda'
-                elif os.environ.get('PYTORCH_ENABLE_MPS_FALLBACK') == '1' and torch.backends.mps.is_available():
-                    device = 'mps'
-                else:
-                    device = 'cpu'
+            device = KPipeline.select_device(device)
             try:
-                self.model = KModel(repo_id=repo_id).to(device).eval()
+                self.model = KModel(repo_id=repo_id, model_dir=model_dir).to(device).eval()
             except RuntimeError as e:
                 if device == 'cuda':
                     raise RuntimeError(f"""Failed to initialize model on CUDA: {e}. 
                                        Try setting device='cpu' or check CUDA installation.""")
                 raise
         self.voices = {}
-        if lang_code in 'ab':
+        self.blends = BlendCache(blend_cache_size)
+        self.first_chunk = first_chunk
+        self.chunk_growth = chunk_growth
+        self._executor = None
+        if not g2p:
+            self.g2p = None
+        elif lang_code in 'ab':
             try:
                 fallback = espeak.EspeakFallback(british=lang_code=='b')
             except Exception as e:
@@ -140,16 +187,34 @@ class KPipeline:
                 raise
         else:
             language = LANG_CODES[lang_code]
-            logger.warning(f"Using EspeakG2P(language='{language}'). Chunking logic not yet implemented, so long texts may be truncated unless you split them with '\\n'.")
+            logger.debug(f"Using EspeakG2P(language='{language}')")
             self.g2p = espeak.EspeakG2P(language=language)
 
+    @staticmethod
+    def select_device(device: Optional[str] = None) -> str:
+        '''Validates a requested device, or picks cuda > mps (with fallback enabled) > cpu.'''
+        if device == 'cuda' and not torch.cuda.is_available():
+            raise RuntimeError("CUDA requested but not available")
+        if device == 'mps' and not torch.backends.mps.is_available():
+            raise RuntimeError("MPS requested but not available")
+        if device == 'mps' and os.environ.get('PYTORCH_ENABLE_MPS_FALLBACK') != '1':
+            raise RuntimeError("MPS requested but fallback not enabled")
+        if device is None:
+            if torch.cuda.is_available():
+                device = 'cuda'
+            elif os.environ.get('PYTORCH_ENABLE_MPS_FALLBACK') == '1' and torch.backends.mps.is_available():
+                device = 'mps'
+            else:
+                device = 'cpu'
+        return device
+
     def load_single_voice(self, voice: str):
         if voice in self.voices:
             return self.voices[voice]
         if voice.endswith('.pt'):
             f = voice
         else:
-            f = hf_hub_download(repo_id=self.repo_id, filename=f'voices/{voice}.pt')
+            f = resolve(self.repo_id, f'voices/{voice}.pt', self.model_dir)
             if not voice.startswith(self.lang_code):
                 v = LANG_CODES.get(voice, voice)
                 p = LANG_CODES.get(self.lang_code, self.lang_code)
@@ -161,20 +226,60 @@ class KPipeline:
     """
     load_voice is a helper function that lazily downloads and loads a voice:
     Single voice can be requested (e.g. 'af_bella') or multiple voices (e.g. 'af_bella,af_jessica').
-    If multiple voices are requested, they are averaged.
+    If multiple voices are requested, they are averaged, or mixed by weight (e.g. 'af_bella:0.7,af_sky:0.3').
+    Blends are VoiceBlends, whose style rows are mixed on demand, and are kept in a bounded LRU.
     Delimiter is optional and defaults to ','.
     """
-    def load_voice(self, voice: Union[str, torch.FloatTensor], delimiter: str = ",") -> torch.FloatTensor:
-        if isinstance(voice, torch.FloatTensor):
+    def load_voice(self, voice: Union[str, torch.FloatTensor, VoiceBlend], delimiter: str = ",") -> Union[torch.FloatTensor, VoiceBlend]:
+        if isinstance(voice, (torch.FloatTensor, VoiceBlend)):
             return voice
-        if voice in self.voices:
-            return self.voices[voice]
+        blend = parse_blend(voice, delimiter)
+        key = blend_key(blend)
+        # Plain voices, and blends preloaded from a voice store, live in self.voices
+        pack = self.voices.get(key)
+        if pack is None:
+            pack = self.blends.get(key)
+        if pack is not None:
+            emit('voice_cache_hits', 1, voice=KPipeline.voice_label(voice), lang=self.lang_code)
+            return pack
+        emit('voice_cache_misses', 1, voice=KPipeline.voice_label(voice), lang=self.lang_code)
         logger.debug(f"Loading voice: {voice}")
-        packs = [self.load_single_voice(v) for v in voice.split(delimiter)]
-        if len(packs) == 1:
-            return packs[0]
-        self.voices[voice] = torch.mean(torch.stack(packs), dim=0)
-        return self.voices[voice]
+        if len(blend) == 1:
+            return self.load_single_voice(key)
+        pack = VoiceBlend([self.load_single_voice(v) for v, _ in blend], [w for _, w in blend])
+        self.blends.put(key, pack)
+        return pack
+
+    def load_voice_store(self, path: str) -> List[str]:
+        '''Adds every voice and pre-mixed blend in a store written by `kokoro pack-voices`. Returns their names.'''
+        voices = load_voices(path)
+        self.voices.update(voices)
+        return list(voices)
+
+    def warmup(
+        self,
+        voices: Iterable[str] = (),
+        lengths: Sequence[int] = (16, 64, 256)
+    ) -> Dict[int, float]:
+        '''
+        Pays first-request costs up front: downloads and caches each voice, then
+        runs dummy phoneme strings of each length through the model twice. The
+        first pass absorbs allocator growth and oneDNN primitive creation; the
+        second is timed and returned as {length: seconds}, so callers can hold
+        health checks until the worker is actually fast.
+        '''
+        packs = [self.load_voice(v) for v in voices]
+        if self.model is None:
+            return {}
+        ref_s = packs[0] if packs else None
+        timings = {}
+        for label in ('cold', 'warm'):
+            for n in lengths:
+                # Style rows are indexed by phoneme count, as in infer()
+                ref = None if ref_s is None else ref_s[max(1, min(n, len(ref_s))) - 1]
+                timings.update(self.model.warmup([n], ref_s=ref))
+            logger.info(f"Warmup ({label}): " + ', '.join(f'{n}: {t:.3f}s' for n, t in timings.items()))
+        return timings
 
     @staticmethod
     def tokens_to_ps(tokens: List[en.MToken]) -> str:
@@ -204,7 +309,8 @@ class KPipeline:
 
     def en_tokenize(
         self,
-        tokens: List[en.MToken]
+        tokens: List[en.MToken],
+        schedule: Optional[ChunkSchedule] = None
     ) -> Generator[Tuple[str, str, List[en.MToken]], None, None]:
         tks = []
         pcount = 0
@@ -213,11 +319,20 @@ class KPipeline:
             t.phonemes = '' if t.phonemes is None else t.phonemes#.replace('ɾ', 'T')
             next_ps = t.phonemes + (' ' if t.whitespace else '')
             next_pcount = pcount + len(next_ps.rstrip())
-            if next_pcount > 510:
+            limit = 510 if schedule is None else schedule.limit
+            if schedule is not None and schedule.chunks == 0 and t.phonemes not in CLOSERS and KPipeline.ends_clause(tks):
+                # The first chunk ends at the earliest clause boundary
+                z = len(tks)
+            elif next_pcount > limit and tks:
                 z = KPipeline.waterfall_last(tks, next_pcount)
+            else:
+                z = None
+            if z is not None:
                 text = KPipeline.tokens_to_text(tks[:z])
                 logger.debug(f"Chunking text at {z}: '{text[:30]}{'...' if len(text) > 30 else ''}'")
                 ps = KPipeline.tokens_to_ps(tks[:z])
+                if schedule is not None:
+                    schedule.chunks += 1
                 yield text, ps, tks[:z]
                 tks = tks[z:]
                 pcount = len(KPipeline.tokens_to_ps(tks))
@@ -228,13 +343,147 @@ class KPipeline:
         if tks:
             text = KPipeline.tokens_to_text(tks)
             ps = KPipeline.tokens_to_ps(tks)
+            if schedule is not None:
+                schedule.chunks += 1
             yield ''.join(text).strip(), ''.join(ps).strip(), tks
 
+    @staticmethod
+    def ends_clause(tokens: List[en.MToken]) -> bool:
+        '''Whether tokens end in clause punctuation, possibly followed by closing brackets or quotes.'''
+        i = len(tokens) - 1
+        while i >= 0 and tokens[i].phonemes in CLOSERS:
+            i -= 1
+        return i >= 0 and tokens[i].phonemes in CLAUSE_ENDS and len(KPipeline.tokens_to_ps(tokens[:i])) > 0
+
+    def chunk_schedule(self) -> Optional[ChunkSchedule]:
+        '''A fresh per-call ChunkSchedule, or None to fill every chunk up to 510 phonemes.'''
+        if self.first_chunk is None:
+            return None
+        return ChunkSchedule(self.first_chunk, self.chunk_growth)
+
+    def fit_phonemes(self, text: str, limit: int = 510) -> Generator[Tuple[str, str], None, None]:
+        '''
+        Phonemizes text, splitting it at clauses, then at the middle word (or
+        character, for unspaced scripts) until every piece fits in limit phonemes.
+        '''
+        ps, _ = self.phonemize(text)
+        if len(ps) <= limit:
+            yield text, ps
+            return
+        parts = split_clauses(text)
+        if len(parts) == 1:
+            parts = split_half(text)
+        if len(parts) == 1:
+            if len(ps) > 510:
+                logger.warning(f'Truncating len(ps) == {len(ps)} > 510')
+            yield text, ps[:510]
+            return
+        for part in parts:
+            yield from self.fit_phonemes(part, limit)
+
+    def chunk_text(
+        self,
+        text: str,
+        schedule: Optional[ChunkSchedule] = None
+    ) -> Generator[Tuple[str, str], None, None]:
+        '''
+        Non-English counterpart of en_tokenize. Yields (graphemes, phonemes) chunks
+        of whole sentences (see kokoro.splitter), packed up to 510 phonemes or the
+        schedule's budget. G2P runs once per sentence, and only sentences that do
+        not fit are split further (see fit_phonemes), so nothing is truncated.
+        '''
+        sep = '' if self.lang_code in 'jz' else ' '
+        def units():
+            for sentence in split_sentences(text):
+                # The first chunk ends at the earliest clause boundary
+                first = schedule is not None and schedule.chunks == 0
+                for piece in split_clauses(sentence) if first else [sentence]:
+                    yield from self.fit_phonemes(piece, 510 if schedule is None else schedule.limit)
+        chunk_gs, chunk_ps = [], []
+        for gs, ps in units():
+            if not ps:
+                continue
+            if chunk_ps and len(sep.join(chunk_ps + [ps])) > (510 if schedule is None else schedule.limit):
+                yield sep.join(chunk_gs), sep.join(chunk_ps)
+                if schedule is not None:
+                    schedule.chunks += 1
+                chunk_gs, chunk_ps = [], []
+            chunk_gs.append(gs)
+            chunk_ps.append(ps)
+            if schedule is not None and schedule.chunks == 0:
+                yield sep.join(chunk_gs), sep.join(chunk_ps)
+                schedule.chunks += 1
+                chunk_gs, chunk_ps = [], []
+        if chunk_ps:
+            if schedule is not None:
+                schedule.chunks += 1
+            yield sep.join(chunk_gs), sep.join(chunk_ps)
+
+    def phonemize(self, text: str):
+        '''Runs self.g2p on text, reporting its time to kokoro.metrics.'''
+        if self.g2p is None:
+            raise ValueError('This pipeline was created with g2p=False and only accepts phonemes')
+        start = time.perf_counter()
+        result = self.g2p(text)
+        emit('g2p_seconds', time.perf_counter() - start, lang=self.lang_code)
+        return result
+
+    @staticmethod
+    def voice_label(voice) -> str:
+        '''Bounded metrics label for a voice: its name, or 'blend', 'file' or 'tensor'.'''
+        if not isinstance(voice, str):
+            return 'tensor'
+        blend = parse_blend(voice)
+        if len(blend) > 1:
+            return 'blend'
+        return 'file' if blend[0][0].endswith('.pt') else blend[0][0]
+
+    @staticmethod
+    def voice_lang(voice: str) -> Optional[str]:
+        '''
+        Language code implied by a voice name's prefix, e.g. 'a' for 'af_heart'.
+        None for .pt paths, blends mixing languages, or unknown prefixes.
+        '''
+        langs = {name[0] if not name.endswith('.pt') else None for name, _ in parse_blend(voice)}
+        lang = langs.pop() if len(langs) == 1 else None
+        return lang if lang in LANG_CODES else None
+
+    def _observe_chunk(self, ps: str, voice, start: Optional[float]) -> None:
+        '''Counts a synthesized chunk; the first one of a call also reports time to first audio.'''
+        labels = dict(voice=KPipeline.voice_label(voice), lang=self.lang_code)
+        emit('chunks', 1, **labels)
+        emit('phonemes', len(ps), **labels)
+        if start is not None:
+            emit('time_to_first_audio_seconds', time.perf_counter() - start, lang=self.lang_code)
+
+    def output_stage(self) -> Tuple[
+        Callable[[Optional[KModel.Output]], Optional[KModel.Output]], Callable[[], Optional['KPipeline.Result']]
+    ]:
+        '''
+        Returns per-call (resample, flush) functions. resample converts each
+        chunk to self.sample_rate, carrying state across chunks. flush returns
+        the resampler's held-back tail (under 1 ms) as a Result with no text,
+        to yield after the last chunk, or None when nothing is held back.
+        '''
+        if self.sample_rate == KModel.SAMPLE_RATE:
+            return (lambda output: output), (lambda: None)
+        resampler = Resampler(KModel.SAMPLE_RATE, self.sample_rate)
+        def resample(output: Optional[KModel.Output]) -> Optional[KModel.Output]:
+            if output is None:
+                return None
+            return KModel.Output(audio=resampler(output.audio), pred_dur=output.pred_dur)
+        def flush() -> Optional['KPipeline.Result']:
+            tail = resampler.flush()
+            if not len(tail):
+                return None
+            return KPipeline.Result(graphemes='', phonemes='', output=KModel.Output(audio=tail))
+        return resample, flush
+
     @staticmethod
     def infer(
         model: KModel,
         ps: str,
-        pack: torch.FloatTensor,
+        pack: Union[torch.FloatTensor, VoiceBlend],
         speed: Union[float, Callable[[int], float]] = 1
     ) -> KModel.Output:
         if callable(speed):
@@ -262,34 +511,92 @@ class KPipeline:
         Raises:
             ValueError: If no voice is provided or token sequence exceeds model limits
         """
+        start = time.perf_counter()
         model = model or self.model
         if model and voice is None:
             raise ValueError('Specify a voice: pipeline.generate_from_tokens(..., voice="af_heart")')
         
         pack = self.load_voice(voice).to(model.device) if model else None
+        resample, flush = self.output_stage()
 
         # Handle raw phoneme string
         if isinstance(tokens, str):
             logger.debug("Processing phonemes from raw string")
             if len(tokens) > 510:
                 raise ValueError(f'Phoneme string too long: {len(tokens)} > 510')
-            output = KPipeline.infer(model, tokens, pack, speed) if model else None
+            output = resample(KPipeline.infer(model, tokens, pack, speed) if model else None)
+            if output is not None:
+                self._observe_chunk(tokens, voice, start)
             yield self.Result(graphemes='', phonemes=tokens, output=output)
+            if tail := flush():
+                yield tail
             return
         
         logger.debug("Processing MTokens")
         # Handle pre-processed tokens
-        for gs, ps, tks in self.en_tokenize(tokens):
+        for gs, ps, tks in self.en_tokenize(tokens, self.chunk_schedule()):
             if not ps:
                 continue
             elif len(ps) > 510:
                 logger.warning(f"Unexpected len(ps) == {len(ps)} > 510 and ps == '{ps}'")
                 logger.warning("Truncating to 510 characters")
                 ps = ps[:510]
-            output = KPipeline.infer(model, ps, pack, speed) if model else None
-            if output is not None and output.pred_dur is not None:
-                KPipeline.join_timestamps(tks, output.pred_dur)
+            output = resample(KPipeline.infer(model, ps, pack, speed) if model else None)
+            if output is not None:
+                self._observe_chunk(ps, voice, start)
+                start = None
+                if output.pred_dur is not None:
+                    KPipeline.join_timestamps(tks, output.pred_dur)
             yield self.Result(graphemes=gs, phonemes=ps, tokens=tks, output=output)
+        if tail := flush():
+            yield tail
+
+    def generate_from_corpus(
+        self,
+        corpus: Union[str, CorpusReader],
+        voice: str,
+        speed: Union[float, Callable[[int], float]] = 1,
+        model: Optional[KModel] = None
+    ) -> Generator['KPipeline.Result', None, None]:
+        """Synthesize a pre-phonemized corpus file (see kokoro.corpus) without G2P or re-chunking.
+
+        Stored input_ids go straight into KModel.forward_ids when the corpus was
+        written with the model's vocab; otherwise the stored phonemes are used.
+        """
+        start = time.perf_counter()
+        model = model or self.model
+        if voice is None:
+            raise ValueError('Specify a voice: pipeline.generate_from_corpus(..., voice="af_heart")')
+        reader = CorpusReader(corpus) if isinstance(corpus, str) else corpus
+        try:
+            if reader.lang_code != self.lang_code:
+                logger.warning(f"Corpus was phonemized for lang_code='{reader.lang_code}', not '{self.lang_code}'")
+            use_ids = isinstance(model, KModel) and reader.metadata.get('vocab_hash') == vocab_hash(model.vocab)
+            if isinstance(model, KModel) and not use_ids:
+                logger.warning("Corpus was written with a different vocab; mapping its phonemes again")
+            pack = self.load_voice(voice).to(model.device) if model else None
+            resample, flush = self.output_stage()
+            for chunk in reader:
+                if not model:
+                    output = None
+                elif use_ids:
+                    s = speed(len(chunk.phonemes)) if callable(speed) else speed
+                    output = model.forward_ids(chunk.input_ids, pack[len(chunk.phonemes)-1], s)
+                else:
+                    output = KPipeline.infer(model, chunk.phonemes, pack, speed)
+                output = resample(output)
+                if output is not None:
+                    self._observe_chunk(chunk.phonemes, voice, start)
+                    start = None
+                    if chunk.tokens and output.pred_dur is not None:
+                        KPipeline.join_timestamps(chunk.tokens, output.pred_dur)
+                yield self.Result(graphemes=chunk.graphemes, phonemes=chunk.phonemes, tokens=chunk.tokens,
+                                  output=output, text_index=chunk.text_index)
+            if tail := flush():
+                yield tail
+        finally:
+            if reader is not corpus:
+                reader.close()
 
     @staticmethod
     def join_timestamps(tokens: List[en.MToken], pred_dur: torch.LongTensor):
@@ -366,11 +673,35 @@ class KPipeline:
         split_pattern: Optional[str] = r'\n+',
         model: Optional[KModel] = None
     ) -> Generator['KPipeline.Result', None, None]:
+        start = time.perf_counter()
         model = model or self.model
         if model and voice is None:
             raise ValueError('Specify a voice: en_us_pipeline(text="Hello world!", voice="af_heart")')
         pack = self.load_voice(voice).to(model.device) if model else None
+        resample, flush = self.output_stage()
+        # One schedule per call, so chunks keep growing across segments
+        schedule = self.chunk_schedule()
         
+        index = None
+        for gs, ps, tks, index in self.text_chunks(text, split_pattern, schedule):
+            output = resample(KPipeline.infer(model, ps, pack, speed) if model else None)
+            if output is not None:
+                self._observe_chunk(ps, voice, start)
+                start = None
+                if tks is not None and output.pred_dur is not None:
+                    KPipeline.join_timestamps(tks, output.pred_dur)
+            yield self.Result(graphemes=gs, phonemes=ps, tokens=tks, output=output, text_index=index)
+        if tail := flush():
+            tail.text_index = index
+            yield tail
+
+    def text_chunks(
+        self,
+        text: Union[str, List[str]],
+        split_pattern: Optional[str] = r'\n+',
+        schedule: Optional[ChunkSchedule] = None
+    ) -> Generator[Tuple[str, str, Optional[List[en.MToken]], int], None, None]:
+        '''Runs G2P and chunking for __call__, yielding (graphemes, phonemes, tokens, text_index) per chunk.'''
         # Convert input to list of segments
         if isinstance(text, str):
             text = re.split(split_pattern, text.strip()) if split_pattern else [text]
@@ -379,64 +710,59 @@ class KPipeline:
         for graphemes_index, graphemes in enumerate(text):
             if not graphemes.strip():  # Skip empty segments
                 continue
+            emit('chars', len(graphemes), lang=self.lang_code)
                 
             # English processing (unchanged)
             if self.lang_code in 'ab':
                 logger.debug(f"Processing English text: {graphemes[:50]}{'...' if len(graphemes) > 50 else ''}")
-                _, tokens = self.g2p(graphemes)
-                for gs, ps, tks in self.en_tokenize(tokens):
+                _, tokens = self.phonemize(graphemes)
+                for gs, ps, tks in self.en_tokenize(tokens, schedule):
                     if not ps:
                         continue
                     elif len(ps) > 510:
                         logger.warning(f"Unexpected len(ps) == {len(ps)} > 510 and ps == '{ps}'")
                         ps = ps[:510]
-                    output = KPipeline.infer(model, ps, pack, speed) if model else None
-                    if output is not None and output.pred_dur is not None:
-                        KPipeline.join_timestamps(tks, output.pred_dur)
-                    yield self.Result(graphemes=gs, phonemes=ps, tokens=tks, output=output, text_index=graphemes_index)
+                    yield gs, ps, tks, graphemes_index
             
-            # Non-English processing with chunking
+            # Non-English processing, chunked by phoneme budget at sentence and clause boundaries
             else:
-                # Split long text into smaller chunks (roughly 400 characters each)
-                # Using sentence boundaries when possible
-                chunk_size = 400
-                chunks = []
-                
-                # Try to split on sentence boundaries first
-                sentences = re.split(r'([.!?]+)', graphemes)
-                current_chunk = ""
-                
-                for i in range(0, len(sentences), 2):
-                    sentence = sentences[i]
-                    # Add the punctuation back if it exists
-                    if i + 1 < len(sentences):
-                        sentence += sentences[i + 1]
-                        
-                    if len(current_chunk) + len(sentence) <= chunk_size:
-                        current_chunk += sentence
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = sentence
-                
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                
-                # If no chunks were created (no sentence boundaries), fall back to character-based chunking
-                if not chunks:
-                    chunks = [graphemes[i:i+chunk_size] for i in range(0, len(graphemes), chunk_size)]
-                
-                # Process each chunk
-                for chunk in chunks:
-                    if not chunk.strip():
-                        continue
-                        
-                    ps, _ = self.g2p(chunk)
-                    if not ps:
-                        continue
-                    elif len(ps) > 510:
-                        logger.warning(f'Truncating len(ps) == {len(ps)} > 510')
-                        ps = ps[:510]
-                        
-                    output = KPipeline.infer(model, ps, pack, speed) if model else None
-                    yield self.Result(graphemes=chunk, phonemes=ps, output=output, text_index=graphemes_index)
+                for gs, ps in self.chunk_text(graphemes, schedule):
+                    yield gs, ps, None, graphemes_index
+
+    async def astream(
+        self,
+        text: Union[str, List[str]],
+        voice: Optional[str] = None,
+        speed: Union[float, Callable[[int], float]] = 1,
+        split_pattern: Optional[str] = r'\n+',
+        model: Optional[KModel] = None,
+        prefetch: int = 1
+    ) -> AsyncGenerator['KPipeline.Result', None]:
+        """Async version of __call__ for asyncio services.
+
+        G2P and inference run on a dedicated single-thread executor owned by
+        this pipeline, so the event loop is never blocked. Up to `prefetch`
+        chunks are synthesized ahead of the consumer. Cancelling the consuming
+        task (or closing the generator, e.g. via contextlib.aclosing) drops
+        the queued chunks; only the chunk already running is finished.
+
+        Yields:
+            KPipeline.Result, in order, as each chunk completes
+        """
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kpipeline')
+        generator = self(text, voice=voice, speed=speed, split_pattern=split_pattern, model=model)
+        # The executor is single-threaded, so queued next() calls run one after another
+        pending = deque(loop.run_in_executor(self._executor, next, generator, None) for _ in range(1 + max(0, prefetch)))
+        try:
+            while True:
+                result = await pending.popleft()
+                if result is None:
+                    return
+                yield result
+                pending.append(loop.run_in_executor(self._executor, next, generator, None))
+        finally:
+            for f in pending:
+                f.cancel()
+            await loop.run_in_executor(self._executor, generator.close)
@@ -0,0 +1,445 @@
+from .hub import get_model_dir, resolve
+from .metrics import emit
+from .model import KModel
+from .pipeline import KPipeline
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from loguru import logger
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import torch
+import torch.multiprocessing as mp
+import traceback
+
+_models: Dict[Tuple[str, str, Optional[str]], KModel] = {}
+_models_lock = threading.Lock()
+
+def get_model(
+    repo_id: str = 'hexgrad/Kokoro-82M',
+    device: Optional[str] = None,
+    model_dir: Optional[str] = None
+) -> KModel:
+    '''
+    Returns the process-wide KModel for (repo_id, device, model_dir), building
+    it on first use. Pass it to every KPipeline so each language that gets used
+    shares one copy of the weights:
+        pipeline = KPipeline(lang_code='b', repo_id=repo_id, model=get_model(repo_id))
+    Safe to call from concurrent threads; the model is only built once.
+    The model runs in float32 (voices and intermediate tensors are float32).
+    '''
+    device = KPipeline.select_device(device)
+    key = (repo_id, device, get_model_dir(model_dir))
+    with _models_lock:
+        if key not in _models:
+            logger.debug(f"Building shared KModel for {key}")
+            _models[key] = KModel(repo_id=repo_id, model_dir=model_dir).to(device).eval()
+        return _models[key]
+
+def _build_worker_model(
+    repo_id: str,
+    config: Dict,
+    weights: Union[Dict[str, Dict[str, torch.Tensor]], str],
+    stft_backend: str
+) -> KModel:
+    '''
+    Rebuilds the KModel around the shared weights, since parametrized (weight_norm)
+    modules cannot be pickled. Modules are built on the meta device, so no random
+    weights are allocated or initialized; load_state_dict(assign=True) then adopts
+    the shared tensors as-is. STFT tables are built on CPU from the config.
+    '''
+    with torch.device('meta'):
+        model = KModel(repo_id=repo_id, config=config, model=weights, stft_backend=stft_backend)
+    # ALBERT's index buffers are non-persistent, so they are not in the weights
+    embeddings = model.bert.embeddings
+    position_ids = torch.arange(embeddings.position_embeddings.num_embeddings).expand((1, -1))
+    embeddings.register_buffer('position_ids', position_ids, persistent=False)
+    if hasattr(embeddings, 'token_type_ids'):
+        embeddings.register_buffer('token_type_ids', torch.zeros_like(position_ids), persistent=False)
+    missing = [n for n, t in itertools.chain(model.named_parameters(), model.named_buffers()) if t.is_meta]
+    if missing:
+        raise RuntimeError(f'Weights are missing tensors: {", ".join(missing)}')
+    return model.eval()
+
+def _worker_main(
+    index: int,
+    config: Dict,
+    weights: Union[Dict[str, Dict[str, torch.Tensor]], str],
+    stft_backend: str,
+    voices: Dict[str, torch.FloatTensor],
+    cores: Optional[Sequence[int]],
+    threads: int,
+    repo_id: str,
+    model_dir: Optional[str],
+    warmup: Sequence[int],
+    sample_rate: int,
+    tasks: 'mp.Queue',
+    results: 'mp.Queue'
+):
+    try:
+        if cores and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(threads)
+        model = _build_worker_model(repo_id, config, weights, stft_backend)
+        if warmup:
+            model.warmup(warmup)
+    except Exception:
+        # task_id None tells the dispatcher that the pool is broken
+        results.put((None, None, f'Worker {index} failed to start:\n{traceback.format_exc()}'))
+        return
+    pipelines = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, text, voice, speed, lang_code = task
+        try:
+            if lang_code not in pipelines:
+                pipelines[lang_code] = KPipeline(
+                    lang_code=lang_code, repo_id=repo_id, model=model, model_dir=model_dir, sample_rate=sample_rate
+                )
+                pipelines[lang_code].voices.update(voices)
+            out = list(pipelines[lang_code](text, voice=voice, speed=speed))
+            results.put((task_id, out, None))
+        except Exception:
+            results.put((task_id, None, f'Worker {index} failed:\n{traceback.format_exc()}'))
+
+class WorkerPool:
+    '''
+    WorkerPool runs KPipelines in N worker processes that share one KModel.
+
+    The model (and any preloaded voices) is loaded once in the parent and moved
+    into shared memory. Workers attach to those pages read-only, so each extra
+    worker costs G2P state and activations, not another copy of the weights.
+    Alternatively, pass model='path/to/kokoro.safetensors' (see `kokoro convert`)
+    and each worker memory-maps that file, sharing it through the page cache.
+    With warmup=[16, 64, 256], each worker runs KModel.warmup at those lengths
+    before taking tasks, so the first real requests do not pay first-call costs.
+    Results are resampled to sample_rate in the workers (see KPipeline).
+
+    Each worker is pinned to its own set of cores and sets torch.set_num_threads
+    to match, so workers do not oversubscribe the host:
+        with WorkerPool(workers=4, threads_per_worker=2, voices=['af_heart']) as pool:
+            results = pool.submit('Hello world!', 'af_heart').result()
+
+    submit() returns a concurrent.futures.Future resolving to the list of
+    KPipeline.Result objects the worker's pipeline yielded for that text.
+    If a worker fails to start or dies (e.g. OOM-killed), the pool is broken:
+    every outstanding future fails and later submits raise, as with
+    concurrent.futures.ProcessPoolExecutor.
+    '''
+    # Seconds between worker liveness checks while no results arrive
+    POLL_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        repo_id: Optional[str] = None,
+        model: Union[KModel, str, None] = None,
+        voices: Iterable[str] = (),
+        model_dir: Optional[str] = None,
+        disable_complex: bool = False,
+        stft_backend: Optional[str] = None,
+        pin_cores: bool = True,
+        start_method: str = 'spawn',
+        warmup: Sequence[int] = (),
+        sample_rate: int = KModel.SAMPLE_RATE
+    ):
+        if repo_id is None:
+            repo_id = 'hexgrad/Kokoro-82M'
+        self.repo_id = repo_id
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+        if workers is None:
+            workers = max(1, len(cores) // threads_per_worker)
+        self.workers = workers
+        if stft_backend is None:
+            stft_backend = 'custom' if disable_complex else 'torch'
+        if isinstance(model, str):
+            self.model = None
+            with open(resolve(repo_id, 'config.json', model_dir), 'r', encoding='utf-8') as r:
+                config = json.load(r)
+            weights = model
+        else:
+            if model is None:
+                model = KModel(repo_id=repo_id, model_dir=model_dir, stft_backend=stft_backend)
+            # Parameters and buffers move into shared memory; workers map the same pages
+            self.model = model.cpu().eval().share_memory()
+            stft_backend = self.model.decoder.generator.stft_backend
+            config, weights = self.model.config, self.model.weights()
+        self.voices = {}
+        for v in voices:
+            f = v if v.endswith('.pt') else resolve(repo_id, f'voices/{v}.pt', model_dir)
+            self.voices[v] = torch.load(f, weights_only=True).share_memory_()
+        ctx = mp.get_context(start_method)
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._processes = []
+        self._broken: Optional[str] = None
+        self._closing = False
+        for i in range(workers):
+            worker_cores = cores[i*threads_per_worker:(i+1)*threads_per_worker] if pin_cores else None
+            p = ctx.Process(
+                target=_worker_main,
+                args=(i, config, weights, stft_backend, self.voices, worker_cores or None, threads_per_worker,
+                      repo_id, model_dir, tuple(warmup), sample_rate, self._tasks, self._results),
+                daemon=True
+            )
+            p.start()
+            logger.debug(f"Started worker {i} (pid {p.pid}) on cores {worker_cores}")
+            self._processes.append(p)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            try:
+                item = self._results.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                dead = [p for p in self._processes if p.exitcode is not None]
+                if dead and not self._closing:
+                    self._break(f'Worker process {dead[0].pid} exited unexpectedly with code {dead[0].exitcode}')
+                continue
+            if item is None:
+                break
+            task_id, out, error = item
+            if task_id is None:
+                self._break(error)
+                continue
+            with self._lock:
+                # Futures of a broken pool have already failed
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(out)
+
+    def _break(self, error: str):
+        '''Marks the pool broken and fails every outstanding future.'''
+        with self._lock:
+            if self._broken is None:
+                logger.error(error)
+                self._broken = error
+            futures, self._futures = list(self._futures.values()), {}
+        for future in futures:
+            future.set_exception(RuntimeError(self._broken))
+
+    def submit(
+        self,
+        text: str,
+        voice: str,
+        speed: float = 1,
+        lang_code: Optional[str] = None
+    ) -> Future:
+        '''
+        Queues text for synthesis. lang_code defaults to the voice's language
+        (see KPipeline.voice_lang) and is required for .pt paths and blends
+        that mix languages.
+        '''
+        lang_code = lang_code or KPipeline.voice_lang(voice)
+        if lang_code is None:
+            raise ValueError(f'Cannot infer a language from voice {voice!r}; pass lang_code')
+        future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            if self._broken is not None:
+                raise RuntimeError(f'WorkerPool is broken: {self._broken}')
+            self._futures[task_id] = future
+        self._tasks.put((task_id, text, voice, speed, lang_code))
+        return future
+
+    def shutdown(self):
+        self._closing = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for p in self._processes:
+            p.join()
+        self._results.put(None)
+        self._dispatcher.join()
+        self._processes = []
+
+    def __enter__(self) -> 'WorkerPool':
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+@dataclass
+class SchedulerStats:
+    requests: int = 0
+    batches: int = 0
+    rejected: int = 0
+    queue_time: float = 0.0
+    max_queue_time: float = 0.0
+    compute_time: float = 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    @property
+    def mean_queue_ms(self) -> float:
+        return 1000 * self.queue_time / self.requests if self.requests else 0.0
+
+    @property
+    def mean_compute_ms(self) -> float:
+        return 1000 * self.compute_time / self.batches if self.batches else 0.0
+
+@dataclass
+class _Request:
+    input_ids: List[int]
+    ref_s: torch.FloatTensor
+    speed: float
+    future: Future
+    enqueued: float
+
+class BatchScheduler:
+    '''
+    BatchScheduler groups phoneme chunks from concurrent callers into batched
+    KModel.forward_batch calls.
+
+    Requests are bucketed by input length (bucket_size input_ids per bucket) to
+    keep padding low. The oldest bucket is flushed once it holds max_batch_size
+    requests or its head has waited max_wait_ms. Once max_queue requests are
+    pending, submit() blocks (up to timeout) and then raises queue.Full.
+
+    A BatchScheduler quacks like a KModel, so concurrent KPipelines can share it:
+        scheduler = BatchScheduler(model, max_batch_size=8, max_wait_ms=10)
+        for result in pipeline(text, voice='af_heart', model=scheduler):
+            ...
+
+    stats holds cumulative queue-time vs compute-time counters.
+    '''
+    def __init__(
+        self,
+        model: KModel,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10,
+        max_queue: int = 256,
+        bucket_size: int = 64
+    ):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.bucket_size = bucket_size
+        self.stats = SchedulerStats()
+        self._buckets: Dict[int, Deque[_Request]] = {}
+        self._depth = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def device(self):
+        return self.model.device
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    def submit(
+        self,
+        phonemes: str,
+        ref_s: torch.FloatTensor,
+        speed: float = 1,
+        timeout: Optional[float] = None
+    ) -> Future:
+        '''Queues one phoneme chunk; the Future resolves to a KModel.Output.'''
+        request = _Request(self.model.phonemes_to_ids(phonemes), ref_s, speed, Future(), 0.0)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('BatchScheduler is closed')
+            if not self._cond.wait_for(lambda: self._depth < self.max_queue, timeout):
+                self.stats.rejected += 1
+                raise queue.Full(f'{self._depth} requests already pending')
+            request.enqueued = time.perf_counter()
+            bucket = len(request.input_ids) // self.bucket_size
+            self._buckets.setdefault(bucket, deque()).append(request)
+            emit('queue_depth', self._depth)
+            self._depth += 1
+            self._cond.notify_all()
+        return request.future
+
+    def __call__(
+        self,
+        phonemes: str,
+        ref_s: torch.FloatTensor,
+        speed: float = 1,
+        return_output: bool = False
+    ) -> Union[KModel.Output, torch.FloatTensor]:
+        output = self.submit(phonemes, ref_s, speed).result()
+        return output if return_output else output.audio
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        with self._cond:
+            while True:
+                if not self._depth:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                q = min((q for q in self._buckets.values() if q), key=lambda q: q[0].enqueued)
+                wait = q[0].enqueued + self.max_wait - time.perf_counter()
+                if len(q) >= self.max_batch_size or wait <= 0 or self._closed:
+                    batch = [q.popleft() for _ in range(min(len(q), self.max_batch_size))]
+                    self._depth -= len(batch)
+                    self._cond.notify_all()
+                    return [r for r in batch if r.future.set_running_or_notify_cancel()]
+                self._cond.wait(wait)
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                lengths = [len(r.input_ids) for r in batch]
+                input_ids = torch.zeros((len(batch), max(lengths)), dtype=torch.long)
+                for i, r in enumerate(batch):
+                    input_ids[i, :lengths[i]] = torch.LongTensor(r.input_ids)
+                outputs = self.model.forward_batch(
+                    input_ids.to(self.device),
+                    torch.LongTensor(lengths).to(self.device),
+                    torch.cat([r.ref_s.reshape(1, -1) for r in batch]).to(self.device),
+                    torch.FloatTensor([r.speed for r in batch]).to(self.device)
+                )
+            except Exception as e:
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            end = time.perf_counter()
+            with self._cond:
+                self.stats.requests += len(batch)
+                self.stats.batches += 1
+                self.stats.compute_time += end - start
+                for r in batch:
+                    self.stats.queue_time += start - r.enqueued
+                    self.stats.max_queue_time = max(self.stats.max_queue_time, start - r.enqueued)
+            logger.debug(f"Batch of {len(batch)} (lengths {lengths}) took {1000*(end-start):.1f}ms")
+            for r, output in zip(batch, outputs):
+                r.future.set_result(output)
+
+    def close(self):
+        '''Flushes pending requests and stops the scheduler thread.'''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def __enter__(self) -> 'BatchScheduler':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,127 @@
+'''
+Sentence and clause splitting for the non-English KPipeline chunker.
+
+split_sentences is a port of kokoro.js/src/splitter.js: it splits on . ! ? …
+and their CJK forms, keeps closing quotes and brackets with the sentence they
+end, never splits inside quotes or brackets, and skips abbreviations, initials,
+numbered lists, decimals, URLs and emails. Unlike splitter.js, the CJK
+terminators 。！？ end a sentence without a following space, since CJK text
+has none.
+'''
+from typing import List
+import re
+
+TERMINATORS = '.!?…。？！'
+CJK_TERMINATORS = '。？！'
+TRAILING = '"\')]}」』”’»'
+CLAUSE_ENDS = ',;:—、，；：'
+CJK_CLAUSE_ENDS = '、，；：—'
+
+# Strings of single letters joined by periods (e.g. "i.e", "u.s.a") are handled separately
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'sgt', 'col', 'gen', 'rep', 'sen', 'gov', 'lt', 'maj', 'capt',
+    'st', 'mt', 'etc', 'co', 'inc', 'ltd', 'dept', 'vs', 'p', 'pg', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul',
+    'aug', 'sep', 'sept', 'oct', 'nov', 'dec', 'sun', 'mon', 'tu', 'tue', 'tues', 'wed', 'th', 'thu', 'thur',
+    'thurs', 'fri', 'sat',
+}
+
+MATCHING = {
+    ')': '(', ']': '[', '}': '{', '》': '《', '〉': '〈', '›': '‹', '»': '«',
+    '」': '「', '』': '『', '〕': '〔', '】': '【', '”': '“',
+}
+OPENING = set(MATCHING.values())
+
+def is_abbreviation(token: str) -> bool:
+    token = re.sub(r'\.+$', '', re.sub(r"['’]s$", '', token, flags=re.I))
+    return token.lower() in ABBREVIATIONS
+
+def _update_stack(c: str, stack: List[str], i: int, text: str):
+    '''Tracks open quotes and brackets; an apostrophe between letters is a contraction.'''
+    if c in '"\'':
+        if c == "'" and 0 < i < len(text) - 1 and text[i-1].isalpha() and text[i+1].isalpha():
+            return
+        if stack and stack[-1] == c:
+            stack.pop()
+        else:
+            stack.append(c)
+    elif c in OPENING:
+        stack.append(c)
+    elif c in MATCHING and stack and stack[-1] == MATCHING[c]:
+        stack.pop()
+
+def split_sentences(text: str) -> List[str]:
+    '''Splits text into sentences (and lines), each stripped of surrounding whitespace.'''
+    sentences = []
+    start = i = 0
+    stack: List[str] = []
+    n = len(text)
+    while i < n:
+        c = text[i]
+        _update_stack(c, stack, i, text)
+        if stack or not (c in TERMINATORS or c == '\n'):
+            i += 1
+            continue
+        # Numbered lists, e.g. "1." or "\n2."
+        if re.search(r'(^|\n)\d+$', text[start:i]):
+            i += 1
+            continue
+        end = i
+        while end + 1 < n and text[end+1] in TERMINATORS:
+            end += 1
+        while end + 1 < n and text[end+1] in TRAILING:
+            end += 1
+        next_non_space = end + 1
+        while next_non_space < n and text[next_non_space].isspace():
+            next_non_space += 1
+        # Without a following space we may be inside a token (e.g. "$9.99"), except after CJK terminators
+        if i == next_non_space - 1 and c != '\n' and c not in CJK_TERMINATORS:
+            i += 1
+            continue
+        if next_non_space == n:
+            break
+        token_start = i - 1
+        while token_start >= 0 and not text[token_start].isspace():
+            token_start -= 1
+        token_start = max(start, token_start + 1)
+        token = re.match(r'\S*', text[token_start:]).group()
+        if not token:
+            i += 1
+            continue
+        if c != '\n' and c not in CJK_TERMINATORS:
+            if (re.search(r'https?[,:]//', token) or '@' in token) and token[-1:] not in TERMINATORS:
+                i = token_start + len(token)
+                continue
+            if is_abbreviation(token):
+                i += 1
+                continue
+            # Middle initials followed by a capitalized word are part of a name
+            if re.fullmatch(r'([A-Za-z]\.)+', token) and next_non_space < n and text[next_non_space].isupper():
+                i += 1
+                continue
+            if c == '.' and next_non_space < n and text[next_non_space].islower():
+                i += 1
+                continue
+        sentence = text[start:end+1].strip()
+        # A lone ellipsis belongs to the next sentence
+        if sentence in ('...', '…'):
+            i += 1
+            continue
+        if sentence:
+            sentences.append(sentence)
+        i = start = end + 1
+    remainder = text[start:].strip()
+    if remainder:
+        sentences.append(remainder)
+    return sentences
+
+def split_clauses(sentence: str) -> List[str]:
+    '''Splits a sentence after clause punctuation (commas, semicolons, colons, dashes and their CJK forms).'''
+    pattern = rf'(?<=[{re.escape(CLAUSE_ENDS)}])\s+|(?<=[{re.escape(CJK_CLAUSE_ENDS)}])'
+    return [c.strip() for c in re.split(pattern, sentence) if c.strip()]
+
+def split_half(text: str) -> List[str]:
+    '''Splits text in two at the whitespace nearest its middle, or at the middle for unspaced scripts.'''
+    middle = len(text) // 2
+    spaces = [m.start() for m in re.finditer(r'\s+', text)]
+    cut = min(spaces, key=lambda s: abs(s - middle)) if spaces else middle
+    return [part.strip() for part in (text[:cut], text[cut:]) if part.strip()]
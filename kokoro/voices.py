@@ -0,0 +1,126 @@
+'''
+Voice blends and the packed voice store.
+
+A blend spec mixes voices with weights, e.g. 'af_bella:0.7,af_sky:0.3'.
+Weights default to equal shares and are normalized to sum to 1, so
+'af_bella,af_sky' is the plain mean, as before. VoiceBlend computes a style
+row only when KPipeline.infer asks for it, instead of mixing all 510 rows.
+
+The packed voice store is one .safetensors file of {name: pack}, memory-mapped
+on load like the weights from `kokoro convert`. Blends can be written into it
+under their spec, and are then served as-is instead of being mixed again.
+'''
+from .hub import resolve
+from collections import OrderedDict
+from loguru import logger
+from safetensors.torch import load_file, save_file
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import torch
+
+def parse_blend(voice: str, delimiter: str = ',') -> List[Tuple[str, float]]:
+    '''Splits a blend spec into [(name, weight)], with weights normalized to sum to 1.'''
+    parts = []
+    for part in voice.split(delimiter):
+        name, sep, weight = part.strip().rpartition(':')
+        try:
+            # A suffix that is not a number is part of the name, e.g. C:\voices\x.pt
+            parts.append((name, float(weight)) if sep else (weight, None))
+        except ValueError:
+            parts.append((part.strip(), None))
+    if any(w is not None and w < 0 for _, w in parts):
+        raise ValueError(f'Blend weights must not be negative: {voice}')
+    weights = [1.0 if w is None else w for _, w in parts]
+    total = sum(weights)
+    if total <= 0:
+        raise ValueError(f'Blend weights must not all be zero: {voice}')
+    return [(name, w / total) for (name, _), w in zip(parts, weights)]
+
+def blend_key(blend: List[Tuple[str, float]]) -> str:
+    '''Canonical name of a parsed blend, independent of order; a single voice is just its name.'''
+    if len(blend) == 1:
+        return blend[0][0]
+    return ','.join(f'{name}:{weight:.4g}' for name, weight in sorted(blend))
+
+class VoiceBlend:
+    '''
+    A weighted mix of voice packs that behaves like a pack where KPipeline uses
+    one: len(), .to(device) and pack[index]. Rows are mixed on first access and
+    memoized, so a blend costs a few rows of work instead of all 510.
+    '''
+    def __init__(self, packs: List[torch.FloatTensor], weights: List[float]):
+        assert len(packs) == len(weights) and packs, (len(packs), len(weights))
+        self.packs = packs
+        self.weights = weights
+        self._rows: Dict[int, torch.FloatTensor] = {}
+
+    def __len__(self) -> int:
+        return len(self.packs[0])
+
+    def __getitem__(self, index: int) -> torch.FloatTensor:
+        index = int(index) % len(self)
+        if index not in self._rows:
+            row = self.packs[0][index] * self.weights[0]
+            for pack, weight in zip(self.packs[1:], self.weights[1:]):
+                row = row + pack[index] * weight
+            self._rows[index] = row
+        return self._rows[index]
+
+    def to(self, device: Union[str, torch.device]) -> 'VoiceBlend':
+        if all(p.device == torch.device(device) for p in self.packs):
+            return self
+        return VoiceBlend([p.to(device) for p in self.packs], self.weights)
+
+    def tensor(self) -> torch.FloatTensor:
+        '''The full blended pack, e.g. to write into a voice store.'''
+        return sum(p * w for p, w in zip(self.packs, self.weights))
+
+class BlendCache:
+    '''LRU of VoiceBlends by blend_key, bounded by count.'''
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self.items: 'OrderedDict[str, VoiceBlend]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[VoiceBlend]:
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key: str, blend: VoiceBlend):
+        self.items[key] = blend
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+def load_voices(path: str) -> Dict[str, torch.FloatTensor]:
+    '''Memory-maps a voice store written by save_voices.'''
+    voices = load_file(path, device='cpu')
+    logger.debug(f"Loaded {len(voices)} voices from {path}")
+    return voices
+
+def save_voices(
+    path: str,
+    voices: Iterable[str],
+    repo_id: str = 'hexgrad/Kokoro-82M',
+    model_dir: Optional[str] = None
+) -> List[str]:
+    '''
+    Writes voices (names, .pt paths or blend specs) into one .safetensors file.
+    Blends are stored fully mixed under blend_key. Returns the stored names.
+    '''
+    packs: Dict[str, torch.FloatTensor] = {}
+    def load(name: str) -> torch.FloatTensor:
+        if name not in packs:
+            f = name if name.endswith('.pt') else resolve(repo_id, f'voices/{name}.pt', model_dir)
+            packs[name] = torch.load(f, weights_only=True)
+        return packs[name]
+    tensors = {}
+    for voice in voices:
+        blend = parse_blend(voice)
+        key = blend_key(blend)
+        if len(blend) == 1:
+            tensors[key] = load(key)
+        else:
+            tensors[key] = VoiceBlend([load(n) for n, _ in blend], [w for _, w in blend]).tensor()
+    save_file({k: v.contiguous() for k, v in tensors.items()}, path, metadata={'format': 'pt'})
+    return list(tensors)
@@ -0,0 +1,66 @@
+from loguru import logger
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+import torch
+
+if TYPE_CHECKING:
+    from .model import KModel
+
+def flatten(weights: Dict[str, Dict[str, torch.Tensor]]) -> Dict[str, torch.Tensor]:
+    '''{submodule: state_dict} -> {'submodule.key': tensor}, dropping DataParallel 'module.' prefixes.'''
+    tensors = {}
+    for key, state_dict in weights.items():
+        for k, v in state_dict.items():
+            if k.startswith('module.'):
+                k = k[7:]
+            tensors[f'{key}.{k}'] = v
+    return tensors
+
+def unflatten(tensors: Dict[str, torch.Tensor]) -> Dict[str, Dict[str, torch.Tensor]]:
+    weights = {}
+    for name, v in tensors.items():
+        key, k = name.split('.', 1)
+        weights.setdefault(key, {})[k] = v
+    return weights
+
+def load_safetensors(path: str) -> Tuple[Dict[str, Dict[str, torch.Tensor]], Dict[str, str]]:
+    '''
+    Memory-maps a .safetensors file written by save_safetensors.
+
+    float32 tensors are views onto the mapped file: nothing is copied, and
+    every process loading the same file shares its pages via the page cache.
+    Files saved in a reduced dtype are upcast to float32 (a copy) on load.
+    '''
+    with safe_open(path, framework='pt') as f:
+        metadata = f.metadata() or {}
+    tensors = load_file(path, device='cpu')
+    for k, v in tensors.items():
+        if v.is_floating_point() and v.dtype != torch.float32:
+            tensors[k] = v.float()
+    logger.debug(f"Loaded {len(tensors)} tensors from {path} with metadata {metadata}")
+    return unflatten(tensors), metadata
+
+def save_safetensors(
+    model: 'KModel',
+    path: str,
+    dtype: Optional[torch.dtype] = None,
+    freeze_weight_norm: bool = False
+) -> None:
+    '''
+    Writes model weights as one flat, prefix-normalized .safetensors file.
+
+    freeze_weight_norm bakes weight_norm into plain weights (see
+    KModel.remove_weight_norm), so the loading model skips recomputing them
+    on every forward. dtype casts floating point tensors, e.g. torch.float16
+    to halve the file size.
+    '''
+    if freeze_weight_norm:
+        model.remove_weight_norm()
+    tensors = flatten(model.weights())
+    for k, v in tensors.items():
+        if dtype is not None and v.is_floating_point():
+            v = v.to(dtype)
+        tensors[k] = v.detach().cpu().contiguous()
+    metadata = {'format': 'pt', 'weight_norm': 'frozen' if freeze_weight_norm else 'parametrized'}
+    save_file(tensors, path, metadata=metadata)
@@ -0,0 +1,48 @@
+import json
+import pytest
+import torch
+from kokoro.istftnet import Decoder
+from kokoro.modules import CustomAlbert, ProsodyPredictor, TextEncoder
+from transformers import AlbertConfig
+
+# The decoder hardcodes 512 channels and style_dim=128; everything else is shrunk
+TINY_CONFIG = {
+    'istftnet': {
+        'upsample_kernel_sizes': [20, 12], 'upsample_rates': [10, 6], 'gen_istft_hop_size': 5,
+        'gen_istft_n_fft': 20, 'resblock_dilation_sizes': [[1, 3, 5]], 'resblock_kernel_sizes': [3],
+        'upsample_initial_channel': 512,
+    },
+    'dim_in': 64, 'dropout': 0.2, 'hidden_dim': 512, 'max_conv_dim': 512, 'max_dur': 50, 'multispeaker': True,
+    'n_layer': 1, 'n_mels': 80, 'n_token': 178, 'style_dim': 128, 'text_encoder_kernel_size': 5,
+    'plbert': {'hidden_size': 32, 'num_attention_heads': 2, 'intermediate_size': 64,
+               'max_position_embeddings': 512, 'num_hidden_layers': 1, 'dropout': 0.1},
+    'vocab': {p: i for i, p in enumerate('abcdefghijklmnopqrstuvwxyzɾəɪʊæɑɔɲðˈˌː ,.!?;:—…"()', 1)},
+}
+
+
+@pytest.fixture(scope='session')
+def tiny_model_dir(tmp_path_factory):
+    '''A model dir (config.json, kokoro-v1_0.pth, voices/ef_dora.pt) holding a small randomly initialized model.'''
+    path = tmp_path_factory.mktemp('tiny_model')
+    config = TINY_CONFIG
+    (path / 'config.json').write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+    torch.manual_seed(0)
+    weights = dict(
+        bert=CustomAlbert(AlbertConfig(vocab_size=config['n_token'], **config['plbert'])).state_dict(),
+        bert_encoder=torch.nn.Linear(config['plbert']['hidden_size'], config['hidden_dim']).state_dict(),
+        predictor=ProsodyPredictor(
+            style_dim=config['style_dim'], d_hid=config['hidden_dim'],
+            nlayers=config['n_layer'], max_dur=config['max_dur'], dropout=config['dropout']
+        ).state_dict(),
+        text_encoder=TextEncoder(
+            channels=config['hidden_dim'], kernel_size=config['text_encoder_kernel_size'],
+            depth=config['n_layer'], n_symbols=config['n_token']
+        ).state_dict(),
+        decoder=Decoder(
+            dim_in=config['hidden_dim'], style_dim=config['style_dim'], dim_out=config['n_mels'], **config['istftnet']
+        ).state_dict(),
+    )
+    torch.save(weights, path / 'kokoro-v1_0.pth')
+    (path / 'voices').mkdir()
+    torch.save(torch.randn(510, 1, 2 * config['style_dim']) * 0.1, path / 'voices' / 'ef_dora.pt')
+    return path
@@ -0,0 +1,92 @@
+import io
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+from kokoro import audio
+from kokoro.model import KModel
+from kokoro.pipeline import KPipeline
+
+
+def results(*chunks):
+    for chunk in chunks:
+        output = KModel.Output(audio=torch.tensor(chunk, dtype=torch.float32), pred_dur=None)
+        yield KPipeline.Result(graphemes='', phonemes='', output=output)
+
+
+class Pipe(io.RawIOBase):
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, b):
+        self.data += bytes(b)
+        return len(b)
+
+
+def test_to_int16_rounds_clips_and_reuses_buffers():
+    out = np.empty(8, dtype='<i2')
+    scratch = np.empty(8, dtype=np.float32)
+    pcm = audio.to_int16(torch.tensor([0, 0.5, -0.5, 1, -1, 3, -3]), out, scratch)
+    assert pcm.base is out
+    assert pcm.tolist() == [0, 16384, -16384, 32767, -32767, 32767, -32768]
+
+
+def test_pcm16_encoder_grows():
+    encoder = audio.PCM16Encoder(capacity=2)
+    assert len(encoder(np.zeros(5, np.float32))) == 5
+    assert len(encoder(np.zeros(3, np.float32))) == 3
+
+
+@pytest.mark.parametrize('fmt', ['wav', 'flac', 'opus'])
+def test_write_results_roundtrip(fmt):
+    f = io.BytesIO()
+    chunks = [np.full(2400, 0.25), np.full(4800, -0.25)]
+    assert audio.write_results(results(*chunks), f, fmt) == 7200
+    decoded, sr = sf.read(io.BytesIO(f.getvalue()))
+    assert sr == 24000 and len(decoded) == 7200
+    if fmt != 'opus':
+        assert np.allclose(decoded, np.concatenate(chunks), atol=1e-4)
+
+
+def test_wav_to_pipe_uses_streaming_header():
+    pipe = Pipe()
+    audio.write_results(results(np.zeros(100)), pipe, 'wav')
+    assert bytes(pipe.data[4:8]) == b'\xff\xff\xff\xff'
+    assert len(pipe.data) == 44 + 200
+
+
+def test_encode_stream_yields_per_chunk():
+    chunks = list(audio.encode_stream(results(np.zeros(100), np.zeros(50)), 's16le'))
+    assert [len(c) for c in chunks] == [200, 100]
+    data = b''.join(audio.encode_stream(results(np.zeros(24000), np.zeros(24000)), 'opus'))
+    decoded, sr = sf.read(io.BytesIO(data))
+    assert len(decoded) == 48000
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        audio.write_results(results(np.zeros(10)), io.BytesIO(), 'mp3')
+
+
+@pytest.mark.parametrize('rate', [8000, 16000, 22050, 48000])
+def test_resampler_chunked_matches_one_shot(rate):
+    x = torch.randn(24000)
+    r = audio.Resampler(24000, rate)
+    whole = torch.cat([r(x), r.flush()])
+    assert len(whole) == -(-24000 * rate // 24000)
+    parts = [r(c) for c in x.split(777)] + [r.flush()]
+    assert torch.allclose(torch.cat(parts), whole, atol=1e-5)
+
+
+def test_resampler_preserves_tone():
+    t = torch.arange(24000) / 24000
+    r = audio.Resampler(24000, 16000)
+    y = torch.cat([r(torch.sin(2 * torch.pi * 440 * t)), r.flush()])
+    expected = torch.sin(2 * torch.pi * 440 * torch.arange(len(y)) / 16000)
+    assert (y - expected)[50:-50].abs().max() < 1e-3
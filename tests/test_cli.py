@@ -0,0 +1,156 @@
+import io
+import numpy as np
+import pytest
+import soundfile as sf
+import sys
+import torch
+from kokoro import __main__ as cli
+from kokoro.model import KModel
+from kokoro.pipeline import KPipeline
+
+
+class Sink(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+def make_results(monkeypatch, chunks):
+    def generate_audio(text, kokoro_language, voice, speed=1, model_dir=None, sample_rate=24000, warmup=False):
+        for audio in chunks:
+            result = KPipeline.Result(graphemes=text, phonemes='')
+            result.output = KModel.Output(audio=torch.tensor(audio), pred_dur=None)
+            yield result
+    monkeypatch.setattr(cli, 'generate_audio', generate_audio)
+
+
+def test_stream_wav_is_readable_and_flushed_per_chunk(monkeypatch):
+    make_results(monkeypatch, [[0.5] * 100, [2.0] * 50])
+    out = Sink()
+    cli.stream_audio(out, 'x', 'a', 'af_heart', fmt='wav')
+    assert out.flushes == 3
+    audio, sr = sf.read(io.BytesIO(out.getvalue()), dtype='int16')
+    assert sr == 24000 and len(audio) == 150
+    # Out of range samples are clipped rather than wrapped
+    assert audio[0] == 16384 and audio[-1] == 32767
+
+
+def test_stream_raw_formats(monkeypatch):
+    make_results(monkeypatch, [[0.25] * 10])
+    out = Sink()
+    cli.stream_audio(out, 'x', 'a', 'af_heart', fmt='f32le')
+    assert np.array_equal(np.frombuffer(out.getvalue(), '<f4'), np.full(10, 0.25, np.float32))
+    out = Sink()
+    cli.stream_audio(out, 'x', 'a', 'af_heart', fmt='s16le')
+    assert len(out.getvalue()) == 20
+
+
+def test_load_manifest_dedupes_jobs(tmp_path):
+    (tmp_path / 'chapter.txt').write_text('From a file.')
+    manifest = tmp_path / 'jobs.jsonl'
+    manifest.write_text('\n'.join([
+        '{"text": "Hello.", "voice": "af_heart", "output": "a.wav"}',
+        '{"text": "Hello.", "output": "b.wav"}',
+        '{"text": "Hello.", "voice": "af_heart", "speed": 1.2, "output": "c.wav"}',
+        '{"file": "chapter.txt", "voice": "bf_emma", "output": "d.wav"}',
+        '{"text": "Again.", "output": "a.wav"}',
+        '',
+    ]))
+    jobs, total = cli.load_manifest(manifest, voice='af_heart', speed=1)
+    assert total == 5
+    assert jobs == {
+        ('Hello.', 'af_heart', 1.0, 'a'): [tmp_path / 'a.wav', tmp_path / 'b.wav'],
+        ('Hello.', 'af_heart', 1.2, 'a'): [tmp_path / 'c.wav'],
+        ('From a file.', 'bf_emma', 1.0, 'b'): [tmp_path / 'd.wav'],
+    }
+    # A voice file says nothing about its language
+    manifest.write_text('{"text": "Hello.", "voice": "me.pt", "output": "e.wav"}')
+    with pytest.raises(ValueError, match='language'):
+        cli.load_manifest(manifest, voice='af_heart', speed=1)
+
+
+def test_run_manifest_preloads_blend_voices_and_honors_format(monkeypatch, tmp_path):
+    from concurrent.futures import Future
+    from kokoro import serving
+    pools = []
+
+    class FakePool:
+        workers = 1
+
+        def __init__(self, voices, sample_rate, **kwargs):
+            self.voices, self.sample_rate = voices, sample_rate
+            pools.append(self)
+
+        def submit(self, text, voice, speed, lang_code):
+            result = KPipeline.Result(graphemes=text, phonemes='')
+            result.output = KModel.Output(audio=torch.zeros(self.sample_rate // 10))
+            future = Future()
+            future.set_result([result])
+            return future
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    monkeypatch.setattr(serving, 'WorkerPool', FakePool)
+    manifest = tmp_path / 'jobs.jsonl'
+    manifest.write_text('\n'.join([
+        '{"text": "Hello.", "voice": "af_heart:0.7", "output": "a.flac"}',
+        '{"text": "Hello.", "voice": "af_bella:0.7,af_sky:0.3", "output": "b.flac"}',
+    ]))
+    cli.run_manifest(manifest, voice='af_heart', fmt='flac', sample_rate=16000)
+    assert pools[0].voices == {'af_heart', 'af_bella', 'af_sky'} and pools[0].sample_rate == 16000
+    info = sf.info(tmp_path / 'a.flac')
+    assert (info.format, info.samplerate, info.frames) == ('FLAC', 16000, 1600)
+
+
+def test_render_corpus_loads_the_corpus_model(monkeypatch, tmp_path):
+    import kokoro
+    from kokoro.corpus import CorpusWriter
+
+    corpus = tmp_path / 'zh.kph'
+    with CorpusWriter(str(corpus), lang_code='z', vocab={}, repo_id='hexgrad/Kokoro-82M-v1.1-zh'):
+        pass
+    loaded = []
+
+    class Loaded(Exception):
+        pass
+
+    class FakeModel:
+        MODEL_NAMES = KModel.MODEL_NAMES
+
+        def __init__(self, repo_id, model_dir=None):
+            loaded.append(repo_id)
+            raise Loaded
+    monkeypatch.setattr(kokoro, 'KModel', FakeModel)
+    with pytest.raises(Loaded):
+        cli.render_corpus(['-i', str(corpus), '-o', str(tmp_path / 'out.wav')])
+    assert loaded == ['hexgrad/Kokoro-82M-v1.1-zh']
+    # A --repo-id that disagrees with the corpus is refused before any model is loaded
+    with pytest.raises(SystemExit):
+        cli.render_corpus(['-i', str(corpus), '-o', str(tmp_path / 'out.wav'), '--repo-id', 'hexgrad/Kokoro-82M'])
+    assert loaded == ['hexgrad/Kokoro-82M-v1.1-zh']
+
+
+def test_main_restores_stdout_after_streaming(monkeypatch):
+    class Stdout(io.TextIOWrapper):
+        def isatty(self):
+            return False
+
+    stdout = Stdout(io.BytesIO())
+    streamed = []
+
+    def stream_audio(out, text, **kwargs):
+        streamed.append(out)
+        print('stray output')
+    monkeypatch.setattr(cli, 'stream_audio', stream_audio)
+    monkeypatch.setattr('sys.argv', ['kokoro', '-t', 'Hello.', '-o', '-'])
+    monkeypatch.setattr('sys.stdout', stdout)
+    cli.main()
+    assert sys.stdout is stdout and streamed == [stdout.buffer]
+    assert stdout.buffer.getvalue() == b''
@@ -0,0 +1,97 @@
+import io
+import torch
+from kokoro.corpus import CorpusReader, CorpusWriter, token_spans
+from kokoro.model import KModel
+from kokoro.pipeline import KPipeline
+from misaki import en
+
+VOCAB = {c: i for i, c in enumerate(' .,abcdefghijklmnopqrstuvwxyzðˈ', 1)}
+
+
+def tokens(*words):
+    return [en.MToken(text=w, tag='X', whitespace=ws, phonemes=ps) for w, ps, ws in words]
+
+
+def write(results):
+    f = io.BytesIO()
+    writer = CorpusWriter(f, lang_code='a', vocab=VOCAB)
+    for result in results:
+        writer.write(result)
+    return f.getvalue()
+
+
+def test_token_spans_index_the_chunk_phonemes():
+    tks = tokens(('"', '', ''), ('Hi', 'hˈI', ' '), (',', ',', ' '), ('there', 'ðˈɛɹ', ''), ('.', '.', ''))
+    ps = KPipeline.tokens_to_ps(tks)
+    assert [ps[a:b] for a, b in token_spans(tks)] == [t.phonemes for t in tks]
+
+
+def test_roundtrip_and_partial_records():
+    tks = tokens(('Hi', 'hˈi', ' '), ('there', 'ðˈer', ''), ('.', '.', ''))
+    data = write([
+        KPipeline.Result(graphemes='Hi there.', phonemes='hˈi ðˈer.', tokens=tks, text_index=0),
+        KPipeline.Result(graphemes='', phonemes='', text_index=1),
+        KPipeline.Result(graphemes='Adiós.', phonemes='aðɪˈos.', text_index=2),
+    ])
+    reader = CorpusReader(io.BytesIO(data))
+    assert reader.lang_code == 'a'
+    first, second = list(reader)
+    assert first.input_ids == [0, *(VOCAB[p] for p in 'hˈi ðˈer.'), 0]
+    assert [(t.text, t.phonemes, t.whitespace) for t in first.tokens] == [('Hi', 'hˈi', ' '), ('there', 'ðˈer', ''), ('.', '.', '')]
+    # Phonemes outside the vocab are dropped from input_ids, as in KModel.phonemes_to_ids
+    assert (second.text_index, second.graphemes, second.tokens) == (2, 'Adiós.', None)
+    assert second.input_ids == [0, *(VOCAB[p] for p in 'aðˈos.'), 0]
+    # A record torn by a crash is skipped
+    assert len(list(CorpusReader(io.BytesIO(data[:-3])))) == 1
+
+
+def test_generate_from_corpus_skips_g2p():
+    class FakeModel:
+        device = 'cpu'
+        vocab = VOCAB
+
+        def __call__(self, phonemes, ref_s, speed=1, return_output=False):
+            return KModel.Output(audio=torch.zeros(100), pred_dur=torch.full((len(phonemes) + 2,), 2))
+
+    data = write([KPipeline.Result(
+        graphemes='Hi there.', phonemes='hˈi ðˈer.', text_index=0,
+        tokens=tokens(('Hi', 'hˈi', ' '), ('there', 'ðˈer', ''), ('.', '.', '')),
+    )])
+    pipeline = object.__new__(KPipeline)
+    pipeline.lang_code = 'a'
+    pipeline.sample_rate = 24000
+    pipeline.voices = {'af_heart': torch.zeros(510, 1, 256)}
+    pipeline.model = FakeModel()
+    pipeline.g2p = None
+    result, = pipeline.generate_from_corpus(CorpusReader(io.BytesIO(data)), voice='af_heart')
+    assert result.phonemes == 'hˈi ðˈer.' and len(result.audio) == 100
+    assert result.tokens[1].start_ts is not None
+
+
+class IdModel(KModel):
+    '''A KModel without weights that records the input_ids it is given.'''
+    device = 'cpu'
+    context_length = 512
+
+    def __init__(self, vocab):
+        torch.nn.Module.__init__(self)
+        self.vocab = vocab
+        self.calls = []
+
+    def forward_with_tokens(self, input_ids, ref_s, speed=1):
+        self.calls.append(input_ids[0].tolist())
+        return torch.zeros(1, 100), torch.full((input_ids.shape[1],), 2)
+
+
+def test_generate_from_corpus_feeds_stored_ids():
+    data = write([KPipeline.Result(graphemes='Hi there.', phonemes='hˈi ðˈer.', text_index=0)])
+    pipeline = KPipeline(lang_code='a', repo_id='hexgrad/Kokoro-82M', model=IdModel(VOCAB), g2p=False)
+    pipeline.voices['af_heart'] = torch.zeros(510, 1, 256)
+    stored = next(iter(CorpusReader(io.BytesIO(data)))).input_ids
+    list(pipeline.generate_from_corpus(CorpusReader(io.BytesIO(data)), voice='af_heart'))
+    assert pipeline.model.calls == [stored]
+    # A model with another vocab maps the stored phonemes through its own
+    vocab = {p: i + 100 for p, i in VOCAB.items()}
+    pipeline.model = IdModel(vocab)
+    list(pipeline.generate_from_corpus(CorpusReader(io.BytesIO(data)), voice='af_heart'))
+    assert pipeline.model.calls == [[0, *(vocab[p] for p in 'hˈi ðˈer.'), 0]]
@@ -1,8 +1,9 @@
+import math
 import torch
 import numpy as np
 import pytest
-from kokoro.custom_stft import CustomSTFT
-from kokoro.istftnet import TorchSTFT
+from kokoro.custom_stft import CustomSTFT, FFTSTFT
+from kokoro.istftnet import Generator, TorchSTFT
 import torch.nn.functional as F
 
 
@@ -79,3 +80,115 @@ def test_different_window_sizes():
 
         # Check that output length is reasonable
         assert output.shape[-1] >= signal.shape[-1]
+
+
+@pytest.mark.parametrize("n_fft,hop", [(20, 5), (800, 200)])
+def test_fft_stft_matches_torch(n_fft, hop):
+    signal = torch.randn(2, 16000)
+    fft_stft = FFTSTFT(filter_length=n_fft, hop_length=hop, win_length=n_fft)
+    expected = torch.stft(signal, n_fft, hop, n_fft, window=torch.hann_window(n_fft), return_complex=True)
+
+    mag, phase = fft_stft.transform(signal)
+    assert torch.allclose(torch.polar(mag, phase), expected, atol=1e-4)
+
+    # Unlike CustomSTFT, the inverse matches torch.istft and reconstructs the input
+    output = fft_stft.inverse(mag, phase)
+    assert output.shape == (2, 1, 16000)
+    assert torch.allclose(output.squeeze(1), torch.istft(expected, n_fft, hop, n_fft, window=torch.hann_window(n_fft)), atol=1e-5)
+    assert torch.allclose(output.squeeze(1), signal, atol=1e-5)
+
+
+@pytest.mark.parametrize("n_fft,hop", [(20, 5), (800, 200)])
+def test_fft_stft_export_path_matches_eager(n_fft, hop, monkeypatch):
+    signal = torch.randn(1, 8000)
+    fft_stft = FFTSTFT(filter_length=n_fft, hop_length=hop, win_length=n_fft)
+    mag, phase = fft_stft.transform(signal)
+    output = fft_stft.inverse(mag, phase)
+
+    # Tracing / ONNX export switches to the stacked conv1d / conv_transpose1d path
+    monkeypatch.setattr(FFTSTFT, "_exporting", staticmethod(lambda: True))
+    conv_mag, conv_phase = fft_stft.transform(signal)
+    assert torch.allclose(conv_mag, mag, atol=1e-4)
+    assert torch.allclose(fft_stft.inverse(mag, phase), output, atol=1e-5)
+
+
+def test_generator_stft_backends_agree():
+    def generator(backend):
+        torch.manual_seed(0)
+        return Generator(
+            style_dim=8, resblock_kernel_sizes=[3], upsample_rates=[2, 2], upsample_initial_channel=16,
+            resblock_dilation_sizes=[[1, 3, 5]], upsample_kernel_sizes=[4, 4],
+            gen_istft_n_fft=20, gen_istft_hop_size=5, stft_backend=backend,
+        ).eval()
+
+    torch.manual_seed(2)
+    x, s, f0 = torch.randn(1, 16, 24), torch.randn(1, 8), torch.full((1, 24), 200.0)
+    outputs = []
+    for backend in ("torch", "fft"):
+        model = generator(backend)
+        assert model.stft_backend == backend
+        # Silence the harmonic source: the phase of near-real bins (e.g. the reflect-padded
+        # first frame) sits on the +-pi branch cut, so analysis phases only agree up to 2*pi
+        model.m_source.l_linear.weight.data.zero_()
+        model.m_source.l_linear.bias.data.zero_()
+        torch.manual_seed(1)
+        with torch.no_grad():
+            outputs.append(model(x, s, f0))
+    assert outputs[0].shape == outputs[1].shape
+    assert torch.allclose(outputs[0], outputs[1], atol=1e-5)
+
+
+def test_generator_stft_backends_agree_with_harmonic_source():
+    torch.manual_seed(2)
+    x, s, f0 = torch.randn(1, 16, 24), torch.randn(1, 8), torch.full((1, 24), 200.0)
+    outputs = []
+    for backend in ("torch", "fft"):
+        torch.manual_seed(0)
+        model = Generator(
+            style_dim=8, resblock_kernel_sizes=[3], upsample_rates=[2, 2], upsample_initial_channel=16,
+            resblock_dilation_sizes=[[1, 3, 5]], upsample_kernel_sizes=[4, 4],
+            gen_istft_n_fft=20, gen_istft_hop_size=5, stft_backend=backend,
+        ).eval()
+        analyze = model.stft.analyze
+
+        def folded(signal, analyze=analyze):
+            # The reflect-padded first frame is real, so its phases sit on the +-pi branch
+            # cut and rounding picks the side; fold them to +pi for both backends
+            har = analyze(signal)
+            phase = har[:, 11:]
+            har[:, 11:] = torch.where(phase < -math.pi + 1e-4, phase + 2 * math.pi, phase)
+            return har
+        model.stft.analyze = folded
+        torch.manual_seed(1)
+        with torch.no_grad():
+            outputs.append(model(x, s, f0))
+    assert outputs[0].shape == outputs[1].shape
+    # Phases of near-silent bins are ill-conditioned, so float32 rounding moves the output slightly more
+    assert torch.allclose(outputs[0], outputs[1], atol=1e-4)
+
+
+@pytest.mark.parametrize("backend", ["torch", "custom", "fft"])
+def test_generator_spectral_head_matches_magnitude_phase_path(backend):
+    torch.manual_seed(0)
+    model = Generator(
+        style_dim=8, resblock_kernel_sizes=[3], upsample_rates=[2, 2], upsample_initial_channel=16,
+        resblock_dilation_sizes=[[1, 3, 5]], upsample_kernel_sizes=[4, 4],
+        gen_istft_n_fft=20, gen_istft_hop_size=5, stft_backend=backend,
+    ).eval()
+    post = []
+    model.conv_post.register_forward_hook(lambda module, args, output: post.append(output))
+    with torch.no_grad():
+        output = model(torch.randn(1, 16, 24), torch.randn(1, 8), torch.full((1, 24), 200.0))
+
+    # Previous head: exp/sin into magnitude/phase, rebuilt as magnitude * e^(j*phase)
+    x = post[0]
+    spec, phase = torch.exp(x[:, :11]), torch.sin(x[:, 11:])
+    if backend == "torch":
+        expected = torch.istft(spec * torch.exp(phase * 1j), 20, 5, 20, window=torch.hann_window(20)).unsqueeze(-2)
+    else:
+        expected = model.stft.inverse(spec, phase)
+    assert torch.allclose(output, expected, atol=1e-5)
+
+    signal = torch.randn(2, 4000)
+    assert torch.allclose(model.stft.analyze(signal), torch.cat(model.stft.transform(signal), dim=1), atol=1e-6)
+
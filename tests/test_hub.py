@@ -0,0 +1,35 @@
+import pytest
+from kokoro import hub
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    (tmp_path / 'voices').mkdir()
+    (tmp_path / 'config.json').write_text('{}')
+    (tmp_path / 'voices' / 'af_heart.pt').write_bytes(b'')
+    monkeypatch.setattr(hub, '_resolved', {})
+    return tmp_path
+
+
+def test_resolve_from_model_dir(model_dir):
+    path = hub.resolve('hexgrad/Kokoro-82M', 'voices/af_heart.pt', str(model_dir))
+    assert path == str(model_dir / 'voices' / 'af_heart.pt')
+
+
+def test_resolve_from_env(model_dir, monkeypatch):
+    monkeypatch.setenv(hub.MODEL_DIR_ENV, str(model_dir))
+    assert hub.resolve('hexgrad/Kokoro-82M', 'config.json') == str(model_dir / 'config.json')
+
+
+def test_resolve_missing_file_never_hits_hub(model_dir, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('hub contacted')
+    monkeypatch.setattr(hub, 'hf_hub_download', fail)
+    with pytest.raises(FileNotFoundError):
+        hub.resolve('hexgrad/Kokoro-82M', 'voices/zz_missing.pt', str(model_dir))
+
+
+def test_resolve_is_cached(model_dir):
+    path = hub.resolve('hexgrad/Kokoro-82M', 'config.json', str(model_dir))
+    (model_dir / 'config.json').unlink()
+    assert hub.resolve('hexgrad/Kokoro-82M', 'config.json', str(model_dir)) == path
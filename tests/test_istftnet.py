@@ -0,0 +1,27 @@
+import pytest
+import torch
+from kokoro.istftnet import SineGen
+
+
+@pytest.mark.parametrize("batch", [1, 2])
+def test_sinegen_frame_rate_matches_upsampled(batch):
+    torch.manual_seed(0)
+    gen = SineGen(24000, 300, harmonic_num=8, voiced_threshold=10)
+    f0 = torch.rand(batch, 120, 1) * 300 + 50
+    f0[:, 40:55] = 0  # unvoiced stretch
+
+    sine_waves, uv, noise = gen(torch.nn.Upsample(scale_factor=300)(f0.transpose(1, 2)).transpose(1, 2))
+    frame_waves, frame_uv, frame_noise = gen.forward_frames(f0)
+
+    assert frame_waves.shape == sine_waves.shape == (batch, 36000, 9)
+    assert torch.equal(frame_uv, uv)
+    # Noise is drawn independently; the deterministic harmonic part must match
+    assert torch.allclose(frame_waves - frame_noise, sine_waves - noise, atol=1e-6)
+    assert (frame_waves - frame_noise)[:, 40 * 300:55 * 300].abs().max() == 0
+
+
+def test_sinegen_pulse_mode_falls_back():
+    gen = SineGen(24000, 4, harmonic_num=2, flag_for_pulse=True)
+    f0 = torch.full((1, 10, 1), 100.0)
+    sine_waves, uv, _ = gen.forward_frames(f0)
+    assert sine_waves.shape == (1, 40, 3) and uv.shape == (1, 40, 1)
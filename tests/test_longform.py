@@ -0,0 +1,70 @@
+import pytest
+import torch
+from kokoro import longform
+from kokoro.model import KModel
+from kokoro.pipeline import KPipeline
+
+
+class FakePipeline:
+    '''Yields one chunk of len(text) samples per sentence; raises on fail_on.'''
+    def __init__(self, fail_on=None, sample_rate=24000):
+        self.fail_on = fail_on
+        self.sample_rate = sample_rate
+        self.calls = []
+
+    def __call__(self, text, voice=None, speed=1, split_pattern=None):
+        self.calls.append(text)
+        for sentence in text.split('. '):
+            if sentence == self.fail_on:
+                raise RuntimeError('crash')
+            output = KModel.Output(audio=torch.full((len(sentence) * 100,), 0.1), pred_dur=None)
+            yield KPipeline.Result(graphemes=sentence, phonemes='', output=output)
+
+
+def test_render_resumes_and_concats(tmp_path):
+    book = tmp_path / 'book.txt'
+    book.write_text('One. Two\n\nThree. Four. Five\nSix\n')
+    work = tmp_path / 'work'
+    with pytest.raises(RuntimeError):
+        longform.render(FakePipeline(fail_on='Four'), str(book), str(work), 'af_heart')
+    # Line 0 finished; line 2 was interrupted after one chunk
+    assert [r['text'] for r in longform.read_manifest(str(work))] == ['One', 'Two']
+    pipeline = FakePipeline()
+    assert longform.render(pipeline, str(book), str(work), 'af_heart') == 2
+    assert pipeline.calls == ['Three. Four. Five', 'Six']
+    records = list(longform.read_manifest(str(work)))
+    assert [r['text'] for r in records] == ['One', 'Two', 'Three', 'Four', 'Five', 'Six']
+    duration = longform.concat(str(work), str(tmp_path / 'book.wav'), str(tmp_path / 'book.srt'))
+    assert duration == pytest.approx(sum(len(r['text']) * 100 for r in records) / 24000)
+    srt = (tmp_path / 'book.srt').read_text()
+    assert srt.startswith('1\n00:00:00,000 --> 00:00:00,012\nOne\n\n2\n00:00:00,012 --> ')
+
+
+def test_render_refuses_other_settings(tmp_path):
+    book = tmp_path / 'book.txt'
+    book.write_text('One\n')
+    longform.render(FakePipeline(), str(book), str(tmp_path / 'work'), 'af_heart')
+    with pytest.raises(ValueError):
+        longform.render(FakePipeline(), str(book), str(tmp_path / 'work'), 'af_heart', speed=1.5)
+
+
+def test_concat_uses_the_pipeline_sample_rate(tmp_path):
+    import soundfile as sf
+    book = tmp_path / 'book.txt'
+    book.write_text('One. Two\n')
+    longform.render(FakePipeline(sample_rate=16000), str(book), str(tmp_path / 'work'), 'af_heart')
+    duration = longform.concat(str(tmp_path / 'work'), str(tmp_path / 'book.wav'), str(tmp_path / 'book.srt'))
+    assert duration == pytest.approx(600 / 16000)
+    assert sf.info(str(tmp_path / 'book.wav')).samplerate == 16000
+    assert '00:00:00,000 --> 00:00:00,019\nOne' in (tmp_path / 'book.srt').read_text()
+
+
+def test_render_restarts_after_a_torn_header(tmp_path):
+    book = tmp_path / 'book.txt'
+    book.write_text('One\n')
+    work = tmp_path / 'work'
+    work.mkdir()
+    (work / longform.MANIFEST).write_text('{"input": "/bo')
+    assert longform.render(FakePipeline(), str(book), str(work), 'af_heart') == 1
+    assert [r['text'] for r in longform.read_manifest(str(work))] == ['One']
+    assert longform.render(FakePipeline(), str(book), str(work), 'af_heart') == 0
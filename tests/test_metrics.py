@@ -0,0 +1,67 @@
+import pytest
+import torch
+from kokoro import metrics
+from kokoro.model import KModel
+from kokoro.pipeline import KPipeline
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, 'observers', [])
+    registry = metrics.MetricsRegistry()
+    metrics.add_observer(registry.observe)
+    return registry
+
+
+class FakeModel:
+    device = 'cpu'
+
+    def __call__(self, phonemes, ref_s, speed=1, return_output=False):
+        return KModel.Output(audio=torch.zeros(100), pred_dur=None)
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    for v in (0.003, 0.02, 0.02, 50):
+        metrics.emit('g2p_seconds', v, lang='e')
+    text = registry.render()
+    assert '# TYPE kokoro_g2p_seconds histogram' in text
+    assert 'kokoro_g2p_seconds_bucket{lang="e",le="0.005"} 1' in text
+    assert 'kokoro_g2p_seconds_bucket{lang="e",le="0.025"} 3' in text
+    assert 'kokoro_g2p_seconds_bucket{lang="e",le="30"} 3' in text
+    assert 'kokoro_g2p_seconds_bucket{lang="e",le="+Inf"} 4' in text
+    assert 'kokoro_g2p_seconds_count{lang="e"} 4' in text
+
+
+def test_unknown_events_are_ignored(registry):
+    metrics.emit('not_a_metric', 1)
+    assert registry.render() == '\n'
+
+
+def test_pipeline_hooks(registry):
+    pipeline = object.__new__(KPipeline)
+    pipeline.lang_code = 'e'
+    pipeline.sample_rate = 24000
+    pipeline.first_chunk = None
+    pipeline.g2p = lambda text: (text.lower(), None)
+    pipeline.voices = {'ef_dora': torch.zeros(510, 1, 256)}
+    pipeline.model = FakeModel()
+    for _ in range(2):
+        results = list(pipeline('Hola. Adios.', voice='ef_dora'))
+        assert len(results) == 1
+    text = registry.render()
+    assert 'kokoro_chunks_total{lang="e",voice="ef_dora"} 2' in text
+    assert 'kokoro_phonemes_total{lang="e",voice="ef_dora"} 24' in text
+    assert 'kokoro_chars_total{lang="e"} 24' in text
+    assert 'kokoro_voice_cache_hits_total{lang="e",voice="ef_dora"} 2' in text
+    assert 'kokoro_time_to_first_audio_seconds_count{lang="e"} 2' in text
+    # G2P runs once per sentence
+    assert 'kokoro_g2p_seconds_count{lang="e"} 4' in text
+
+
+def test_label_values_are_escaped_and_voices_bounded(registry):
+    metrics.emit('chars', 1, lang='a\\b"c\nd')
+    assert 'kokoro_chars_total{lang="a\\\\b\\"c\\nd"} 1' in registry.render()
+    assert KPipeline.voice_label('af_heart') == KPipeline.voice_label('af_heart:0.7') == 'af_heart'
+    assert KPipeline.voice_label('af_bella:0.3,af_sky:0.7') == 'blend'
+    assert KPipeline.voice_label('/voices/mine.pt') == 'file'
+    assert KPipeline.voice_label(torch.zeros(1)) == 'tensor'
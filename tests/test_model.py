@@ -0,0 +1,44 @@
+import torch
+from types import SimpleNamespace
+from kokoro.model import KModel
+
+
+def fake_model(calls):
+    model = SimpleNamespace(
+        vocab={p: i for i, p in enumerate('ðə kwˈɪkbɹWnfɑsʤʌmpOvlAzidɔɡ,.', 1)},
+        config={'style_dim': 128},
+        context_length=512,
+        device='cpu',
+        WARMUP_PHONEMES=KModel.WARMUP_PHONEMES,
+        forward_with_tokens=lambda input_ids, ref_s, speed: calls.append((input_ids.shape, ref_s.shape)),
+    )
+    model.phonemes_to_ids = lambda ps: KModel.phonemes_to_ids(model, ps)
+    return model
+
+
+def test_warmup_clamps_lengths_to_context():
+    calls = []
+    timings = KModel.warmup(fake_model(calls), lengths=(16, 300, 1000))
+    assert list(timings) == [16, 300, 510]
+    assert [shape for shape, _ in calls] == [(1, 18), (1, 302), (1, 512)]
+    assert all(ref_shape == (1, 256) for _, ref_shape in calls)
+
+
+def test_forward_batch_matches_forward_ids(tiny_model_dir):
+    model = KModel(repo_id='hexgrad/Kokoro-82M', model_dir=str(tiny_model_dir)).eval()
+    # Random weights predict ~25 frames for every phoneme; sharpen the duration head so
+    # durations depend on the LSTM outputs, and speed up to keep the audio short
+    with torch.no_grad():
+        model.predictor.duration_proj.linear_layer.weight.mul_(20)
+    torch.manual_seed(0)
+    ids = [model.phonemes_to_ids(ps) for ps in ('ola', 'ˈola mˈundo, kˈomo ˈestas?', 'ˈaðjos.')]
+    ref_s = torch.randn(len(ids), 256) * 0.1
+    speed = torch.tensor([8.0, 10.0, 6.0])
+    input_ids = torch.zeros((len(ids), max(map(len, ids))), dtype=torch.long)
+    for i, x in enumerate(ids):
+        input_ids[i, :len(x)] = torch.LongTensor(x)
+    batched = model.forward_batch(input_ids, torch.LongTensor([len(x) for x in ids]), ref_s, speed)
+    for i, x in enumerate(ids):
+        single = model.forward_ids(x, ref_s[i:i+1], float(speed[i]))
+        assert torch.equal(batched[i].pred_dur, single.pred_dur)
+        assert batched[i].audio.shape == single.audio.shape
@@ -0,0 +1,39 @@
+import torch
+import torch.nn as nn
+from kokoro.modules import TextEncoder, run_lstm
+
+
+def packed(lstm, x, lengths):
+    x = nn.utils.rnn.pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+    x, _ = lstm(x)
+    return nn.utils.rnn.pad_packed_sequence(x, batch_first=True)[0]
+
+
+def test_run_lstm_matches_packed():
+    torch.manual_seed(0)
+    lstm = nn.LSTM(8, 4, 1, batch_first=True, bidirectional=True).eval()
+    x = torch.randn(3, 10, 8)
+    with torch.no_grad():
+        # Equal lengths skip packing
+        lengths = torch.tensor([10, 10, 10])
+        assert torch.allclose(run_lstm(lstm, x, lengths), packed(lstm, x, lengths), atol=1e-6)
+        # Padded rows are packed and zero-filled up to the full length
+        lengths = torch.tensor([10, 6, 3])
+        out = run_lstm(lstm, x, lengths)
+        assert out.shape == (3, 10, 8)
+        assert torch.allclose(out, packed(lstm, x, lengths), atol=1e-6)
+        assert out[1, 6:].abs().max() == 0 and out[2, 3:].abs().max() == 0
+
+
+def test_text_encoder_batch_matches_single():
+    torch.manual_seed(0)
+    encoder = TextEncoder(channels=16, kernel_size=5, depth=2, n_symbols=20).eval()
+    ids = torch.randint(1, 20, (2, 12))
+    lengths = torch.tensor([12, 7])
+    mask = torch.arange(12).unsqueeze(0) >= lengths.unsqueeze(1)
+    with torch.no_grad():
+        batch = encoder(ids, lengths, mask)
+        for i, n in enumerate(lengths.tolist()):
+            single = encoder(ids[i:i+1, :n], lengths[i:i+1], mask[i:i+1, :n])
+            assert torch.allclose(batch[i:i+1, :, :n], single, atol=1e-5)
+        assert batch[1, :, 7:].abs().max() == 0
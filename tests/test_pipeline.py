@@ -0,0 +1,134 @@
+import asyncio
+import re
+import threading
+import torch
+from kokoro.model import KModel
+from kokoro.pipeline import ChunkSchedule, KPipeline
+from kokoro.voices import BlendCache
+from misaki import en
+
+
+def make_pipeline(monkeypatch, n, started):
+    def fake_call(self, text, voice=None, speed=1, split_pattern=r'\n+', model=None):
+        for i in range(n):
+            started.append(threading.current_thread().name)
+            yield KPipeline.Result(graphemes=f'{text} {i}', phonemes='')
+    monkeypatch.setattr(KPipeline, '__call__', fake_call)
+    pipeline = object.__new__(KPipeline)
+    pipeline._executor = None
+    return pipeline
+
+
+def test_astream_yields_in_order_off_loop(monkeypatch):
+    started = []
+    pipeline = make_pipeline(monkeypatch, 5, started)
+
+    async def consume():
+        return [r.graphemes async for r in pipeline.astream('x', voice='af_heart', prefetch=2)]
+
+    assert asyncio.run(consume()) == [f'x {i}' for i in range(5)]
+    assert all(name.startswith('kpipeline') for name in started)
+
+
+def test_astream_stops_early_with_bounded_prefetch(monkeypatch):
+    started = []
+    pipeline = make_pipeline(monkeypatch, 100, started)
+
+    async def consume():
+        async for r in pipeline.astream('x', voice='af_heart', prefetch=2):
+            if r.graphemes == 'x 2':
+                break
+        await asyncio.sleep(0.05)
+
+    asyncio.run(consume())
+    # 3 consumed, at most prefetch + 1 further chunks started
+    assert len(started) <= 6
+
+
+def test_warmup_loads_voices_and_returns_warm_timings():
+    calls = []
+
+    class FakeModel:
+        def warmup(self, lengths, ref_s=None):
+            calls.append((tuple(lengths), ref_s[0, 0].item()))
+            return {n: float(len(calls)) for n in lengths}
+
+    pipeline = object.__new__(KPipeline)
+    pipeline.lang_code = 'e'
+    pipeline.model = FakeModel()
+    pipeline.voices = {'ef_dora': torch.arange(510.0)[:, None, None].expand(510, 1, 256)}
+    timings = pipeline.warmup(['ef_dora'], lengths=[16, 600])
+    # A cold pass, then the timed warm pass; style rows follow phoneme counts
+    assert calls == [((16,), 15), ((600,), 509), ((16,), 15), ((600,), 509)]
+    assert timings == {16: 3.0, 600: 4.0}
+
+
+def make_tokens(text):
+    tokens = []
+    for m in re.finditer(r'(\w+|[^\w\s])(\s*)', text):
+        word, whitespace = m.groups()
+        tokens.append(en.MToken(text=word, tag='X', whitespace=whitespace, phonemes=word.lower()))
+    return tokens
+
+
+def test_first_chunk_ends_at_earliest_clause_and_chunks_grow():
+    pipeline = object.__new__(KPipeline)
+    text = 'Well, this is a test of the chunker. ' * 30
+    assert [len(ps) for _, ps, _ in pipeline.en_tokenize(make_tokens(text))] == [480, 480, 147]
+    chunks = list(pipeline.en_tokenize(make_tokens(text), ChunkSchedule(60)))
+    assert chunks[0][0] == 'Well,'
+    assert [len(ps) for _, ps, _ in chunks] == [5, 104, 221, 480, 295]
+    assert all(len(ps) <= min(510, 60 * 2 ** i) for i, (_, ps, _) in enumerate(chunks))
+    # Closing quotes stay with the clause they end
+    chunks = pipeline.en_tokenize(make_tokens('He said “Hi,” then left. More words.'), ChunkSchedule(100))
+    assert [gs for gs, _, _ in chunks] == ['He said “Hi,”', 'then left. More words.']
+
+
+def make_espeak_pipeline(lang_code='e'):
+    pipeline = object.__new__(KPipeline)
+    pipeline.lang_code = lang_code
+    pipeline.g2p = lambda text: (text.lower(), None)
+    return pipeline
+
+
+def test_chunk_text_packs_sentences_without_truncating():
+    pipeline = make_espeak_pipeline()
+    sentence = 'Esta es una frase bastante larga, con una coma en medio. '
+    chunks = list(pipeline.chunk_text(sentence * 20))
+    assert [len(ps) for _, ps in chunks] == [455, 455, 227]
+    assert all(gs.endswith('.') for gs, _ in chunks)
+    # A 1600-character run with no punctuation is split at words, not truncated
+    chunks = list(pipeline.chunk_text('palabra ' * 200))
+    assert all(len(ps) <= 510 for _, ps in chunks)
+    assert ' '.join(gs for gs, _ in chunks) == ('palabra ' * 200).strip()
+
+
+def test_chunk_text_handles_cjk_and_first_chunk():
+    pipeline = make_espeak_pipeline('z')
+    chunks = list(pipeline.chunk_text('我们去了公园，然后吃了饭。你呢？', ChunkSchedule(100)))
+    assert [gs for gs, _ in chunks] == ['我们去了公园，', '然后吃了饭。你呢？']
+
+
+def test_resampled_call_keeps_the_filter_tail():
+    class FakeModel:
+        device = 'cpu'
+
+        def __call__(self, ps, ref_s, speed=1, return_output=True):
+            return KModel.Output(audio=torch.ones(2400))
+
+    pipeline = make_espeak_pipeline()
+    pipeline.sample_rate = 16000
+    pipeline.first_chunk = None
+    pipeline.voices = {'ef_dora': torch.zeros(510, 1, 256)}
+    pipeline.blends = BlendCache()
+    results = list(pipeline('Uno.\nDos.\nTres.', voice='ef_dora', model=FakeModel()))
+    # 3 x 100 ms at 24 kHz is exactly 4800 samples at 16 kHz, the last few in a trailing Result
+    assert [r.graphemes for r in results] == ['Uno.', 'Dos.', 'Tres.', '']
+    assert sum(len(r.audio) for r in results) == 4800
+
+
+def test_voice_lang():
+    assert KPipeline.voice_lang('af_heart') == 'a'
+    assert KPipeline.voice_lang('bf_emma:0.7,bm_george:0.3') == 'b'
+    assert KPipeline.voice_lang('af_heart,bf_emma') is None
+    assert KPipeline.voice_lang('voices/af_heart.pt') is None
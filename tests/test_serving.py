@@ -0,0 +1,113 @@
+import queue
+import threading
+import pytest
+import torch
+from kokoro.model import KModel
+from kokoro.serving import BatchScheduler
+
+
+class FakeModel:
+    device = torch.device('cpu')
+
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def phonemes_to_ids(self, phonemes):
+        return [0, *map(ord, phonemes), 0]
+
+    def forward_batch(self, input_ids, input_lengths, ref_s, speed):
+        self.gate.wait()
+        self.batches.append(input_lengths.tolist())
+        return [KModel.Output(audio=torch.full((n,), float(s))) for n, s in zip(input_lengths.tolist(), speed.tolist())]
+
+
+def test_requests_are_batched_and_routed():
+    model = FakeModel()
+    with BatchScheduler(model, max_batch_size=4, max_wait_ms=50) as scheduler:
+        futures = [scheduler.submit('a' * i, torch.zeros(1, 256), speed=i) for i in range(1, 5)]
+        outputs = [f.result(timeout=5) for f in futures]
+    assert model.batches == [[3, 4, 5, 6]]
+    for i, output in enumerate(outputs, 1):
+        assert output.audio.shape == (i + 2,)
+        assert output.audio[0] == i
+    assert scheduler.stats.requests == 4
+    assert scheduler.stats.batches == 1
+
+
+def test_length_buckets_are_not_mixed():
+    model = FakeModel()
+    with BatchScheduler(model, max_batch_size=8, max_wait_ms=20, bucket_size=8) as scheduler:
+        futures = [scheduler.submit(p, torch.zeros(1, 256)) for p in ('ab', 'a' * 20, 'abc')]
+        [f.result(timeout=5) for f in futures]
+    assert sorted(model.batches) == [[4, 5], [22]]
+
+
+def test_backpressure_raises_queue_full():
+    model = FakeModel()
+    model.gate.clear()
+    scheduler = BatchScheduler(model, max_batch_size=1, max_wait_ms=0, max_queue=1)
+    try:
+        scheduler.submit('a', torch.zeros(1, 256))
+        scheduler.submit('b', torch.zeros(1, 256), timeout=5)
+        with pytest.raises(queue.Full):
+            scheduler.submit('c', torch.zeros(1, 256), timeout=0.05)
+        assert scheduler.stats.rejected == 1
+    finally:
+        model.gate.set()
+        scheduler.close()
+
+
+def test_worker_pool_fails_futures_when_a_worker_cannot_start(tmp_path):
+    from kokoro.serving import WorkerPool
+    (tmp_path / 'config.json').write_text('{}')
+    with WorkerPool(workers=1, model=str(tmp_path / 'missing.safetensors'), model_dir=str(tmp_path)) as pool:
+        future = pool.submit('Hello.', 'af_heart')
+        with pytest.raises(RuntimeError, match='failed to start'):
+            future.result(timeout=120)
+        with pytest.raises(RuntimeError, match='broken'):
+            pool.submit('Hello.', 'af_heart')
+
+
+def test_get_model_is_shared_per_model_dir(monkeypatch):
+    from kokoro import serving
+
+    class Built(torch.nn.Module):
+        def __init__(self, repo_id, model_dir):
+            super().__init__()
+            self.model_dir = model_dir
+
+    monkeypatch.setattr(serving, 'KModel', Built)
+    monkeypatch.setattr(serving, '_models', {})
+    monkeypatch.delenv('KOKORO_MODEL_DIR', raising=False)
+    a = serving.get_model(device='cpu', model_dir='/models/a')
+    assert serving.get_model(device='cpu', model_dir='/models/a') is a
+    b = serving.get_model(device='cpu', model_dir='/models/b')
+    assert b is not a and b.model_dir == '/models/b'
+
+
+def test_worker_model_adopts_shared_weights(tiny_model_dir):
+    from kokoro.serving import _build_worker_model
+    model = KModel(repo_id='hexgrad/Kokoro-82M', model_dir=str(tiny_model_dir)).eval()
+    rebuilt = _build_worker_model('hexgrad/Kokoro-82M', model.config, model.weights(), 'torch')
+    shared = dict(model.named_parameters())
+    for name, p in rebuilt.named_parameters():
+        assert p.data_ptr() == shared[name].data_ptr(), name
+    assert torch.equal(rebuilt.bert.embeddings.position_ids, model.bert.embeddings.position_ids)
+    input_ids = torch.LongTensor([model.phonemes_to_ids('ola')])
+    ref_s = torch.randn(1, 256)
+    _, dur = model.forward_with_tokens(input_ids, ref_s)
+    _, rebuilt_dur = rebuilt.forward_with_tokens(input_ids, ref_s)
+    assert torch.equal(dur, rebuilt_dur)
+
+
+def test_worker_pool_synthesizes_in_a_worker(tiny_model_dir):
+    from kokoro.serving import WorkerPool
+    model_dir = str(tiny_model_dir)
+    with WorkerPool(workers=1, model_dir=model_dir, voices=['ef_dora'], sample_rate=16000) as pool:
+        results = pool.submit('Hola mundo.', 'ef_dora').result(timeout=120)
+        with pytest.raises(ValueError, match='lang_code'):
+            pool.submit('Hola.', str(tiny_model_dir / 'voices' / 'ef_dora.pt'))
+    assert results[0].graphemes == 'Hola mundo.' and results[0].phonemes
+    assert len(results[0].audio) > 0
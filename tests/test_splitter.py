@@ -0,0 +1,40 @@
+import pytest
+from kokoro.splitter import split_clauses, split_half, split_sentences
+
+
+# Cases from kokoro.js/tests/splitting.test.js
+@pytest.mark.parametrize('text,expected', [
+    ('This is a test. This is another test.', ['This is a test.', 'This is another test.']),
+    ('She said, "Hello there. How are you?". I replied, "I\'m fine."',
+     ['She said, "Hello there. How are you?".', 'I replied, "I\'m fine."']),
+    ('Dr. Smith is here. At 10 a.m. I saw him.', ['Dr. Smith is here.', 'At 10 a.m. I saw him.']),
+    ('Wait... what just happened? I don\'t understand...', ['Wait... what just happened?', 'I don\'t understand...']),
+    ('The price is $4.99. Do you want to buy it?', ['The price is $4.99.', 'Do you want to buy it?']),
+    ('What?! Are you serious?! This is crazy...', ['What?!', 'Are you serious?!', 'This is crazy...']),
+    ('This is an example (This is pretty cool. Another sentence). Do you agree?',
+     ['This is an example (This is pretty cool. Another sentence).', 'Do you agree?']),
+    ('First sentence.\nSecond sentence.', ['First sentence.', 'Second sentence.']),
+    ('Visit https://example.com. It\'s a great site!', ['Visit https://example.com.', 'It\'s a great site!']),
+    ('J.R.R. Tolkien wrote The Lord of the Rings. Wait... what?',
+     ['J.R.R. Tolkien wrote The Lord of the Rings.', 'Wait... what?']),
+    ('English sentence. 这是一句中文？ Another English sentence!',
+     ['English sentence.', '这是一句中文？', 'Another English sentence!']),
+    ('彼は「ココにある。」と言った。', ['彼は「ココにある。」と言った。']),
+    ('text。。text', ['text。。', 'text']),
+])
+def test_split_sentences_matches_kokoro_js(text, expected):
+    assert split_sentences(text) == expected
+
+
+def test_cjk_terminators_split_without_spaces():
+    assert split_sentences('今日は晴れです。明日は雨でしょう！「本当？」と彼は言った。') == [
+        '今日は晴れです。', '明日は雨でしょう！', '「本当？」と彼は言った。'
+    ]
+    assert split_sentences('我很好。你呢？') == ['我很好。', '你呢？']
+
+
+def test_split_clauses_and_halves():
+    assert split_clauses('Primero, segundo; tercero: 1,000 fin.') == ['Primero,', 'segundo;', 'tercero:', '1,000 fin.']
+    assert split_clauses('我们去了公园，然后吃了饭、喝了茶。') == ['我们去了公园，', '然后吃了饭、', '喝了茶。']
+    assert split_half('a b c d e f') == ['a b c', 'd e f']
+    assert split_half('一二三四') == ['一二', '三四']
@@ -0,0 +1,55 @@
+import pytest
+import torch
+from kokoro.pipeline import KPipeline
+from kokoro.voices import BlendCache, VoiceBlend, blend_key, load_voices, parse_blend, save_voices
+
+
+def make_pipeline(voices, blend_cache_size=32):
+    pipeline = object.__new__(KPipeline)
+    pipeline.lang_code = 'a'
+    pipeline.voices = dict(voices)
+    pipeline.blends = BlendCache(blend_cache_size)
+    return pipeline
+
+
+def test_parse_blend_normalizes_weights():
+    assert parse_blend('af_bella,af_sky') == [('af_bella', 0.5), ('af_sky', 0.5)]
+    assert parse_blend('af_bella:3, af_sky:1') == [('af_bella', 0.75), ('af_sky', 0.25)]
+    assert parse_blend(r'C:\voices\x.pt') == [(r'C:\voices\x.pt', 1.0)]
+    assert blend_key(parse_blend('af_sky:0.3,af_bella:0.7')) == 'af_bella:0.7,af_sky:0.3'
+    with pytest.raises(ValueError):
+        parse_blend('af_bella:0,af_sky:0')
+
+
+def test_blend_mixes_rows_on_demand():
+    a, b = torch.randn(510, 1, 256), torch.randn(510, 1, 256)
+    pipeline = make_pipeline({'af_bella': a, 'af_sky': b})
+    blend = pipeline.load_voice('af_bella:0.7,af_sky:0.3')
+    assert isinstance(blend, VoiceBlend) and len(blend) == 510
+    assert torch.allclose(blend[11], 0.7 * a[11] + 0.3 * b[11])
+    assert list(blend._rows) == [11]
+    assert torch.allclose(blend.tensor(), 0.7 * a + 0.3 * b)
+    # Equal weights are the old mean, and the same blend in another order is a cache hit
+    assert torch.allclose(pipeline.load_voice('af_bella,af_sky')[5], (a[5] + b[5]) / 2)
+    assert pipeline.load_voice('af_sky:0.3,af_bella:0.7') is blend
+
+
+def test_blend_cache_is_bounded():
+    pipeline = make_pipeline({'a': torch.zeros(510, 1, 256), 'b': torch.ones(510, 1, 256)}, blend_cache_size=2)
+    for w in (1, 2, 3):
+        pipeline.load_voice(f'a:{w},b:1')
+    assert list(pipeline.blends.items) == ['a:0.6667,b:0.3333', 'a:0.75,b:0.25']
+
+
+def test_voice_store_serves_premixed_blends(tmp_path):
+    a, b = torch.randn(510, 1, 256), torch.randn(510, 1, 256)
+    torch.save(a, tmp_path / 'a.pt')
+    torch.save(b, tmp_path / 'b.pt')
+    path = str(tmp_path / 'voices.safetensors')
+    names = save_voices(path, [str(tmp_path / 'a.pt'), f'{tmp_path / "a.pt"}:1,{tmp_path / "b.pt"}:3'])
+    assert len(load_voices(path)) == 2
+    pipeline = make_pipeline({})
+    assert pipeline.load_voice_store(path) == names
+    pack = pipeline.load_voice(f'{tmp_path / "b.pt"}:0.75,{tmp_path / "a.pt"}:0.25')
+    assert isinstance(pack, torch.Tensor) and torch.allclose(pack, 0.25 * a + 0.75 * b)
+    assert not pipeline.blends.items
@@ -0,0 +1,24 @@
+import torch
+from safetensors.torch import save_file
+from kokoro.weights import flatten, load_safetensors, unflatten
+
+
+def test_flatten_strips_module_prefix():
+    weights = {
+        'bert': {'module.embeddings.weight': torch.zeros(2)},
+        'decoder': {'encode.conv1.bias': torch.ones(3)},
+    }
+    tensors = flatten(weights)
+    assert set(tensors) == {'bert.embeddings.weight', 'decoder.encode.conv1.bias'}
+    restored = unflatten(tensors)
+    assert set(restored['bert']) == {'embeddings.weight'}
+    assert torch.equal(restored['decoder']['encode.conv1.bias'], torch.ones(3))
+
+
+def test_load_safetensors_upcasts_reduced_dtype(tmp_path):
+    path = str(tmp_path / 'weights.safetensors')
+    save_file({'predictor.lstm.weight': torch.randn(4, 4).half(), 'bert.ids': torch.arange(4)}, path, metadata={'weight_norm': 'frozen'})
+    weights, metadata = load_safetensors(path)
+    assert metadata['weight_norm'] == 'frozen'
+    assert weights['predictor']['lstm.weight'].dtype == torch.float32
+    assert weights['bert']['ids'].dtype == torch.int64